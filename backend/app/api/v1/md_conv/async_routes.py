@@ -1,10 +1,61 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from functools import lru_cache
+from datetime import datetime
+from email.utils import format_datetime
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from celery.result import AsyncResult
 
-from app.services.minio_client import minio_client
-from app.schema.async_schemas import UploadUrlRequest, UploadUrlResponse, CreateTaskRequest, TaskResponse, DownloadResponse
-from app.tasks.markdown_tasks import convert_file_to_markdown
+from app.core.config import (
+    MINIO_PRESIGNED_EXPIRE_SECONDS,
+    RESULT_STREAM_CHUNK_SIZE,
+    RESULT_CACHE_CONTROL,
+    TASK_RUNTIME,
+    MAX_FILE_SIZE,
+    CONTENT_SNIFF_ENABLED,
+    CONTENT_SNIFF_BYTES,
+    BUNDLE_MAX_TASKS,
+    BUNDLE_COMPRESS_LEVEL,
+)
+from app.services.storage import storage
+from app.services.coalescer import conversion_coalescer
+from app.services.quarantine import poison_quarantine
+from app.services.queue_affinity import queue_affinity
+from app.services.content_index import content_index
+from app.services.inline_results import inline_results
+from app.services.section_index import build_section_index
+from app.services.task_groups import task_groups
+from app.services.webhooks import webhook_outbox, validate_callback_url
+from app.services.zip_stream import ZipEntry, stream_zip
+from app.services.failures import classify_failure
+from app.services.content_sniffer import resolve_extension
+from app.schema.async_schemas import (
+    UploadUrlRequest,
+    UploadUrlResponse,
+    MultipartInitRequest,
+    MultipartInitResponse,
+    MultipartPartsRequest,
+    MultipartPartsResponse,
+    MultipartCompleteRequest,
+    CreateTaskRequest,
+    BundleRequest,
+    PrecheckRequest,
+    PrecheckResponse,
+    TaskResponse,
+    DownloadResponse,
+    SectionIndexResponse,
+)
+from app.core.worker import celery_app, CONVERT_TASK_NAME, submit_task, revoke_task
 
 router = APIRouter(
     prefix="/async",
@@ -28,7 +79,7 @@ async def get_upload_url(request: UploadUrlRequest):
     - 支持的文件格式参考/markdown/formats接口
     """
     try:
-        result = minio_client.generate_upload_url(
+        result = storage.generate_upload_url(
             filename=request.filename,
             content_type=request.content_type
         )
@@ -38,6 +89,144 @@ async def get_upload_url(request: UploadUrlRequest):
         raise HTTPException(status_code=500, detail=f"生成上传URL失败: {str(e)}")
 
 
+@router.post(
+    "/multipart/init",
+    response_model=MultipartInitResponse,
+    summary="初始化分片上传",
+    description="大文件分片上传：返回upload_id和每个分片的预签名URL，前端可并发上传各分片"
+)
+async def init_multipart_upload(request: MultipartInitRequest):
+    """
+    初始化分片上传
+    
+    - 前端按part_size切分文件，并发PUT到各分片的upload_url
+    - 中断后调用/multipart/parts获取缺失分片的URL继续上传
+    - 全部分片上传后调用/multipart/complete合并，再调用/create-task
+    """
+    try:
+        result = storage.create_multipart_upload(
+            filename=request.filename,
+            file_size=request.file_size,
+            content_type=request.content_type
+        )
+        return MultipartInitResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"初始化分片上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"初始化分片上传失败: {str(e)}")
+
+
+@router.post(
+    "/multipart/parts",
+    response_model=MultipartPartsResponse,
+    summary="查询分片上传进度",
+    description="返回已上传的分片，并为缺失分片重新生成预签名URL，用于断点续传"
+)
+async def get_multipart_parts(request: MultipartPartsRequest):
+    """查询分片上传进度"""
+    try:
+        uploaded = sorted(
+            part.part_number
+            for part in storage.list_uploaded_parts(request.object_name, request.upload_id)
+        )
+        uploaded_set = set(uploaded)
+        missing = [n for n in range(1, request.part_count + 1) if n not in uploaded_set]
+        return MultipartPartsResponse(
+            upload_id=request.upload_id,
+            uploaded_parts=uploaded,
+            parts=storage.generate_part_upload_urls(request.object_name, request.upload_id, missing),
+            expires_in=MINIO_PRESIGNED_EXPIRE_SECONDS
+        )
+    except Exception as e:
+        logger.error(f"查询分片上传进度失败: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"分片上传不存在或已过期: {str(e)}")
+
+
+@router.post(
+    "/multipart/complete",
+    response_model=dict,
+    summary="完成分片上传",
+    description="所有分片上传完成后合并为完整对象"
+)
+async def complete_multipart_upload(request: MultipartCompleteRequest):
+    """完成分片上传"""
+    try:
+        object_name = storage.complete_multipart_upload(
+            request.object_name,
+            request.upload_id,
+            request.part_count
+        )
+        return {"object_name": object_name, "message": "分片上传完成"}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"完成分片上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"完成分片上传失败: {str(e)}")
+
+
+@router.post(
+    "/multipart/abort",
+    response_model=dict,
+    summary="取消分片上传",
+    description="取消分片上传并清理已上传的分片"
+)
+async def abort_multipart_upload(request: MultipartCompleteRequest):
+    """取消分片上传"""
+    try:
+        storage.abort_multipart_upload(request.object_name, request.upload_id)
+        return {"message": "分片上传已取消"}
+    except Exception as e:
+        logger.error(f"取消分片上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"取消分片上传失败: {str(e)}")
+
+
+@router.post(
+    "/precheck",
+    response_model=PrecheckResponse,
+    summary="上传前内容预检",
+    description="根据文件SHA-256和大小查询是否已有相同内容的上传文件或相同参数的转换结果，命中时可跳过上传或转换"
+)
+async def precheck_upload(request: PrecheckRequest):
+    """
+    上传前内容预检
+    
+    - upload_exists为true时跳过上传，使用返回的object_name调用/create-task
+    - 返回task_id时转换结果已存在，直接使用/task/{task_id}和/download/{task_id}
+    """
+    try:
+        return await asyncio.to_thread(_precheck, request)
+    except Exception as e:
+        logger.error(f"内容预检失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"内容预检失败: {str(e)}")
+
+
+def _precheck(request: PrecheckRequest) -> dict:
+    """查询该用户的内容索引，并确认登记的对象和任务结果仍然存在"""
+    found = content_index.lookup(request.user_id, request.sha256, request.size, request.filename, request.extract_images)
+    response = {"upload_exists": False, "object_name": None, "task_id": None}
+    
+    task_id = found["task_id"]
+    if task_id:
+        task = AsyncResult(task_id)
+        if task.status == 'SUCCESS' and (task.result or {}).get('status') == 'completed':
+            response["task_id"] = task_id
+        else:
+            content_index.forget_task(request.user_id, request.sha256, request.size, request.filename, request.extract_images)
+    
+    object_name = found["object_name"]
+    if object_name:
+        try:
+            if storage.stat_object(object_name).size == request.size:
+                response.update(upload_exists=True, object_name=object_name)
+        except Exception as e:
+            logger.info(f"内容索引中的对象已不可用 {object_name}: {str(e)}")
+    
+    if response["task_id"] or response["upload_exists"]:
+        logger.info(f"内容预检命中: {request.filename}, 任务: {response['task_id']}, 对象: {response['object_name']}")
+    return response
+
+
 @router.post(
     "/create-task",
     response_model=dict,
@@ -53,23 +242,74 @@ async def create_conversion_task(request: CreateTaskRequest):
     - 使用/task/{task_id}接口查询任务状态
     """
     try:
-        # 检查文件是否存在
-        # if not minio_client.object_exists(request.object_name):
-        #     raise HTTPException(status_code=404, detail="文件不存在于对象存储")
+        if request.group_id and not task_groups.enabled:
+            raise HTTPException(status_code=400, detail="当前部署未启用任务分组")
+        if request.callback_url:
+            if not webhook_outbox.enabled:
+                raise HTTPException(status_code=400, detail="当前部署未启用任务回调")
+            error = await asyncio.to_thread(validate_callback_url, request.callback_url)
+            if error:
+                raise HTTPException(status_code=422, detail=error)
         
-        # 提交Celery任务
+        # 检查文件是否存在、大小是否超限，并根据文件头确定实际格式
+        stat, file_extension = await asyncio.to_thread(_inspect_upload, request)
+        
+        task_id = str(uuid.uuid4())
         task_data = {
             "original_object_name": request.object_name,
             "original_filename": request.original_filename,
             "extract_images": request.extract_images,
             "user_id": request.user_id,
+            "file_extension": file_extension,
         }
-        task = convert_file_to_markdown.delay(task_data)
         
-        logger.info(f"创建转换任务: {task.id}, 文件: {request.original_filename}")
+        # 尽力而为模式：worker在截止时间前渐进转换，到期返回部分结果
+        if request.max_latency_ms:
+            task_data["deadline"] = time.time() + request.max_latency_ms / 1000
+        if request.callback_url:
+            task_data["callback_url"] = request.callback_url
+        
+        # 文件大小用于worker预测内存，ETag用于任务合并和worker本地缓存
+        if stat is not None:
+            task_data["file_size"] = stat.size
+            task_data["etag"] = stat.etag
+        
+        # 此前因文件本身问题永久失败的内容直接拒绝，不再投递给worker
+        quarantine_key = _build_quarantine_key(stat, file_extension)
+        if quarantine_key:
+            record = poison_quarantine.get(quarantine_key)
+            if record:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"文件无法转换（{record.get('error_type')}）: {record.get('error')}"
+                )
+            task_data["quarantine_key"] = quarantine_key
+        
+        # 相同内容+参数的任务正在运行时，直接挂到该任务上
+        coalesce_key = _build_coalesce_key(request, stat, file_extension)
+        if coalesce_key:
+            primary_id = conversion_coalescer.acquire(coalesce_key, task_id)
+            if primary_id != task_id:
+                if request.group_id:
+                    task_groups.add(request.group_id, task_id)
+                return {
+                    "task_id": task_id,
+                    "status": "pending",
+                    "filename": request.original_filename,
+                    "message": "相同文件正在转换，已合并到现有任务"
+                }
+            task_data["coalesce_key"] = coalesce_key
+        
+        # 提交任务（Celery或本地运行时）；优先投递到已缓存该文件的worker
+        queue = await asyncio.to_thread(queue_affinity.route, request.object_name)
+        submit_task(CONVERT_TASK_NAME, [task_data], task_id, queue=queue)
+        if request.group_id:
+            task_groups.add(request.group_id, task_id)
+        
+        logger.info(f"创建转换任务: {task_id}, 文件: {request.original_filename}")
         
         return {
-            "task_id": task.id,
+            "task_id": task_id,
             "status": "pending",
             "filename": request.original_filename,
             "message": "任务已创建，正在处理中"
@@ -82,13 +322,69 @@ async def create_conversion_task(request: CreateTaskRequest):
         raise HTTPException(status_code=500, detail=f"创建转换任务失败: {str(e)}")
 
 
+def _inspect_upload(request: CreateTaskRequest):
+    """
+    派发前检查上传对象：stat + 读取文件头（范围请求），不下载整个文件
+    
+    Returns:
+        tuple: (对象元数据, 转换使用的扩展名)；存储暂时不可用时元数据为None，沿用文件名中的扩展名
+    """
+    extension = os.path.splitext(request.original_filename)[1].lower()
+    try:
+        stat = storage.stat_object(request.object_name)
+    except Exception as e:
+        if classify_failure(e).error_type == 'source_missing':
+            raise HTTPException(status_code=404, detail="文件不存在于对象存储")
+        logger.warning(f"获取对象信息失败: {str(e)}")
+        return None, extension
+    
+    if stat.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"文件大小超过上限: {stat.size} > {MAX_FILE_SIZE}")
+    if stat.size == 0:
+        raise HTTPException(status_code=422, detail="文件为空")
+    if not CONTENT_SNIFF_ENABLED:
+        return stat, extension
+    
+    try:
+        head = b"".join(storage.iter_object(request.object_name, 0, CONTENT_SNIFF_BYTES))
+    except Exception as e:
+        logger.warning(f"读取文件头失败: {str(e)}")
+        return stat, extension
+    
+    detected, result = resolve_extension(extension, head, stat.size)
+    if detected is None:
+        raise HTTPException(status_code=415, detail=f"无法识别的文件内容: {request.original_filename}")
+    if detected != extension:
+        logger.info(f"文件内容与扩展名不符: {request.original_filename} 识别为 {detected}")
+    return stat, detected
+
+
+def _build_quarantine_key(stat, file_extension: str):
+    """根据对象ETag、大小和扩展名生成隔离键，无法获取时返回None"""
+    if not poison_quarantine.enabled or stat is None:
+        return None
+    return poison_quarantine.build_key(stat.etag, stat.size, file_extension)
+
+
+def _build_coalesce_key(request: CreateTaskRequest, stat, file_extension: str):
+    """根据对象ETag和转换参数生成合并键，无法获取时返回None（不合并）"""
+    # 有时限的任务可能只返回部分结果，有回调的任务由自身的转换任务发送回调，均不与其他任务合并
+    if not conversion_coalescer.enabled or stat is None or request.max_latency_ms or request.callback_url:
+        return None
+    options = {
+        "extension": file_extension,
+        "extract_images": request.extract_images,
+    }
+    return conversion_coalescer.build_key(stat.etag, stat.size, options)
+
+
 @router.get(
     "/task/{task_id}",
     response_model=TaskResponse,
     summary="查询任务状态",
     description="根据任务ID查询转换任务的详细状态和进度"
 )
-async def get_task_status(task_id: str):
+async def get_task_status(task_id: str, request: Request):
     """
     查询任务状态
     - PENDING: 等待处理
@@ -96,9 +392,12 @@ async def get_task_status(task_id: str):
     - SUCCESS: 处理完成
     - FAILURE: 处理失败
     - RETRY: 重试中
+    
+    小结果内联保存时，完成状态的 result.markdown 直接包含转换结果；
+    请求头 Accept-Encoding 含 gzip 时响应按gzip压缩
     """
     try:
-        task = AsyncResult(task_id)
+        task = AsyncResult(conversion_coalescer.resolve(task_id))
         
         if not task:
             raise HTTPException(status_code=404, detail="任务不存在")
@@ -127,14 +426,29 @@ async def get_task_status(task_id: str):
                 "progress": meta.get('progress', 0),
                 "message": meta.get('status', '正在处理')
             })
+        elif task.status == 'SUCCESS' and (task.result or {}).get('status') == 'failed':
+            # 任务捕获异常后以失败结果正常结束（不再重试）
+            result = task.result
+            response.update({
+                "status": "failed",
+                "filename": result.get('filename'),
+                "result": result,
+                "error": result.get('error'),
+                "message": "任务处理失败"
+            })
         elif task.status == 'SUCCESS':
             result = task.result or {}
+            if result.get('inline'):
+                content = await asyncio.to_thread(inline_results.get, result['task_id'])
+                result = {**result, "markdown": content.decode('utf-8') if content is not None else None}
             response.update({
                 "status": "completed",
                 "filename": result.get('original_filename'),
                 "result": result,
                 "message": "任务处理完成"
             })
+            if result.get('markdown') and "gzip" in request.headers.get("accept-encoding", ""):
+                return _gzip_json_response(response)
         elif task.status == 'FAILURE':
             response.update({
                 "status": "failed",
@@ -153,6 +467,16 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=500, detail=f"查询任务状态失败: {str(e)}")
 
 
+def _gzip_json_response(content: dict) -> Response:
+    """gzip压缩的JSON响应（包含内联结果的任务状态）"""
+    body = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return Response(
+        gzip.compress(body, compresslevel=6),
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
+
+
 @router.get(
     "/download/{task_id}",
     response_model=DownloadResponse,
@@ -162,7 +486,7 @@ async def get_task_status(task_id: str):
 async def get_download_url(task_id: str):
     """获取转换结果下载链接"""
     try:
-        task = AsyncResult(task_id)
+        task = AsyncResult(conversion_coalescer.resolve(task_id))
         
         if not task or task.status != 'SUCCESS':
             raise HTTPException(status_code=404, detail="任务不存在或未完成")
@@ -171,8 +495,12 @@ async def get_download_url(task_id: str):
         if not result or 'download_url' not in result:
             raise HTTPException(status_code=404, detail="结果文件不存在")
         
+        # 内联结果按需上传到对象存储后生成下载URL
+        if result.get('inline'):
+            await asyncio.to_thread(_materialize_inline, result)
+        
         # 重新生成下载URL（防止过期）
-        download_url = minio_client.generate_download_url(
+        download_url = storage.generate_download_url(
             result['result_object_name'],
             result['filename']
         )
@@ -189,6 +517,337 @@ async def get_download_url(task_id: str):
         raise HTTPException(status_code=500, detail=f"获取下载链接失败: {str(e)}")
 
 
+@router.get(
+    "/result/{task_id}",
+    summary="下载转换结果",
+    description="通过API流式返回转换结果，适用于无法直接访问MinIO的客户端；支持Range断点续传、ETag和If-None-Match"
+)
+async def get_result(task_id: str, request: Request):
+    """
+    代理下载转换结果
+    
+    - 结果按块从存储流式读取，不整体加载到内存
+    - Range: 仅支持单个范围，多范围请求按完整内容返回
+    - If-None-Match 命中返回304；If-Range 不匹配时返回完整内容
+    - 结果文件内容不可变，响应携带 Cache-Control 供CDN/反向代理缓存
+    """
+    try:
+        result = _completed_result(task_id)
+        object_name = result['result_object_name']
+        if result.get('inline'):
+            # 内联结果直接从Redis返回
+            content = await asyncio.to_thread(_inline_content, result)
+            size, etag, last_modified = len(content), f'"{hashlib.md5(content).hexdigest()}"', None
+            
+            def read(offset: int, length: int):
+                return iter((content[offset:offset + length],))
+        else:
+            try:
+                stat = await asyncio.to_thread(storage.stat_object, object_name)
+            except Exception:
+                if not await asyncio.to_thread(storage.object_exists, object_name):
+                    raise HTTPException(status_code=404, detail="结果文件不存在")
+                raise
+            size, etag, last_modified = stat.size, f'"{stat.etag.strip(chr(34))}"', stat.last_modified
+            
+            def read(offset: int, length: int):
+                return storage.iter_object(object_name, offset, length, RESULT_STREAM_CHUNK_SIZE)
+        
+        headers = {
+            "ETag": etag,
+            "Cache-Control": RESULT_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        filename = result.get('filename') or os.path.basename(object_name)
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+        
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range.strip() in (etag, headers.get("Last-Modified")):
+            byte_range = _parse_range(request.headers.get("range"), size)
+        
+        status_code = 200
+        offset, length = 0, size
+        if byte_range:
+            start, end = byte_range
+            offset, length = start, end - start + 1
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(length)
+        
+        body = read(offset, length) if length else iter(())
+        return StreamingResponse(
+            body,
+            status_code=status_code,
+            media_type="text/markdown; charset=utf-8",
+            headers=headers,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"下载结果失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"下载结果失败: {str(e)}")
+
+
+@router.get(
+    "/result/{task_id}/index",
+    response_model=SectionIndexResponse,
+    summary="获取结果章节索引",
+    description="返回结果文件的标题层级、字节偏移、分页边界和估算token数"
+)
+async def get_result_index(task_id: str):
+    """获取结果章节索引，可配合 /result/{task_id} 的Range请求读取任意片段"""
+    try:
+        result = _completed_result(task_id)
+        return await asyncio.to_thread(_section_index, result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取章节索引失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取章节索引失败: {str(e)}")
+
+
+@router.get(
+    "/result/{task_id}/sections/{section_id}",
+    summary="读取单个章节",
+    description="按章节索引中的字节范围读取一个章节（含子章节），只传输该章节的内容"
+)
+async def get_result_section(task_id: str, section_id: int):
+    """读取单个章节"""
+    try:
+        result = _completed_result(task_id)
+        index = await asyncio.to_thread(_section_index, result)
+        sections = index["sections"]
+        if not 0 <= section_id < len(sections):
+            raise HTTPException(status_code=404, detail="章节不存在")
+        
+        section = sections[section_id]
+        length = section["end"] - section["start"]
+        headers = {
+            "Cache-Control": RESULT_CACHE_CONTROL,
+            "Content-Length": str(length),
+            "X-Section-Tokens": str(section["tokens"]),
+        }
+        if result.get('inline'):
+            content = await asyncio.to_thread(_inline_content, result)
+            body = iter((content[section["start"]:section["end"]],))
+        else:
+            body = storage.iter_object(
+                result['result_object_name'], section["start"], length, RESULT_STREAM_CHUNK_SIZE
+            ) if length else iter(())
+        return StreamingResponse(body, media_type="text/markdown; charset=utf-8", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"读取章节失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"读取章节失败: {str(e)}")
+
+
+@router.post(
+    "/bundle",
+    summary="打包下载转换结果",
+    description="按任务ID列表或分组ID流式返回所有结果的ZIP，边读取边压缩边发送"
+)
+async def download_bundle(request: BundleRequest):
+    """
+    打包下载转换结果
+    
+    - 结果按块从存储读取并压缩后立即发送，不在内存或磁盘中生成完整的ZIP
+    - 未完成、失败或已过期的任务不中断打包，记录在ZIP末尾的 manifest.json 中
+    - 重名结果追加序号，例如 report (2).md
+    """
+    try:
+        if request.group_id:
+            if not task_groups.enabled:
+                raise HTTPException(status_code=400, detail="当前部署未启用任务分组")
+            task_ids = await asyncio.to_thread(task_groups.members, request.group_id)
+            if not task_ids:
+                raise HTTPException(status_code=404, detail="分组不存在或已过期")
+        else:
+            task_ids = request.task_ids
+        if not task_ids:
+            raise HTTPException(status_code=422, detail="需要提供 task_ids 或 group_id")
+        if len(task_ids) > BUNDLE_MAX_TASKS:
+            raise HTTPException(status_code=413, detail=f"任务数量超过上限: {len(task_ids)} > {BUNDLE_MAX_TASKS}")
+        
+        filename = f"{request.group_id or 'results'}.zip"
+        return StreamingResponse(
+            stream_zip(_bundle_entries(task_ids), BUNDLE_COMPRESS_LEVEL),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"打包下载结果失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"打包下载结果失败: {str(e)}")
+
+
+def _bundle_entries(task_ids: List[str]) -> Iterator[ZipEntry]:
+    """按顺序生成各任务结果的ZIP条目（在线程池中逐个读取），最后生成 manifest.json"""
+    names = {"manifest.json"}
+    manifest = []
+    for task_id in task_ids:
+        record = {"task_id": task_id, "file": None, "status": "completed", "error": None}
+        manifest.append((record, None))
+        try:
+            result = _completed_result(task_id)
+            name = _unique_entry_name(result.get('filename') or f"{task_id}.md", names)
+            date_time = _entry_date_time(result.get('completed_at'))
+            if result.get('inline'):
+                content = _inline_content(result)
+                entry = ZipEntry(name, (content,), len(content), date_time)
+            else:
+                chunks = storage.iter_object(result['result_object_name'], 0, None, RESULT_STREAM_CHUNK_SIZE)
+                entry = ZipEntry(name, chunks, date_time=date_time)
+        except HTTPException as e:
+            record.update(status="unavailable", error=e.detail)
+            continue
+        except Exception as e:
+            logger.warning(f"打包读取结果失败 {task_id}: {str(e)}")
+            record.update(status="error", error=str(e))
+            continue
+        record["file"] = name
+        manifest[-1] = (record, entry)
+        yield entry
+    
+    # 条目按顺序写完后才生成清单，此时已知各条目是否读取出错
+    for record, entry in manifest:
+        if entry is not None and entry.error:
+            record.update(status="error", error=f"结果读取中断（已写入 {entry.written} 字节）: {entry.error}")
+    content = json.dumps([record for record, _ in manifest], ensure_ascii=False, indent=2).encode('utf-8')
+    yield ZipEntry("manifest.json", (content,), len(content))
+
+
+def _unique_entry_name(filename: str, names: set) -> str:
+    """只保留文件名（防止ZIP路径穿越），重名时追加序号"""
+    base = os.path.basename(filename.replace('\\', '/')) or "result.md"
+    stem, ext = os.path.splitext(base)
+    name, n = base, 1
+    while name in names:
+        n += 1
+        name = f"{stem} ({n}){ext}"
+    names.add(name)
+    return name
+
+
+def _entry_date_time(completed_at: Optional[str]) -> Optional[tuple]:
+    try:
+        return datetime.fromisoformat(completed_at).timetuple()[:6]
+    except (TypeError, ValueError):
+        return None
+
+
+def _completed_result(task_id: str) -> dict:
+    """返回已完成任务的结果，任务不存在或未完成时抛出404"""
+    task = AsyncResult(conversion_coalescer.resolve(task_id))
+    result = task.result if task.status == 'SUCCESS' else None
+    if not result or 'result_object_name' not in result:
+        raise HTTPException(status_code=404, detail="任务不存在或未完成")
+    return result
+
+
+def _inline_content(result: dict) -> bytes:
+    """读取内联保存的结果，已过期时抛出404"""
+    content = inline_results.get(result['task_id'])
+    if content is None:
+        raise HTTPException(status_code=404, detail="结果已过期")
+    return content
+
+
+def _materialize_inline(result: dict):
+    """内联结果首次通过下载链接访问时上传到对象存储"""
+    object_name = result['result_object_name']
+    if not storage.object_exists(object_name):
+        storage.upload_file_from_memory(object_name, _inline_content(result), content_type="text/markdown")
+
+
+def _section_index(result: dict) -> dict:
+    if result.get('inline'):
+        # 内联结果很小，索引按需构建
+        return build_section_index(_inline_content(result))
+    index_object = result.get('index_object_name')
+    if not index_object:
+        raise HTTPException(status_code=404, detail="结果索引不存在")
+    try:
+        stat = storage.stat_object(index_object)
+    except Exception:
+        if not storage.object_exists(index_object):
+            raise HTTPException(status_code=404, detail="结果索引不存在")
+        raise
+    return _load_section_index(index_object, stat.etag)
+
+
+@lru_cache(maxsize=32)
+def _load_section_index(index_object: str, etag: str) -> dict:
+    """
+    按对象名+ETag缓存索引
+
+    每次请求先查询对象元数据（不下载内容），任务被删除（可能由其他API进程处理）后不再返回缓存的索引
+    """
+    return json.loads(bytes(storage.download_file_to_memory(index_object)))
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 弱比较（忽略W/前缀）"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围，返回闭区间 (start, end)
+    
+    无Range头、格式无法识别或多范围时返回None（按完整内容响应），
+    范围不可满足时抛出416
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_str, sep, end_str = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # 后缀范围: bytes=-N 表示最后N个字节
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise _range_not_satisfiable(size)
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise _range_not_satisfiable(size)
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="请求的范围无效",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
+
+
 @router.delete(
     "/task/{task_id}",
     summary="删除任务",
@@ -197,6 +856,21 @@ async def get_download_url(task_id: str):
 async def delete_task(task_id: str, background_tasks: BackgroundTasks):
     """删除转换任务及其文件"""
     try:
+        # 别名任务只删除别名，主任务可能仍被其他请求共享；
+        # 主任务已被删除且这是最后一个别名时，接着清理主任务
+        alias = conversion_coalescer.unalias(task_id)
+        if alias:
+            primary_id, orphaned = alias
+            logger.info(f"删除别名任务: {task_id}")
+            if not orphaned:
+                return {"message": "任务已删除"}
+            task_id = primary_id
+        else:
+            shared = conversion_coalescer.retire(task_id)
+            if shared:
+                logger.info(f"删除任务: {task_id}，仍有 {shared} 个合并请求共享结果，暂不清理")
+                return {"message": "任务已删除"}
+        
         task = AsyncResult(task_id)
         
         if not task:
@@ -205,18 +879,26 @@ async def delete_task(task_id: str, background_tasks: BackgroundTasks):
         # 如果是成功完成的任务，清理结果文件
         if task.status == 'SUCCESS':
             result = task.result
-            if result and 'result_object_name' in result:
+            if result and result.get('inline'):
                 try:
-                    minio_client.delete_object(result['result_object_name'])
+                    inline_results.delete(result['task_id'])
                 except Exception as e:
-                    logger.warning(f"清理结果文件失败: {str(e)}")
+                    logger.warning(f"清理内联结果失败: {str(e)}")
+            if result and 'result_object_name' in result:
+                for object_name in (result['result_object_name'], result.get('index_object_name')):
+                    if not object_name:
+                        continue
+                    try:
+                        storage.delete_object(object_name)
+                    except Exception as e:
+                        logger.warning(f"清理结果文件失败: {str(e)}")
         
         # 清理原始文件（需要知道原始对象名，这里简化处理）
         # 实际应用中可能需要额外信息
         
         # 取消正在执行的任务
         if task.status in ['PENDING', 'PROCESSING']:
-            task.revoke(terminate=True)
+            revoke_task(task_id)
         
         logger.info(f"删除任务: {task_id}")
         return {"message": "任务已删除"}
@@ -236,13 +918,13 @@ async def health_check():
     """异步服务健康检查"""
     try:
         # 检查Celery连接
-        from app.core.worker import celery_app
         result = celery_app.control.inspect()
         
         return {
             "status": "healthy",
             "service": "async-markdown-converter",
             "celery_status": "connected" if result else "disconnected",
+            "task_runtime": TASK_RUNTIME,
             "supported_formats": [
                 ".pdf", ".docx", ".doc", ".pptx", ".ppt", ".xlsx", ".xls",
                 ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff", ".webp",
@@ -1,24 +1,47 @@
+import asyncio
 import io
+import mimetypes
 import os
 import tempfile
-from typing import Optional, Union, BinaryIO
+from typing import Iterable, Iterator, Optional, Union, BinaryIO
 from pathlib import Path
+from urllib.parse import urlsplit
 
 from fastapi import HTTPException, UploadFile
 from loguru import logger
 import aiofiles
 
 try:
-    from markitdown import MarkItDown
+    import markitdown  # noqa: F401
 except ImportError:
     raise ImportError("请安装 markitdown: pip install markitdown")
 
+from app.services.fast_converters import create_markitdown
+from app.services.http_client import http_fetcher, url_cache, FetchResult
+from app.services.streaming_converters import (
+    StreamingConverter,
+    iter_file,
+    normalize_markdown,
+    streaming_converters,
+)
+
+# 不能据此判断文件格式的响应类型
+GENERIC_CONTENT_TYPES = {
+    'application/octet-stream',
+    'binary/octet-stream',
+    'application/binary',
+    'application/download',
+    'application/force-download',
+    'application/x-download',
+}
+
 
 class MarkdownConverter:
     """Markdown 转换器服务类"""
     
     def __init__(self):
-        self.markitdown = MarkItDown()
+        # HTML使用快速引擎，EPUB章节并行转换
+        self.markitdown = create_markitdown()
         # 支持的文件类型
         self.supported_extensions = {
             # 文档格式
@@ -31,6 +54,8 @@ class MarkdownConverter:
             '.html', '.htm', '.csv', '.json', '.xml', '.txt',
             '.zip', '.epub'
         }
+        # 流式转换器：注册的扩展名先于MarkItDown处理，按块转换，内存占用与文件大小无关
+        self.streaming_converters = streaming_converters
     
     async def convert_file_to_markdown(
         self, 
@@ -90,15 +115,7 @@ class MarkdownConverter:
                 temp_file.flush()
                 
                 # 转换文件
-                result = self.markitdown.convert(temp_file.name, **kwargs)
-                
-                if result and hasattr(result, 'text_content'):
-                    return result.text_content
-                else:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="转换结果为空"
-                    )
+                return self._convert_local_file(temp_file.name, file_ext, **kwargs)
                     
             finally:
                 # 清理临时文件
@@ -126,15 +143,7 @@ class MarkdownConverter:
             )
         
         # 转换文件
-        result = self.markitdown.convert(str(file_path), **kwargs)
-        
-        if result and hasattr(result, 'text_content'):
-            return result.text_content
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="转换结果为空"
-            )
+        return self._convert_local_file(str(file_path), file_ext, **kwargs)
     
     async def _convert_bytes(self, content: bytes, file_extension: str, **kwargs) -> str:
         """转换字节流内容"""
@@ -150,15 +159,7 @@ class MarkdownConverter:
                 temp_file.flush()
                 
                 # 转换文件
-                result = self.markitdown.convert(temp_file.name, **kwargs)
-                
-                if result and hasattr(result, 'text_content'):
-                    return result.text_content
-                else:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="转换结果为空"
-                    )
+                return self._convert_local_file(temp_file.name, file_extension, **kwargs)
                     
             finally:
                 # 清理临时文件
@@ -167,9 +168,44 @@ class MarkdownConverter:
                 except OSError:
                     pass
     
+    def _convert_local_file(self, file_path: str, file_extension: str, **kwargs) -> str:
+        """转换本地文件：优先使用流式转换器，其余交给MarkItDown"""
+        if self.get_streaming_converter(file_extension) is not None:
+            return ''.join(self.convert_stream(iter_file(file_path), file_extension))
+        
+        result = self.markitdown.convert(file_path, **kwargs)
+        
+        if result and hasattr(result, 'text_content'):
+            return result.text_content
+        else:
+            raise HTTPException(
+                status_code=500,
+                detail="转换结果为空"
+            )
+    
+    def get_streaming_converter(self, file_extension: str) -> Optional[StreamingConverter]:
+        """获取扩展名对应的流式转换器，未注册时返回None"""
+        return self.streaming_converters.get(file_extension)
+    
+    def convert_stream(self, chunks: Iterable[bytes], file_extension: str) -> Iterator[str]:
+        """
+        流式转换字节块，逐块产出Markdown（与MarkItDown结果做相同的规范化）
+        
+        Args:
+            chunks: 文件内容的字节块迭代器
+            file_extension: 文件扩展名，需已注册流式转换器
+        """
+        converter = self.get_streaming_converter(file_extension)
+        if converter is None:
+            raise ValueError(f"没有注册流式转换器: {file_extension}")
+        return normalize_markdown(converter.convert(chunks))
+    
     async def convert_url_to_markdown(self, url: str, **kwargs) -> str:
         """
         将 URL 内容转换为 Markdown
+
+        通过共享连接池抓取内容，并以 ETag/Last-Modified 做条件请求，
+        内容未变化（304）时直接返回缓存结果，不再重新转换。
         
         Args:
             url: 要转换的URL
@@ -179,16 +215,24 @@ class MarkdownConverter:
             str: 转换后的 Markdown 内容
         """
         try:
-            result = self.markitdown.convert(url, **kwargs)
+            cached = url_cache.get(url)
+            fetched = await http_fetcher.fetch(
+                url,
+                etag=cached.etag if cached else None,
+                last_modified=cached.last_modified if cached else None,
+            )
             
-            if result and hasattr(result, 'text_content'):
-                return result.text_content
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail="URL转换结果为空"
-                )
+            if fetched.not_modified and cached:
+                logger.info(f"URL内容未变化，使用缓存结果: {url}")
+                return cached.markdown
+            
+            # 转换是CPU密集操作，放到线程中执行，避免阻塞事件循环
+            markdown = await asyncio.to_thread(self._convert_fetched, fetched, **kwargs)
+            url_cache.put(url, fetched.etag, fetched.last_modified, markdown)
+            return markdown
                 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"URL转换失败: {str(e)}")
             raise HTTPException(
@@ -196,6 +240,31 @@ class MarkdownConverter:
                 detail=f"URL转换失败: {str(e)}"
             )
     
+    def _convert_fetched(self, fetched: FetchResult, **kwargs) -> str:
+        """转换已抓取的URL内容"""
+        # 通用的二进制类型（application/octet-stream 等）不代表实际格式，以URL路径的扩展名为准
+        url_extension = Path(urlsplit(fetched.url).path).suffix.lower()
+        content_type = (fetched.content_type or '').split(';')[0].strip().lower()
+        file_extension = None
+        if content_type and content_type not in GENERIC_CONTENT_TYPES:
+            file_extension = mimetypes.guess_extension(content_type)
+        if not file_extension:
+            file_extension = url_extension or '.html'
+        
+        result = self.markitdown.convert_stream(
+            io.BytesIO(fetched.content),
+            file_extension=file_extension,
+            url=fetched.url,
+            **kwargs
+        )
+        
+        if result and hasattr(result, 'text_content'):
+            return result.text_content
+        raise HTTPException(
+            status_code=500,
+            detail="URL转换结果为空"
+        )
+    
     def get_supported_formats(self) -> list:
         """获取支持的文件格式列表"""
         return sorted(list(self.supported_extensions))
@@ -0,0 +1,43 @@
+import asyncio
+import re
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import RedirectResponse
+from loguru import logger
+
+from app.core.config import IMAGE_URL_EXPIRE_SECONDS
+from app.services.storage import storage
+
+# 图像对象按内容寻址：images/{sha256}{ext}
+IMAGE_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,8}$')
+
+router = APIRouter(
+    prefix="/images",
+    tags=["图像"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get(
+    "/{name}",
+    summary="提取图像的稳定链接",
+    description="转换结果中的图像链接，重定向到新生成的预签名下载URL（不需要API签名，链接中的SHA-256即访问凭据）"
+)
+async def get_image(name: str):
+    """重定向到图像对象的预签名URL，Markdown中保存的链接不会随预签名URL过期而失效"""
+    if not IMAGE_NAME_PATTERN.match(name):
+        raise HTTPException(status_code=404, detail="图像不存在")
+    object_name = f"images/{name}"
+    try:
+        if not await asyncio.to_thread(storage.object_exists, object_name):
+            raise HTTPException(status_code=404, detail="图像不存在")
+        url = await asyncio.to_thread(
+            storage.generate_download_url, object_name, expires_seconds=IMAGE_URL_EXPIRE_SECONDS
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"生成图像链接失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"生成图像链接失败: {str(e)}")
+    # 预签名URL有效期内允许浏览器缓存重定向
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": f"private, max-age={IMAGE_URL_EXPIRE_SECONDS // 2}"})
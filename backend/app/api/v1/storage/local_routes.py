@@ -0,0 +1,104 @@
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from loguru import logger
+
+from app.core.config import LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX
+from app.services.storage import storage
+from app.services.local_storage import LocalStorage, LocalObjectNotFound, LocalObjectWriter
+
+router = APIRouter(
+    prefix="/storage",
+    tags=["本地存储"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def _local_storage() -> LocalStorage:
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="未启用本地存储")
+    return storage
+
+
+@router.put(
+    "/{object_name:path}",
+    summary="签名URL上传",
+    description="本地存储模式下替代MinIO预签名PUT URL，支持分片上传（uploadId/partNumber）"
+)
+async def put_object(
+    object_name: str,
+    request: Request,
+    expires: int,
+    signature: str,
+    uploadId: Optional[str] = None,
+    partNumber: Optional[int] = None,
+):
+    """流式写入请求体，完成后原子替换目标文件"""
+    local = _local_storage()
+    part_number = str(partNumber) if partNumber else ''
+    if not local.verify("PUT", object_name, expires, signature, uploadId or '', part_number):
+        raise HTTPException(status_code=403, detail="签名无效或已过期")
+
+    try:
+        if uploadId:
+            local.list_uploaded_parts(object_name, uploadId)  # 校验分片上传存在
+            writer = LocalObjectWriter(local, object_name, target=local.part_path(uploadId, partNumber))
+        else:
+            writer = local.open_writer(object_name)
+    except (ValueError, LocalObjectNotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        async for chunk in request.stream():
+            writer.write(chunk)
+        writer.commit(content_type=request.headers.get("content-type"), write_meta=not uploadId)
+        if uploadId:
+            local.write_part_etag(uploadId, partNumber, writer.etag)
+    except ValueError as e:
+        writer.abort()
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        writer.abort()
+        logger.error(f"本地存储写入失败 {object_name}: {str(e)}")
+        raise HTTPException(status_code=500, detail="写入失败")
+
+    return Response(status_code=200, headers={"ETag": f'"{writer.etag}"'})
+
+
+@router.get(
+    "/{object_name:path}",
+    summary="签名URL下载",
+    description="本地存储模式下替代MinIO预签名GET URL"
+)
+async def get_object(object_name: str, expires: int, signature: str, filename: Optional[str] = None):
+    """
+    发送对象文件
+
+    - 配置了 LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX 时由nginx通过sendfile发送
+    - 否则使用FileResponse（ASGI服务器支持pathsend扩展时同样为零拷贝）
+    """
+    local = _local_storage()
+    if not local.verify("GET", object_name, expires, signature, filename=filename or ''):
+        raise HTTPException(status_code=403, detail="签名无效或已过期")
+
+    try:
+        stat = local.stat_object(object_name)
+        path = local.object_path(object_name)
+    except (ValueError, LocalObjectNotFound):
+        raise HTTPException(status_code=404, detail="对象不存在")
+
+    headers = {"ETag": f'"{stat.etag}"'}
+    if LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = f"{LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(object_name)}"
+        if filename:
+            headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+        return Response(media_type=stat.content_type, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type=stat.content_type,
+        filename=filename,
+        headers=headers,
+    )
@@ -5,14 +5,21 @@ from typing import Optional
 from fastapi import HTTPException, Request
 from loguru import logger
 
-from app.core.config import API_SECRET_KEY, API_AUTH_ENABLED, API_AUTH_HEADER, API_TIMESTAMP_HEADER
+from app.core.config import (
+    API_SECRET_KEY,
+    API_AUTH_ENABLED,
+    API_AUTH_HEADER,
+    API_TIMESTAMP_HEADER,
+    LOCAL_STORAGE_ROUTE_PREFIX,
+    IMAGE_ROUTE_PREFIX,
+)
 
 
 class APIAuthMiddleware:
     """API认证中间件 - 使用HMAC-SHA256进行请求签名验证"""
     
-    def __init__(self):
-        self.secret_key = API_SECRET_KEY.encode('utf-8')
+    def __init__(self, secret_key: str = API_SECRET_KEY):
+        self.secret_key = secret_key.encode('utf-8')
         self.auth_enabled = API_AUTH_ENABLED
         self.auth_header = API_AUTH_HEADER
         self.timestamp_header = API_TIMESTAMP_HEADER
@@ -51,6 +58,14 @@ class APIAuthMiddleware:
         if request.url.path.endswith("/health"):
             return
         
+        # 本地存储URL自带签名，由存储路由校验（也避免读取整个上传请求体）
+        if request.url.path.startswith(LOCAL_STORAGE_ROUTE_PREFIX + "/"):
+            return
+        
+        # 转换结果中的图像链接由浏览器直接访问，按内容哈希寻址
+        if request.url.path.startswith(IMAGE_ROUTE_PREFIX + "/"):
+            return
+        
         # 获取签名和时间戳
         signature = request.headers.get(self.auth_header)
         timestamp_str = request.headers.get(self.timestamp_header)
@@ -0,0 +1,180 @@
+import os
+from time import monotonic
+
+import redis
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+from loguru import logger
+
+from app.core.config import (
+    CELERY_BROKER_URL,
+    CELERY_DEFAULT_QUEUE,
+    AUTOSCALE_MEMORY_FRACTION,
+    AUTOSCALE_PROCESS_BASE_MB,
+    AUTOSCALE_BACKLOG_CHECK_SECONDS,
+    EPUB_CHAPTER_WORKERS,
+    QUEUE_AFFINITY_ENABLED,
+    QUEUE_AFFINITY_PREFIX,
+    PIPELINE_ENABLED,
+    PIPELINE_STAGE,
+)
+from app.core.worker import pipeline_queue
+
+MB = 1024 * 1024
+
+# 各格式转换时的峰值内存约为文件大小的倍数（经验值）
+MEMORY_MULTIPLIERS = {
+    '.pdf': 12,
+    '.epub': 8,
+    '.docx': 6, '.doc': 6,
+    '.pptx': 6, '.ppt': 6,
+    '.xlsx': 10, '.xls': 10,
+    '.zip': 8,
+    '.html': 4, '.htm': 4, '.xml': 4, '.json': 4,
+    '.csv': 3, '.txt': 2,
+}
+DEFAULT_MEMORY_MULTIPLIER = 4
+# 任务数据中没有文件大小时使用的估计值
+DEFAULT_FILE_SIZE = 10 * MB
+
+
+def predict_task_memory(task_data: dict) -> int:
+    """根据文件格式和大小预测单个转换任务的峰值内存（字节）"""
+    filename = task_data.get('original_filename') or ''
+    extension = task_data.get('file_extension') or os.path.splitext(filename)[1].lower()
+    file_size = task_data.get('file_size') or DEFAULT_FILE_SIZE
+    multiplier = MEMORY_MULTIPLIERS.get(extension, DEFAULT_MEMORY_MULTIPLIER)
+    processes = 1
+    if extension == '.epub' and EPUB_CHAPTER_WORKERS > 1:
+        # 章节进程池（见 app.services.fast_converters），每个章节进程同样有基础开销
+        processes += EPUB_CHAPTER_WORKERS
+    return AUTOSCALE_PROCESS_BASE_MB * MB * processes + file_size * multiplier
+
+
+def available_memory() -> int:
+    """
+    获取当前可用内存（字节）
+
+    取 /proc/meminfo 的 MemAvailable 与 cgroup 内存限制余量中的较小值，
+    容器内运行时以cgroup限制为准。
+    """
+    candidates = []
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    candidates.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+
+    for limit_path, usage_path in (
+        ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),  # cgroup v2
+        ('/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes'),  # cgroup v1
+    ):
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if limit.isdigit() and int(limit) < (1 << 60):
+            candidates.append(max(int(limit) - usage, 0))
+        break
+
+    return min(candidates) if candidates else 0
+
+
+class MemoryAwareAutoscaler(Autoscaler):
+    """
+    基于队列积压和预测内存的Celery自动伸缩器
+
+    - 目标进程数 = 已预取任务数 + 队列积压数，限制在 [min, max] 之间
+    - 扩容时逐个累加待执行任务的预测内存，超出可用内存预算则停止扩容
+    - 可用内存不足预算时主动缩容（仅回收空闲进程）
+
+    启用方式: celery worker --autoscale=max,min，并配置 worker_autoscaler
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._broker = redis.Redis.from_url(CELERY_BROKER_URL)
+        self._backlog = 0
+        self._backlog_checked_at = 0.0
+        # 默认队列 + 本节点的专属队列（队列亲和）；流水线模式的转换worker只消费本节点的转换队列
+        self._queues = [CELERY_DEFAULT_QUEUE]
+        if PIPELINE_ENABLED and PIPELINE_STAGE == 'cpu':
+            self._queues = [pipeline_queue('cpu')]
+        elif QUEUE_AFFINITY_ENABLED and self.worker is not None:
+            self._queues.append(f"{QUEUE_AFFINITY_PREFIX}{self.worker.hostname}")
+
+    @property
+    def backlog(self) -> int:
+        """Broker中等待的任务数，按间隔缓存以降低查询频率"""
+        now = monotonic()
+        if now - self._backlog_checked_at >= AUTOSCALE_BACKLOG_CHECK_SECONDS:
+            self._backlog_checked_at = now
+            try:
+                pipe = self._broker.pipeline(transaction=False)
+                for queue in self._queues:
+                    pipe.llen(queue)
+                self._backlog = sum(pipe.execute())
+            except Exception as e:
+                logger.warning(f"查询队列积压失败: {str(e)}")
+        return self._backlog
+
+    @property
+    def qty(self):
+        return len(state.reserved_requests) + self.backlog
+
+    def _pending_memory(self) -> list:
+        """预取任务优先按真实大小预测，积压任务使用默认估计"""
+        predicted = []
+        for request in list(state.reserved_requests):
+            if request in state.active_requests:
+                continue
+            try:
+                task_data = request.args[0] if request.args else {}
+            except Exception:
+                task_data = {}
+            predicted.append(predict_task_memory(task_data if isinstance(task_data, dict) else {}))
+        predicted.extend(predict_task_memory({}) for _ in range(self.backlog))
+        return predicted
+
+    def _maybe_scale(self, req=None):
+        procs = self.processes
+        budget = available_memory() * AUTOSCALE_MEMORY_FRACTION
+        target = min(self.qty, self.max_concurrency)
+
+        if target > procs:
+            grow = 0
+            for memory in self._pending_memory()[:target - procs]:
+                if memory > budget:
+                    break
+                budget -= memory
+                grow += 1
+            if grow:
+                self.scale_up(grow)
+                return True
+            logger.info(f"可用内存不足，暂停扩容 (当前进程数 {procs})")
+            return False
+
+        # 可用内存低于单个基础进程开销时主动回收空闲进程
+        if procs > self.min_concurrency and budget < AUTOSCALE_PROCESS_BASE_MB * MB:
+            logger.warning(f"可用内存过低，缩容1个进程 (当前进程数 {procs})")
+            self._shrink(1)
+            return True
+
+        target = max(self.qty, self.min_concurrency)
+        if target < procs:
+            self.scale_down(procs - target)
+            return True
+
+    def info(self):
+        info = super().info()
+        info.update({
+            'backlog': self.backlog,
+            'available_memory_mb': available_memory() // MB,
+        })
+        return info
@@ -1,9 +1,21 @@
 import os
+import socket
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 存储后端配置: minio（默认）或 local（单机部署，API与worker共享磁盘）
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio").lower()
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "/opt/any2md/data/storage")
+# 本地存储签名URL的外部访问地址（API服务地址）
+STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "http://127.0.0.1:8000")
+# 设置后下载交由nginx等反向代理通过X-Accel-Redirect零拷贝发送，例如 /protected-storage/
+LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX = os.getenv("LOCAL_STORAGE_ACCEL_REDIRECT_PREFIX", "")
+LOCAL_STORAGE_ROUTE_PREFIX = "/api/v1/storage"  # 本地存储签名URL的路由前缀
+# 本地存储URL的签名密钥，只在服务端（API与worker）使用，必须与下发给前端的API_SECRET_KEY不同
+LOCAL_STORAGE_SECRET = os.getenv("LOCAL_STORAGE_SECRET", "your-storage-secret-change-this-in-production")
+
 # MinIO 配置
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "127.0.0.1:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "")
@@ -11,12 +23,46 @@ MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
 MINIO_BUCKET_NAME = os.getenv("MINIO_BUCKET_NAME", "markdown-converter")
 MINIO_PRESIGNED_EXPIRE_SECONDS = int(os.getenv("MINIO_PRESIGNED_EXPIRE_SECONDS", "3600"))
+MINIO_REGION = os.getenv("MINIO_REGION", "")  # 设置后生成预签名URL无需查询存储桶区域
+MINIO_POOL_MAXSIZE = int(os.getenv("MINIO_POOL_MAXSIZE", "32"))  # 每个进程的连接池大小
+MINIO_CONNECT_TIMEOUT = float(os.getenv("MINIO_CONNECT_TIMEOUT", "10"))
+MINIO_READ_TIMEOUT = float(os.getenv("MINIO_READ_TIMEOUT", "300"))
+MINIO_TCP_KEEPALIVE = os.getenv("MINIO_TCP_KEEPALIVE", "true").lower() == "true"
+MINIO_BUCKET_CHECK_TTL = int(os.getenv("MINIO_BUCKET_CHECK_TTL", str(24 * 3600)))  # 存储桶检查结果缓存时间
 
 # Redis 配置
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 
+# 任务运行时: celery（默认，Redis broker + 独立worker）或 local（无broker，API进程内调度+进程池，适合单容器部署）
+TASK_RUNTIME = os.getenv("TASK_RUNTIME", "celery").lower()
+LOCAL_RUNTIME_DB = os.getenv("LOCAL_RUNTIME_DB", "/opt/any2md/data/tasks.db")  # 本地任务队列与结果存储
+LOCAL_RUNTIME_CONCURRENCY = int(os.getenv("LOCAL_RUNTIME_CONCURRENCY", str(os.cpu_count() or 2)))
+LOCAL_RUNTIME_MAX_TASKS_PER_CHILD = int(os.getenv("LOCAL_RUNTIME_MAX_TASKS_PER_CHILD", "100"))
+LOCAL_RUNTIME_POLL_SECONDS = float(os.getenv("LOCAL_RUNTIME_POLL_SECONDS", "1"))  # 拾取其他进程提交任务的轮询间隔
+
+# Worker自动伸缩配置（需使用 --autoscale=max,min 启动worker）
+AUTOSCALE_MEMORY_FRACTION = float(os.getenv("AUTOSCALE_MEMORY_FRACTION", "0.8"))  # 可用内存中允许使用的比例
+AUTOSCALE_PROCESS_BASE_MB = int(os.getenv("AUTOSCALE_PROCESS_BASE_MB", "150"))  # 每个子进程的基础内存
+AUTOSCALE_BACKLOG_CHECK_SECONDS = float(os.getenv("AUTOSCALE_BACKLOG_CHECK_SECONDS", "5"))
+CELERY_DEFAULT_QUEUE = os.getenv("CELERY_DEFAULT_QUEUE", "celery")
+
+# 任务合并配置（相同内容+参数的并发任务只转换一次）
+# 依赖Redis，本地运行时默认关闭
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "false" if TASK_RUNTIME == "local" else "true").lower() == "true"
+COALESCE_TTL_SECONDS = int(os.getenv("COALESCE_TTL_SECONDS", str(30 * 60)))
+TASK_ALIAS_TTL_SECONDS = int(os.getenv("TASK_ALIAS_TTL_SECONDS", "3600"))
+
+# 毒文件隔离配置（永久性失败的文件内容在隔离期内直接拒绝，依赖Redis）
+QUARANTINE_ENABLED = os.getenv("QUARANTINE_ENABLED", "false" if TASK_RUNTIME == "local" else "true").lower() == "true"
+QUARANTINE_TTL_SECONDS = int(os.getenv("QUARANTINE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# 内容索引（前端上传前按SHA-256预检，命中时跳过上传/转换，依赖Redis）
+# 有效期应不超过原始文件和任务结果的保留时间（结果默认保留1小时）
+CONTENT_INDEX_ENABLED = os.getenv("CONTENT_INDEX_ENABLED", "false" if TASK_RUNTIME == "local" else "true").lower() == "true"
+CONTENT_INDEX_TTL_SECONDS = int(os.getenv("CONTENT_INDEX_TTL_SECONDS", "3600"))
+
 # 应用配置
 APP_NAME = "Markdown转换服务"
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -26,12 +72,128 @@ PORT = int(os.getenv("PORT", "8000"))
 # 文件处理配置
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(100 * 1024 * 1024)))  # 100MB
 TEMPORARY_FILE_TTL = int(os.getenv("TEMPORARY_FILE_TTL", "3600"))  # 1小时
+# 创建任务前读取文件头识别真实格式，内容无法识别或与扩展名不符时在API层处理
+CONTENT_SNIFF_ENABLED = os.getenv("CONTENT_SNIFF_ENABLED", "true").lower() == "true"
+CONTENT_SNIFF_BYTES = int(os.getenv("CONTENT_SNIFF_BYTES", "8192"))
+
+# worker本地原始文件缓存（按对象名+ETag缓存，重试和重新转换不再下载；本地存储后端无需缓存）
+ORIGINAL_CACHE_ENABLED = os.getenv("ORIGINAL_CACHE_ENABLED", "true" if STORAGE_BACKEND == "minio" else "false").lower() == "true"
+ORIGINAL_CACHE_DIR = os.getenv("ORIGINAL_CACHE_DIR", "/opt/any2md/cache/originals")  # 每台worker机器独立，不要放在共享卷上
+ORIGINAL_CACHE_MAX_BYTES = int(os.getenv("ORIGINAL_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))  # 2GB
+ORIGINAL_CACHE_MAX_FILE_BYTES = int(os.getenv("ORIGINAL_CACHE_MAX_FILE_BYTES", str(MAX_FILE_SIZE)))
+
+# 队列亲和：每个worker消费一个专属队列，API按对象名一致性哈希选择，同一文件落到已缓存它的worker
+QUEUE_AFFINITY_ENABLED = os.getenv(
+    "QUEUE_AFFINITY_ENABLED", "true" if ORIGINAL_CACHE_ENABLED and TASK_RUNTIME == "celery" else "false"
+).lower() == "true"
+QUEUE_AFFINITY_PREFIX = os.getenv("QUEUE_AFFINITY_PREFIX", "affinity.")
+QUEUE_AFFINITY_HEARTBEAT_SECONDS = float(os.getenv("QUEUE_AFFINITY_HEARTBEAT_SECONDS", "10"))
+QUEUE_AFFINITY_TTL_SECONDS = float(os.getenv("QUEUE_AFFINITY_TTL_SECONDS", "30"))  # 超过该时间没有心跳的worker不再分配
+QUEUE_AFFINITY_MAX_BACKLOG = int(os.getenv("QUEUE_AFFINITY_MAX_BACKLOG", "4"))  # 专属队列积压达到该值时投递到默认队列
+
+# 流水线模式：下载、转换、上传拆分为三个阶段，下载/上传在线程池worker中执行，转换在prefork worker中执行，
+# 阶段之间通过本机临时目录传递文件（MODE=worker 时在同一容器内启动两个worker，见 entrypoint.sh）
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "false").lower() == "true" and TASK_RUNTIME == "celery"
+PIPELINE_STAGE = os.getenv("PIPELINE_STAGE", "")  # 由entrypoint为两个worker分别设置：io / cpu
+# 节点名决定本机阶段队列（{prefix}cpu.{node} / {prefix}io.{node}），同一节点的两个worker必须一致
+PIPELINE_NODE = os.getenv("PIPELINE_NODE") or socket.gethostname()
+PIPELINE_QUEUE_PREFIX = os.getenv("PIPELINE_QUEUE_PREFIX", "pipeline.")
+PIPELINE_SCRATCH_DIR = os.getenv("PIPELINE_SCRATCH_DIR", "/opt/any2md/cache/pipeline")  # 每个节点独立，不要放在共享卷上
+PIPELINE_MAX_STAGED = int(os.getenv("PIPELINE_MAX_STAGED", "16"))  # 本机已下载、等待转换的文件数上限
+PIPELINE_BACKPRESSURE_SECONDS = float(os.getenv("PIPELINE_BACKPRESSURE_SECONDS", "2"))  # 达到上限时任务延后重新投递
+PIPELINE_SCRATCH_MAX_AGE_SECONDS = int(os.getenv("PIPELINE_SCRATCH_MAX_AGE_SECONDS", str(6 * 3600)))  # 遗留文件清理
+# 阶段队列心跳：超过TTL没有心跳的节点队列视为已下线，其中的任务移回默认队列
+PIPELINE_HEARTBEAT_SECONDS = float(os.getenv("PIPELINE_HEARTBEAT_SECONDS", "10"))
+PIPELINE_QUEUE_TTL_SECONDS = float(os.getenv("PIPELINE_QUEUE_TTL_SECONDS", "30"))
+
+# 转换沙箱配置（每个worker子进程持有一个可复用的转换子进程）
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "true").lower() == "true"
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "2048"))  # RLIMIT_AS
+SANDBOX_CPU_LIMIT_SECONDS = int(os.getenv("SANDBOX_CPU_LIMIT_SECONDS", "600"))  # 单次转换的CPU时间上限
+SANDBOX_TIMEOUT_SECONDS = int(os.getenv("SANDBOX_TIMEOUT_SECONDS", str(20 * 60)))  # 单次转换的墙钟时间上限
+SANDBOX_RSS_RECYCLE_MB = int(os.getenv("SANDBOX_RSS_RECYCLE_MB", "1024"))  # RSS超过该值时回收子进程
+SANDBOX_MAX_JOBS = int(os.getenv("SANDBOX_MAX_JOBS", "200"))  # 子进程最多处理的任务数
+
+# 断点续转：长PDF按页区间分段转换，每段结果作为检查点写入存储，重试/重新投递时从已完成的区间继续
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_PAGES_PER_SECTION = max(int(os.getenv("CHECKPOINT_PAGES_PER_SECTION", "20")), 1)
+CHECKPOINT_MIN_PAGES = int(os.getenv("CHECKPOINT_MIN_PAGES", "40"))  # 页数少于该值时整体转换
+# 尽力而为的转换时限（创建任务时指定max_latency_ms）：PDF每次转换的页数，越小越接近时限
+DEADLINE_PAGES_PER_STEP = max(int(os.getenv("DEADLINE_PAGES_PER_STEP", "5")), 1)
+# 任务执行完才确认消息（acks_late），broker未确认消息的可见性超时需大于任务硬超时加重试等待时间
+CELERY_VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", "3600"))
+
+# 流式转换器：列出的扩展名先于MarkItDown按块转换，内存占用与文件大小无关（不经过沙箱）
+STREAMING_CONVERTER_EXTENSIONS = [
+    ext.strip().lower() for ext in os.getenv("STREAMING_CONVERTER_EXTENSIONS", ".csv,.json,.txt").split(",") if ext.strip()
+]
+
+# HTML快速转换引擎（基于lxml，输出与MarkItDown一致，未安装lxml时自动使用MarkItDown）
+FAST_HTML_ENABLED = os.getenv("FAST_HTML_ENABLED", "true").lower() == "true"
+# EPUB章节并行转换：章节进程池属于执行转换的进程（启用沙箱时为沙箱子进程，各章节进程平分 SANDBOX_MEMORY_LIMIT_MB）
+EPUB_CHAPTER_WORKERS = int(os.getenv("EPUB_CHAPTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+EPUB_PARALLEL_MIN_CHAPTERS = int(os.getenv("EPUB_PARALLEL_MIN_CHAPTERS", "8"))  # 章节数少于该值时串行转换
+
+# 图像提取配置
+IMAGE_UPLOAD_CONCURRENCY = int(os.getenv("IMAGE_UPLOAD_CONCURRENCY", "8"))
+# 图像链接写入保存的Markdown，必须长期有效：为空时链接到API的图像路由
+# （STORAGE_PUBLIC_BASE_URL + IMAGE_ROUTE_PREFIX/{sha256}{ext}），每次访问时重定向到新生成的预签名URL
+IMAGE_PUBLIC_BASE_URL = os.getenv("IMAGE_PUBLIC_BASE_URL", "")
+IMAGE_ROUTE_PREFIX = "/api/v1/images"
+IMAGE_URL_EXPIRE_SECONDS = int(os.getenv("IMAGE_URL_EXPIRE_SECONDS", "3600"))  # 图像路由重定向的预签名URL有效期
+
+# 分片上传配置（S3要求除最后一片外每片不小于5MB，最多10000片）
+MULTIPART_THRESHOLD = int(os.getenv("MULTIPART_THRESHOLD", str(16 * 1024 * 1024)))  # 16MB
+MULTIPART_PART_SIZE = max(int(os.getenv("MULTIPART_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+MULTIPART_MAX_PARTS = 10000
+
+# 结果代理下载配置（/async/result/{task_id}）
+RESULT_STREAM_CHUNK_SIZE = int(os.getenv("RESULT_STREAM_CHUNK_SIZE", str(256 * 1024)))
+# 结果文件写入后不再变化；前置CDN且已处理鉴权时可改为 "public, max-age=86400, immutable"
+RESULT_CACHE_CONTROL = os.getenv("RESULT_CACHE_CONTROL", "private, max-age=3600")
+
+# 小结果内联：不超过该大小的结果存入Redis并直接在任务状态中返回，不上传对象存储（0为关闭，依赖Redis）
+INLINE_RESULT_MAX_BYTES = int(os.getenv("INLINE_RESULT_MAX_BYTES", "0" if TASK_RUNTIME == "local" else str(64 * 1024)))
+INLINE_RESULT_TTL_SECONDS = int(os.getenv("INLINE_RESULT_TTL_SECONDS", "3600"))  # 与任务结果过期时间一致
+INLINE_RESULT_GZIP = os.getenv("INLINE_RESULT_GZIP", "true").lower() == "true"  # 压缩后存入Redis
+
+# 任务分组（创建任务时指定group_id，按分组打包下载结果，依赖Redis）
+TASK_GROUP_ENABLED = os.getenv("TASK_GROUP_ENABLED", "false" if TASK_RUNTIME == "local" else "true").lower() == "true"
+TASK_GROUP_TTL_SECONDS = int(os.getenv("TASK_GROUP_TTL_SECONDS", "3600"))  # 与任务结果过期时间一致
+# 结果打包下载（/async/bundle）：边读取边压缩边发送，内存占用与任务数量无关
+BUNDLE_MAX_TASKS = int(os.getenv("BUNDLE_MAX_TASKS", "10000"))
+BUNDLE_COMPRESS_LEVEL = int(os.getenv("BUNDLE_COMPRESS_LEVEL", "6"))  # deflate压缩级别，0为不压缩
+
+# 任务完成回调（创建任务时指定callback_url，由独立的投递进程 MODE=webhook 发送，依赖Redis）
+WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false" if TASK_RUNTIME == "local" else "true").lower() == "true"
+# 回调请求的签名密钥（签名方案与API认证相同），必须与API_SECRET_KEY不同，否则回调请求可以被当作API请求重放
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "your-webhook-secret-change-this-in-production")
+# 允许的回调主机（逗号分隔）：为空时允许任意只解析到公网地址的主机；列表中的主机不检查解析结果（用于内网接收端）
+WEBHOOK_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))  # 同一地址每个请求最多携带的事件数
+WEBHOOK_BATCH_WAIT_SECONDS = float(os.getenv("WEBHOOK_BATCH_WAIT_SECONDS", "0.5"))  # 首个事件到达后等待合并的时间
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "32"))  # 同时投递的地址数（连接池大小）
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))  # 指数退避的初始间隔
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "600"))
+WEBHOOK_EVENT_TTL_SECONDS = int(os.getenv("WEBHOOK_EVENT_TTL_SECONDS", str(24 * 3600)))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "0.5"))
+
+# URL 抓取配置
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "4"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", "256"))
 
 # CORS 配置
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
+CORS_EXPOSE_HEADERS = ["ETag", "Content-Range", "Accept-Ranges", "Content-Disposition"]
 
 # API认证配置
 API_SECRET_KEY = os.getenv("API_SECRET_KEY", "your-secret-key-change-this-in-production")
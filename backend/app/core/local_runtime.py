@@ -0,0 +1,346 @@
+"""
+无broker的本地任务运行时（TASK_RUNTIME=local）
+
+适用于单容器/单节点部署：不需要Redis和独立的Celery worker。
+- 任务队列持久化在SQLite中，进程重启后未完成的任务会重新执行
+- API进程内的asyncio调度器从队列拾取任务，交给进程池执行
+- 子进程通过 task.apply() 运行与Celery worker相同的任务代码
+- 任务状态和结果写入同一SQLite文件中的Celery结果后端，AsyncResult及状态查询接口不变
+
+与Celery运行时的差异：重试在子进程内立即执行（忽略countdown）；
+正在执行的任务无法被撤销，只能撤销仍在排队的任务。
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from celery.backends.base import KeyValueStoreBackend
+from kombu.utils.encoding import bytes_to_str
+from loguru import logger
+
+from app.core.config import (
+    LOCAL_RUNTIME_DB,
+    LOCAL_RUNTIME_CONCURRENCY,
+    LOCAL_RUNTIME_MAX_TASKS_PER_CHILD,
+    LOCAL_RUNTIME_POLL_SECONDS,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_queue (
+    task_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    owner INTEGER,
+    enqueued_at REAL NOT NULL,
+    started_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_task_queue_state ON task_queue (state, enqueued_at);
+CREATE TABLE IF NOT EXISTS task_results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+"""
+
+
+def connect(path: str = LOCAL_RUNTIME_DB) -> sqlite3.Connection:
+    """打开SQLite连接（WAL模式，允许API进程与子进程并发读写）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SQLiteResultBackend(KeyValueStoreBackend):
+    """
+    基于SQLite的Celery结果后端
+
+    在 TASK_RUNTIME=local 时由 app.core.worker 配置为结果后端，
+    连接按线程和进程分别创建。
+    """
+
+    # 过期结果在写入时顺带清理
+    CLEANUP_EVERY = 500
+
+    def __init__(self, app=None, url=None, **kwargs):
+        super().__init__(app=app, url=url, **kwargs)
+        self.path = LOCAL_RUNTIME_DB
+        self.expires = self.prepare_expires(None, type=int)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = connect(self.path)
+            self._local.pid = pid
+        return self._local.conn
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT value FROM task_results WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (bytes_to_str(key), time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        expires_at = time.time() + self.expires if self.expires else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO task_results (key, value, expires_at) VALUES (?, ?, ?)",
+            (bytes_to_str(key), value, expires_at),
+        )
+        self._writes += 1
+        if self._writes % self.CLEANUP_EVERY == 0:
+            self.conn.execute("DELETE FROM task_results WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, key):
+        self.conn.execute("DELETE FROM task_results WHERE key = ?", (bytes_to_str(key),))
+
+    def incr(self, key):
+        key = bytes_to_str(key)
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM task_results WHERE key = ?", (key,)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute("INSERT OR REPLACE INTO task_results (key, value) VALUES (?, ?)", (key, str(value)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def expire(self, key, value):
+        self.conn.execute(
+            "UPDATE task_results SET expires_at = ? WHERE key = ?",
+            (time.time() + value, bytes_to_str(key)),
+        )
+
+
+def _init_child():
+    """子进程启动时预先导入任务模块（转换器只加载一次）"""
+    import app.tasks.markdown_tasks  # noqa: F401
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def execute_task(name: str, args: list, task_id: str) -> str:
+    """在子进程中执行任务，状态与结果由任务的结果后端记录"""
+    from app.core.worker import celery_app
+
+    result = celery_app.tasks[name].apply(args=args, task_id=task_id)
+    return result.state
+
+
+class LocalTaskRuntime:
+    """进程内asyncio调度器 + 进程池，队列持久化在SQLite中"""
+
+    def __init__(self, path: str = LOCAL_RUNTIME_DB, concurrency: int = LOCAL_RUNTIME_CONCURRENCY,
+                 max_tasks_per_child: int = LOCAL_RUNTIME_MAX_TASKS_PER_CHILD,
+                 poll_seconds: float = LOCAL_RUNTIME_POLL_SECONDS):
+        self.path = path
+        self.concurrency = max(concurrency, 1)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.poll_seconds = poll_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+        return self._conn
+
+    # --- 提交与撤销（在请求处理中调用） ---
+
+    def submit(self, name: str, args: list, task_id: str) -> str:
+        """将任务写入持久化队列并唤醒调度器"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO task_queue (task_id, name, args, enqueued_at) VALUES (?, ?, ?, ?)",
+                (task_id, name, json.dumps(args), time.time()),
+            )
+        self._notify()
+        return task_id
+
+    def revoke(self, task_id: str) -> bool:
+        """撤销仍在排队的任务"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM task_queue WHERE task_id = ? AND state = 'queued'", (task_id,)
+            )
+        if cursor.rowcount:
+            from app.core.worker import celery_app
+            celery_app.backend.mark_as_revoked(task_id, reason='revoked')
+            return True
+        return False
+
+    def queue_length(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM task_queue WHERE state = 'queued'").fetchone()[0]
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- 调度 ---
+
+    async def start(self):
+        """启动调度器，并恢复上次退出时未完成的任务"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._executor = self._create_executor()
+        # 预先启动子进程并导入转换器，避免第一批任务承担启动开销
+        for _ in range(self.concurrency):
+            self._executor.submit(_warmup)
+        recovered = await asyncio.to_thread(self._recover)
+        if recovered:
+            logger.warning(f"恢复 {recovered} 个未完成的本地任务")
+        self._scheduler = asyncio.create_task(self._schedule())
+        logger.info(f"本地任务运行时已启动: 并发 {self.concurrency}, 队列 {self.path}")
+
+    async def stop(self):
+        """停止调度器；执行中的任务在下次启动时重新执行"""
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._loop = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # API进程已有事件循环和线程，使用spawn避免fork带来的状态复制
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_child,
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+
+    def _recover(self) -> int:
+        """将所属进程已不存在的执行中任务放回队列"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT task_id, owner FROM task_queue WHERE state = 'running'"
+            ).fetchall()
+            stale = [task_id for task_id, owner in rows if owner == os.getpid() or not _pid_alive(owner)]
+            for task_id in stale:
+                self.conn.execute(
+                    "UPDATE task_queue SET state = 'queued', owner = NULL WHERE task_id = ?", (task_id,)
+                )
+        return len(stale)
+
+    def _claim(self, limit: int) -> List[tuple]:
+        """原子地领取最多limit个排队任务（多个API进程共享队列时不会重复执行）"""
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT task_id, name, args FROM task_queue WHERE state = 'queued' "
+                    "ORDER BY enqueued_at LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                for task_id, _, _ in rows:
+                    conn.execute(
+                        "UPDATE task_queue SET state = 'running', owner = ?, started_at = ? WHERE task_id = ?",
+                        (os.getpid(), time.time(), task_id),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [(task_id, name, json.loads(args)) for task_id, name, args in rows]
+
+    def _finish(self, task_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM task_queue WHERE task_id = ?", (task_id,))
+
+    async def _schedule(self):
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    for task_id, name, args in await asyncio.to_thread(self._claim, free):
+                        self._running[task_id] = asyncio.create_task(self._execute(task_id, name, args))
+                except Exception as e:
+                    logger.error(f"领取本地任务失败: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, task_id: str, name: str, args: list):
+        try:
+            state = await self._loop.run_in_executor(self._executor, execute_task, name, args, task_id)
+            logger.info(f"本地任务 {task_id} 结束: {state}")
+        except BrokenProcessPool as e:
+            # 子进程被系统杀死（如OOM）时整个进程池不可用，记录失败并重建进程池
+            logger.error(f"本地任务 {task_id} 执行进程异常退出: {str(e)}")
+            self._mark_failed(task_id, e)
+            if self._executor is not None and getattr(self._executor, '_broken', False):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+        except Exception as e:
+            logger.error(f"本地任务 {task_id} 执行失败: {str(e)}")
+            self._mark_failed(task_id, e)
+        finally:
+            self._running.pop(task_id, None)
+            try:
+                await asyncio.to_thread(self._finish, task_id)
+            except Exception as e:
+                logger.warning(f"移除本地任务记录失败 {task_id}: {str(e)}")
+            self._wakeup.set()
+
+    @staticmethod
+    def _mark_failed(task_id: str, exc: Exception):
+        from app.core.worker import celery_app
+        try:
+            celery_app.backend.mark_as_failure(task_id, exc)
+        except Exception as e:
+            logger.warning(f"记录任务失败状态失败 {task_id}: {str(e)}")
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 全局运行时实例（仅在 TASK_RUNTIME=local 时启动）
+local_runtime = LocalTaskRuntime()
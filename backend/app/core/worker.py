@@ -1,11 +1,24 @@
 from celery import Celery
-from app.core.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
+from app.core.config import (
+    CELERY_BROKER_URL,
+    CELERY_RESULT_BACKEND,
+    TASK_RUNTIME,
+    CELERY_VISIBILITY_TIMEOUT,
+    PIPELINE_NODE,
+    PIPELINE_QUEUE_PREFIX,
+)
+
+# 任务名称：API层按名称投递任务，不导入转换器代码
+CONVERT_TASK_NAME = 'app.tasks.markdown_tasks.convert_file_to_markdown'
+
+LOCAL_RUNTIME = TASK_RUNTIME == 'local'
 
 celery_app = Celery(
     'markdown_converter',
-    broker=CELERY_BROKER_URL,
-    backend=CELERY_RESULT_BACKEND,
-    include=['app.tasks.markdown_tasks']
+    # 本地运行时不经过broker，任务状态写入本地SQLite结果后端
+    broker='memory://' if LOCAL_RUNTIME else CELERY_BROKER_URL,
+    backend='app.core.local_runtime:SQLiteResultBackend' if LOCAL_RUNTIME else CELERY_RESULT_BACKEND,
+    include=['app.tasks.markdown_tasks', 'app.tasks.pipeline_tasks']
 )
 
 # 配置Celery
@@ -20,5 +33,32 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25分钟软超时
     result_expires=3600,  # 结果过期时间1小时
     worker_prefetch_multiplier=1,
+    # 转换任务使用acks_late：执行期间消息保持未确认，超过可见性超时会被重新投递，需大于任务硬超时
+    broker_transport_options={'visibility_timeout': CELERY_VISIBILITY_TIMEOUT},
     worker_max_tasks_per_child=1000,
-)
\ No newline at end of file
+    # 使用 --autoscale=max,min 启动时生效：按队列积压和预测内存伸缩进程池
+    worker_autoscaler='app.core.autoscale:MemoryAwareAutoscaler',
+    # 本地运行时通过 task.apply() 执行，需要保存其状态和结果
+    task_store_eager_result=LOCAL_RUNTIME,
+)
+
+
+def submit_task(name: str, args: list, task_id: str, queue: str = None):
+    """按配置的运行时投递任务（queue为空时使用默认队列，本地运行时忽略）"""
+    if LOCAL_RUNTIME:
+        from app.core.local_runtime import local_runtime
+        return local_runtime.submit(name, args, task_id)
+    return celery_app.send_task(name, args=args, task_id=task_id, queue=queue)
+
+
+def pipeline_queue(stage: str, node: str = PIPELINE_NODE) -> str:
+    """流水线模式下节点的阶段队列：cpu（转换）/ io（上传）"""
+    return f"{PIPELINE_QUEUE_PREFIX}{stage}.{node}"
+
+
+def revoke_task(task_id: str):
+    """撤销任务（本地运行时只能撤销排队中的任务）"""
+    if LOCAL_RUNTIME:
+        from app.core.local_runtime import local_runtime
+        return local_runtime.revoke(task_id)
+    return celery_app.control.revoke(task_id, terminate=True)
\ No newline at end of file
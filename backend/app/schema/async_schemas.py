@@ -16,12 +16,93 @@ class UploadUrlResponse(BaseModel):
     expires_in: int = Field(..., description="URL过期时间（秒）")
 
 
+class MultipartInitRequest(BaseModel):
+    """初始化分片上传请求模型"""
+    filename: str = Field(..., description="文件名")
+    file_size: int = Field(..., gt=0, description="文件大小（字节）")
+    content_type: Optional[str] = Field(None, description="文件MIME类型")
+
+
+class MultipartPartUrl(BaseModel):
+    """分片上传URL"""
+    part_number: int = Field(..., description="分片序号（从1开始）")
+    upload_url: str = Field(..., description="分片预签名上传URL")
+
+
+class MultipartInitResponse(BaseModel):
+    """初始化分片上传响应模型"""
+    upload_id: str = Field(..., description="分片上传ID")
+    object_name: str = Field(..., description="MinIO中的对象名")
+    file_id: str = Field(..., description="文件ID")
+    part_size: int = Field(..., description="分片大小（字节）")
+    part_count: int = Field(..., description="分片数量")
+    parts: List[MultipartPartUrl] = Field(..., description="各分片上传URL")
+    expires_in: int = Field(..., description="URL过期时间（秒）")
+
+
+class MultipartPartsRequest(BaseModel):
+    """查询分片上传进度请求模型（断点续传）"""
+    object_name: str = Field(..., description="MinIO中的对象名")
+    upload_id: str = Field(..., description="分片上传ID")
+    part_count: int = Field(..., gt=0, description="分片数量")
+
+
+class MultipartPartsResponse(BaseModel):
+    """分片上传进度响应模型"""
+    upload_id: str = Field(..., description="分片上传ID")
+    uploaded_parts: List[int] = Field(..., description="已上传的分片序号")
+    parts: List[MultipartPartUrl] = Field(..., description="缺失分片的上传URL")
+    expires_in: int = Field(..., description="URL过期时间（秒）")
+
+
+class MultipartCompleteRequest(BaseModel):
+    """完成/取消分片上传请求模型"""
+    object_name: str = Field(..., description="MinIO中的对象名")
+    upload_id: str = Field(..., description="分片上传ID")
+    part_count: int = Field(0, ge=0, description="分片数量")
+
+
 class CreateTaskRequest(BaseModel):
     """创建转换任务请求模型"""
     object_name: str = Field(..., description="MinIO中的对象名")
     original_filename: str = Field(..., description="原始文件名")
     extract_images: bool = Field(False, description="是否提取图像内容")
     user_id: Optional[str] = Field(None, description="用户ID")
+    max_latency_ms: Optional[int] = Field(
+        None, gt=0, description="最长等待时间（毫秒，从创建任务开始计算），到期时返回已转换的部分结果（支持PDF和CSV/JSON/TXT）"
+    )
+    group_id: Optional[str] = Field(
+        None, min_length=1, max_length=128, pattern=r'^[\w.:-]+$', description="任务分组ID，可按分组打包下载结果"
+    )
+    callback_url: Optional[str] = Field(
+        None, max_length=2048, description="任务结束（完成或失败）后回调的地址，请求按API认证方式使用WEBHOOK_SECRET签名"
+    )
+
+
+class PrecheckRequest(BaseModel):
+    """上传前内容预检请求模型"""
+    sha256: str = Field(..., pattern=r'^[0-9a-fA-F]{64}$', description="文件内容的SHA-256（十六进制）")
+    size: int = Field(..., gt=0, description="文件大小（字节）")
+    filename: str = Field(..., description="原始文件名")
+    extract_images: bool = Field(False, description="是否提取图像内容")
+    user_id: Optional[str] = Field(
+        None,
+        description="用户ID，只匹配以同一user_id创建的任务登记的上传和结果，为空时不命中；"
+                    "服务端不认证该值，需要结果不被他人查询时应使用不可猜测的随机值"
+    )
+
+
+class PrecheckResponse(BaseModel):
+    """上传前内容预检响应模型"""
+    upload_exists: bool = Field(..., description="是否已有相同内容的上传文件")
+    object_name: Optional[str] = Field(None, description="已有上传文件的对象名，可直接用于创建任务")
+    task_id: Optional[str] = Field(None, description="相同参数已完成的转换任务ID，可直接查询结果")
+
+
+class BundleRequest(BaseModel):
+    """结果打包下载请求模型（task_ids 与 group_id 二选一）"""
+    task_ids: List[str] = Field([], description="任务ID列表，按顺序打包")
+    group_id: Optional[str] = Field(None, description="任务分组ID")
 
 
 class TaskResponse(BaseModel):
@@ -47,3 +128,31 @@ class DownloadResponse(BaseModel):
     download_url: str = Field(..., description="下载链接")
     filename: str = Field(..., description="文件名")
     expires_in: int = Field(..., description="过期时间（秒）")
+
+
+class SectionInfo(BaseModel):
+    """章节索引条目"""
+    id: int = Field(..., description="章节ID")
+    level: int = Field(..., description="标题层级（0为第一个标题前的内容）")
+    title: str = Field(..., description="标题文本")
+    start: int = Field(..., description="起始字节偏移")
+    end: int = Field(..., description="结束字节偏移（不含），包含子章节")
+    parent: Optional[int] = Field(None, description="上级章节ID")
+    tokens: int = Field(..., description="估算token数")
+    page: Optional[int] = Field(None, description="起始页码/幻灯片编号")
+
+
+class PageInfo(BaseModel):
+    """分页/幻灯片边界"""
+    number: int = Field(..., description="页码或幻灯片编号")
+    start: int = Field(..., description="起始字节偏移")
+    end: int = Field(..., description="结束字节偏移（不含）")
+
+
+class SectionIndexResponse(BaseModel):
+    """结果章节索引响应模型"""
+    version: int = Field(..., description="索引格式版本")
+    size: int = Field(..., description="结果文件字节数")
+    tokens: int = Field(..., description="估算总token数")
+    sections: List[SectionInfo] = Field(..., description="章节列表")
+    pages: List[PageInfo] = Field(..., description="分页/幻灯片列表")
@@ -0,0 +1,89 @@
+import json
+from typing import Callable, Iterable, Optional
+
+from loguru import logger
+
+from app.core.config import CHECKPOINT_ENABLED
+from app.services.storage import storage
+
+CHECKPOINT_PREFIX = "checkpoints/"
+
+
+class ConversionCheckpoints:
+    """
+    转换检查点（按页区间保存的中间结果）
+
+    长文档分段转换时，每完成一个区间就把结果写入对象存储：
+    checkpoints/{task_id}/{phase}-{start:06d}-{end:06d}.json
+
+    对象名只由任务ID和页区间决定，重试、acks_late重新投递（任务ID不变）时按相同的名字找回已完成的区间，
+    重复执行同一区间也只是覆盖同一个对象。区间按顺序转换，第一个缺失的区间之后不再逐个查询存储。
+    """
+
+    def __init__(self, enabled: bool = CHECKPOINT_ENABLED):
+        self.enabled = enabled
+
+    @staticmethod
+    def object_name(task_id: str, phase: str, start: int, end: int) -> str:
+        return f"{CHECKPOINT_PREFIX}{task_id}/{phase}-{start:06d}-{end:06d}.json"
+
+    def load(self, object_name: str) -> Optional[dict]:
+        """读取检查点；不存在或读取失败时返回None（重新转换该区间）"""
+        try:
+            if not storage.object_exists(object_name):
+                return None
+            return json.loads(bytes(storage.download_file_to_memory(object_name)))
+        except Exception as e:
+            logger.warning(f"读取检查点失败 {object_name}: {str(e)}")
+            return None
+
+    def save(self, object_name: str, result: dict):
+        """写入检查点，失败只记录日志（只影响续转，不影响本次转换）"""
+        try:
+            storage.upload_file_from_memory(
+                object_name, json.dumps(result, ensure_ascii=False).encode('utf-8'), content_type="application/json"
+            )
+        except Exception as e:
+            logger.warning(f"保存检查点失败 {object_name}: {str(e)}")
+
+    def run(self, task_id: str) -> 'CheckpointedRun':
+        return CheckpointedRun(self, task_id)
+
+    def clear(self, object_names: Iterable[str]):
+        """转换完成后删除检查点"""
+        for object_name in object_names:
+            try:
+                storage.delete_object(object_name)
+            except Exception as e:
+                logger.warning(f"删除检查点失败 {object_name}: {str(e)}")
+
+
+class CheckpointedRun:
+    """一次分段转换：依次执行各区间，已有检查点的区间直接复用"""
+
+    def __init__(self, checkpoints: ConversionCheckpoints, task_id: str):
+        self.checkpoints = checkpoints
+        self.task_id = task_id
+        self.object_names = []
+        self.resumed = 0  # 从检查点恢复的区间数
+        self._probe = True
+
+    def section(self, phase: str, start: int, end: int, compute: Callable[[], dict]) -> dict:
+        object_name = self.checkpoints.object_name(self.task_id, phase, start, end)
+        self.object_names.append(object_name)
+        if self._probe:
+            result = self.checkpoints.load(object_name)
+            if result is not None:
+                self.resumed += 1
+                return result
+            self._probe = False
+        result = compute()
+        self.checkpoints.save(object_name, result)
+        return result
+
+    def clear(self):
+        self.checkpoints.clear(self.object_names)
+
+
+# 创建全局检查点实例
+conversion_checkpoints = ConversionCheckpoints()
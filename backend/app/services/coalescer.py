@@ -0,0 +1,186 @@
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from celery.result import AsyncResult
+from loguru import logger
+
+from app.core.config import COALESCE_ENABLED, COALESCE_TTL_SECONDS, TASK_ALIAS_TTL_SECONDS
+from app.services.redis_client import redis_client
+
+COALESCE_KEY_PREFIX = "coalesce:"
+TASK_ALIAS_KEY_PREFIX = "task_alias:"
+TASK_ALIASES_KEY_PREFIX = "task_aliases:"
+TASK_DELETED_KEY_PREFIX = "task_deleted:"
+ACQUIRE_ATTEMPTS = 3
+
+# 统计仍然有效的别名，顺便移除已过期的
+LIVE_ALIASES = """
+local function live_aliases(aliases_key, alias_prefix)
+    local live = 0
+    for _, alias_id in ipairs(redis.call('smembers', aliases_key)) do
+        if redis.call('exists', alias_prefix .. alias_id) == 1 then
+            live = live + 1
+        else
+            redis.call('srem', aliases_key, alias_id)
+        end
+    end
+    return live
+end
+"""
+# 合并键仍指向主任务、主任务未被删除时登记别名
+ATTACH_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] or redis.call('exists', KEYS[4]) == 1 then
+    return 0
+end
+redis.call('set', KEYS[2], ARGV[1], 'EX', ARGV[3])
+redis.call('sadd', KEYS[3], ARGV[2])
+redis.call('expire', KEYS[3], ARGV[3])
+return 1
+"""
+# 合并键仍是读取时的值（或已过期）时由新任务接管，避免两个请求同时成为主任务
+TAKEOVER_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current ~= false and current ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+end
+"""
+# 删除别名；主任务已被创建者删除且这是最后一个别名时返回1，由调用方清理主任务
+UNALIAS_SCRIPT = LIVE_ALIASES + """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+redis.call('del', KEYS[1])
+redis.call('srem', KEYS[2], ARGV[2])
+if live_aliases(KEYS[2], ARGV[3]) == 0 and redis.call('del', KEYS[3]) == 1 then
+    return 1
+end
+return 0
+"""
+# 标记主任务已删除（之后不再接受新别名），返回仍共享该任务的别名数
+RETIRE_SCRIPT = LIVE_ALIASES + """
+redis.call('set', KEYS[2], '1', 'EX', ARGV[2])
+return live_aliases(KEYS[1], ARGV[1])
+"""
+
+
+class ConversionCoalescer:
+    """
+    单飞（single-flight）任务合并
+
+    相同内容（对象ETag+大小）与相同转换参数的并发请求只提交一个Celery任务，
+    后续请求得到一个别名任务ID，查询时解析到正在运行的主任务，共享同一结果。
+
+    主任务记录引用它的别名（task_aliases:{主任务ID}）。删除主任务时若仍有别名，
+    只做删除标记，结果保留到最后一个别名被删除或过期。
+    """
+
+    def __init__(self, redis=redis_client, enabled: bool = COALESCE_ENABLED):
+        self.redis = redis
+        self.enabled = enabled
+        self._attach = redis.register_script(ATTACH_SCRIPT)
+        self._takeover = redis.register_script(TAKEOVER_SCRIPT)
+        self._release = redis.register_script(RELEASE_SCRIPT)
+        self._unalias = redis.register_script(UNALIAS_SCRIPT)
+        self._retire = redis.register_script(RETIRE_SCRIPT)
+
+    @staticmethod
+    def build_key(content_hash: str, size: int, options: dict) -> str:
+        """根据内容哈希和转换参数生成合并键"""
+        payload = json.dumps(
+            {"content": content_hash, "size": size, "options": options},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def acquire(self, key: str, task_id: str) -> str:
+        """
+        登记正在运行的任务；合并到已有任务时同时记录别名
+
+        Args:
+            key: 合并键
+            task_id: 新任务ID
+
+        Returns:
+            str: 实际执行转换的主任务ID；等于task_id时表示需要提交新任务
+        """
+        redis_key = f"{COALESCE_KEY_PREFIX}{key}"
+        for _ in range(ACQUIRE_ATTEMPTS):
+            if self.redis.set(redis_key, task_id, nx=True, ex=COALESCE_TTL_SECONDS):
+                return task_id
+
+            primary_id = self.redis.get(redis_key)
+            if primary_id and not AsyncResult(primary_id).ready() and self._attach(
+                keys=[
+                    redis_key,
+                    f"{TASK_ALIAS_KEY_PREFIX}{task_id}",
+                    f"{TASK_ALIASES_KEY_PREFIX}{primary_id}",
+                    f"{TASK_DELETED_KEY_PREFIX}{primary_id}",
+                ],
+                args=[primary_id, task_id, TASK_ALIAS_TTL_SECONDS],
+            ):
+                logger.info(f"合并重复转换请求: {task_id} -> {primary_id}")
+                return primary_id
+
+            # 主任务已结束、已删除或键已过期，由当前请求接管；键在此期间被其他请求改写时重新判断
+            if self._takeover(keys=[redis_key], args=[primary_id or "", task_id, COALESCE_TTL_SECONDS]):
+                return task_id
+
+        # 竞争激烈时不再合并，单独执行
+        return task_id
+
+    def release(self, key: str, task_id: str):
+        """任务结束后释放合并键（仅当键仍属于该任务时）"""
+        self._release(keys=[f"{COALESCE_KEY_PREFIX}{key}"], args=[task_id])
+
+    def resolve(self, task_id: str) -> str:
+        """将别名任务ID解析为主任务ID"""
+        if not self.enabled:
+            return task_id
+        return self.redis.get(f"{TASK_ALIAS_KEY_PREFIX}{task_id}") or task_id
+
+    def unalias(self, alias_id: str) -> Optional[Tuple[str, bool]]:
+        """
+        删除别名
+
+        Returns:
+            Optional[Tuple[str, bool]]: 不是别名时返回None；否则返回 (主任务ID, 是否需要清理主任务)，
+            主任务已被创建者删除且没有其他别名时需要清理
+        """
+        redis_key = f"{TASK_ALIAS_KEY_PREFIX}{alias_id}"
+        primary_id = self.redis.get(redis_key)
+        if not primary_id:
+            return None
+        released = self._unalias(
+            keys=[redis_key, f"{TASK_ALIASES_KEY_PREFIX}{primary_id}", f"{TASK_DELETED_KEY_PREFIX}{primary_id}"],
+            args=[primary_id, alias_id, TASK_ALIAS_KEY_PREFIX],
+        )
+        if released < 0:
+            # 别名在读取后已被删除或过期
+            return None
+        return primary_id, released == 1
+
+    def retire(self, task_id: str) -> int:
+        """
+        删除主任务前调用：标记任务已删除，不再接受新的别名
+
+        Returns:
+            int: 仍共享该任务的别名数；大于0时不应撤销任务或删除结果
+        """
+        if not self.enabled:
+            return 0
+        return self._retire(
+            keys=[f"{TASK_ALIASES_KEY_PREFIX}{task_id}", f"{TASK_DELETED_KEY_PREFIX}{task_id}"],
+            args=[TASK_ALIAS_KEY_PREFIX, TASK_ALIAS_TTL_SECONDS],
+        )
+
+
+# 创建全局任务合并实例
+conversion_coalescer = ConversionCoalescer()
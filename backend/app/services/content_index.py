@@ -0,0 +1,103 @@
+import hashlib
+import os
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import CONTENT_INDEX_ENABLED, CONTENT_INDEX_TTL_SECONDS
+from app.services.redis_client import redis_client
+
+CONTENT_INDEX_KEY_PREFIX = "content:"
+OBJECT_FIELD = "object_name"
+
+
+class ContentIndex:
+    """
+    内容索引（上传前的哈希预检）
+
+    worker读取原始文件时计算SHA-256，按（用户+SHA-256+大小）记录原始对象名和已完成的转换任务。
+    前端上传前在本地计算同一哈希，命中已有上传时跳过上传，相同参数的转换结果也存在时直接复用任务。
+
+    索引只由worker根据实际读取的内容写入，客户端提交的哈希只用于查询。
+    条目按创建任务时的user_id分区，未指定user_id的任务不登记。user_id由客户端在请求体中提供，服务端不做认证，
+    不是访问控制边界：知道某个user_id和文件哈希的调用方可以查到对应的对象名和任务ID。
+    需要预检结果不被他人查询时，客户端应使用不可猜测的随机值作为user_id（如前端每个浏览器生成的UUID）。
+    """
+
+    def __init__(self, redis=redis_client, enabled: bool = CONTENT_INDEX_ENABLED,
+                 ttl_seconds: int = CONTENT_INDEX_TTL_SECONDS):
+        self.redis = redis
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _key(sha256: str, size: int, user_id: str) -> str:
+        scope = hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]
+        return f"{CONTENT_INDEX_KEY_PREFIX}{scope}:{sha256.lower()}:{size}"
+
+    @staticmethod
+    def result_field(filename: str, extract_images: bool) -> str:
+        """转换结果按文件名扩展名（决定识别出的格式）和图像提取参数区分"""
+        extension = os.path.splitext(filename or '')[1].lower()
+        return f"result:{extension}:{int(bool(extract_images))}"
+
+    def record(self, user_id: Optional[str], sha256: str, size: int, object_name: str, filename: str = None,
+               extract_images: bool = False, task_id: str = None):
+        """
+        登记原始文件（以及已完成的转换任务），失败只记录日志
+
+        Args:
+            user_id: 创建任务的用户ID，为空时不登记
+            sha256: worker计算的内容哈希
+            size: 内容大小
+            object_name: 原始文件对象名
+            filename: 原始文件名（登记任务时必填）
+            extract_images: 是否提取图像
+            task_id: 已成功完成的转换任务ID（可选）
+        """
+        if not self.enabled or not user_id:
+            return
+        key = self._key(sha256, size, user_id)
+        mapping = {OBJECT_FIELD: object_name}
+        if task_id:
+            mapping[self.result_field(filename, extract_images)] = task_id
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"登记内容索引失败 {object_name}: {str(e)}")
+
+    def lookup(self, user_id: Optional[str], sha256: str, size: int, filename: str, extract_images: bool) -> dict:
+        """
+        查询该用户的内容索引
+
+        Returns:
+            dict: object_name / task_id，未命中的项为None；未启用、未指定用户或查询失败时均为None
+        """
+        found = {"object_name": None, "task_id": None}
+        if not self.enabled or not user_id:
+            return found
+        try:
+            object_name, task_id = self.redis.hmget(
+                self._key(sha256, size, user_id), [OBJECT_FIELD, self.result_field(filename, extract_images)]
+            )
+        except Exception as e:
+            logger.warning(f"查询内容索引失败: {str(e)}")
+            return found
+        found.update(object_name=object_name, task_id=task_id)
+        return found
+
+    def forget_task(self, user_id: Optional[str], sha256: str, size: int, filename: str, extract_images: bool):
+        """移除结果已过期或已失效的转换任务记录"""
+        if not self.enabled or not user_id:
+            return
+        try:
+            self.redis.hdel(self._key(sha256, size, user_id), self.result_field(filename, extract_images))
+        except Exception as e:
+            logger.warning(f"移除内容索引失败: {str(e)}")
+
+
+# 创建全局内容索引实例
+content_index = ContentIndex()
@@ -0,0 +1,164 @@
+"""
+文件内容识别
+
+根据文件头部的魔数识别真实格式，创建任务前只需读取对象的前几KB，
+扩展名与内容不符、无法识别或大小超限的上传在API层直接拒绝，不占用worker。
+"""
+import codecs
+import re
+from typing import Optional
+
+# 同一容器格式下的扩展名（仅凭文件头无法总是区分具体类型）
+ZIP_FAMILY = {'.zip', '.docx', '.pptx', '.xlsx', '.epub'}
+OLE_FAMILY = {'.doc', '.ppt', '.xls'}
+TEXT_FAMILY = {'.txt', '.csv', '.json', '.xml', '.html', '.htm'}
+
+# (偏移, 魔数, 扩展名)；较短、文本中也可能出现的魔数见 WEAK_SIGNATURES
+SIGNATURES = [
+    (0, b'\x89PNG\r\n\x1a\n', '.png'),
+    (0, b'\xff\xd8\xff', '.jpg'),
+    (0, b'GIF87a', '.gif'),
+    (0, b'GIF89a', '.gif'),
+    (0, b'II*\x00', '.tiff'),
+    (0, b'MM\x00*', '.tiff'),
+    (0, b'fLaC', '.flac'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', '.doc'),
+]
+# 弱魔数：扩展名为文本格式且内容可以作为文本时不据此改道（如以"ID3"开头的.txt）
+WEAK_SIGNATURES = [
+    (0, b'ID3', '.mp3'),
+]
+# 同一格式的等价扩展名
+EQUIVALENT_EXTENSIONS = {
+    '.jpg': {'.jpg', '.jpeg'},
+    '.doc': OLE_FAMILY,
+}
+# OOXML 各类型在压缩包中的目录
+OOXML_MARKERS = [
+    (b'word/', '.docx'),
+    (b'ppt/', '.pptx'),
+    (b'xl/', '.xlsx'),
+]
+# 无BOM文本中的控制字符（\t \n \r \f 除外）
+BINARY_CONTROL = re.compile(rb'[\x00-\x08\x0b\x0e-\x1a\x1c-\x1f]')
+
+
+class SniffResult:
+    """内容识别结果"""
+
+    def __init__(self, extension: str, family: set, weak: bool = False):
+        self.extension = extension  # 识别出的格式
+        self.family = family  # 与识别结果兼容的扩展名
+        self.weak = weak  # 依据文本中也可能出现的弱特征识别
+
+    def matches(self, extension: str) -> bool:
+        return extension in self.family
+
+    def __repr__(self):
+        return f"SniffResult({self.extension})"
+
+
+def _sniff_zip(head: bytes) -> SniffResult:
+    # EPUB 要求第一个条目是未压缩的 mimetype 文件
+    if head[30:38] == b'mimetype' and b'application/epub+zip' in head[38:100]:
+        return SniffResult('.epub', {'.epub'})
+    if b'[Content_Types].xml' in head:
+        for marker, extension in OOXML_MARKERS:
+            if marker in head:
+                return SniffResult(extension, {extension})
+        # 目录名不在文件头范围内：只能确定是OOXML
+        return SniffResult('.docx', {'.docx', '.pptx', '.xlsx'})
+    return SniffResult('.zip', ZIP_FAMILY)
+
+
+def _sniff_text(head: bytes) -> Optional[SniffResult]:
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8):]
+    # 不要求UTF-8：GBK等编码的文本同样交给转换器处理
+    if BINARY_CONTROL.search(head):
+        return None
+
+    # 文本格式之间互相兼容（如内容为JSON的.txt），识别结果仅用于扩展名为二进制格式时改道
+    stripped = head.lstrip().lower()
+    if stripped.startswith((b'<!doctype html', b'<html')):
+        return SniffResult('.html', TEXT_FAMILY)
+    if stripped.startswith(b'<?xml'):
+        return SniffResult('.xml', TEXT_FAMILY)
+    if stripped.startswith((b'{', b'[')):
+        return SniffResult('.json', TEXT_FAMILY)
+    return SniffResult('.txt', TEXT_FAMILY)
+
+
+def _is_bmp(head: bytes, size: Optional[int]) -> bool:
+    # "BM" 后是整个文件的字节数（小端），只有与对象大小一致时才认为是BMP
+    return head[:2] == b'BM' and len(head) >= 14 and size is not None and int.from_bytes(head[2:6], 'little') == size
+
+
+def sniff_format(head: bytes, size: Optional[int] = None) -> Optional[SniffResult]:
+    """
+    根据文件头识别格式
+
+    Args:
+        head: 文件开头的若干字节（建议不少于4KB）
+        size: 文件大小，未知时不识别BMP
+
+    Returns:
+        SniffResult: 识别结果，无法识别的二进制内容返回None
+    """
+    for offset, magic, extension in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return SniffResult(extension, EQUIVALENT_EXTENSIONS.get(extension, {extension}))
+    for offset, magic, extension in WEAK_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return SniffResult(extension, {extension}, weak=True)
+
+    if head.startswith(b'PK\x03\x04'):
+        return _sniff_zip(head)
+    if head.startswith(b'%PDF-'):
+        return SniffResult('.pdf', {'.pdf'})
+    # PDF 规范允许 %PDF- 前有少量垃圾字节；文本中提到 %PDF- 不算
+    if b'%PDF-' in head[:1024] and _sniff_text(head) is None:
+        return SniffResult('.pdf', {'.pdf'})
+    if _is_bmp(head, size):
+        return SniffResult('.bmp', {'.bmp'}, weak=True)
+    if head[:4] == b'RIFF':
+        if head[8:12] == b'WEBP':
+            return SniffResult('.webp', {'.webp'})
+        if head[8:12] == b'WAVE':
+            return SniffResult('.wav', {'.wav'})
+    if head[4:8] == b'ftyp' and head[8:11] in (b'M4A', b'M4B', b'mp4', b'iso'):
+        return SniffResult('.m4a', {'.m4a'})
+    # UTF-16 BOM 与MP3帧同步字重叠，需先判断
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return SniffResult('.txt', TEXT_FAMILY)
+    # 无ID3标签的MP3：帧同步字
+    if len(head) >= 2 and head[0] == 0xff and head[1] & 0xe0 == 0xe0:
+        return SniffResult('.mp3', {'.mp3'}, weak=True)
+
+    return _sniff_text(head)
+
+
+def resolve_extension(claimed_extension: str, head: bytes, size: Optional[int] = None):
+    """
+    根据文件头确定实际用于转换的扩展名（可识别的格式均为支持的格式）
+
+    Args:
+        claimed_extension: 文件名中的扩展名
+        head: 文件开头的若干字节
+        size: 文件大小
+
+    Returns:
+        tuple: (转换使用的扩展名, 识别结果)；内容无法识别时均为None
+    """
+    result = sniff_format(head, size)
+    if result is None:
+        return None, None
+    # 弱特征不推翻文本扩展名：以"BMI,"开头的CSV、以"ID3"开头的TXT仍按文本转换
+    if result.weak and claimed_extension in TEXT_FAMILY:
+        text_result = _sniff_text(head)
+        if text_result is not None:
+            return claimed_extension, text_result
+    # 扩展名与内容兼容时保留原扩展名（如ZIP容器中无法从文件头区分的具体类型）
+    if result.matches(claimed_extension):
+        return claimed_extension, result
+    return result.extension, result
@@ -0,0 +1,112 @@
+import time
+from typing import Iterable, Iterator, Optional
+
+# 截断标记：HTML注释便于程序识别，引用块提示阅读者
+TRUNCATION_MARKER = "\n\n<!-- truncated -->\n> 内容已截断：在时限内转换了 {converted}/{total} {unit}\n"
+UNIT_LABELS = {
+    "pages": "页",
+    "bytes": "字节",
+}
+
+# 记录可以跨行的格式（带引号的字段内允许换行）
+QUOTED_RECORD_EXTENSIONS = {'.csv'}
+
+
+def _record_end(block: bytes) -> int:
+    """
+    最后一个位于引号外的换行之后的位置，没有时返回0（整块留到下一块）
+
+    块总是从记录开头开始（只在记录边界切分）；转义的引号（""）成对出现，不改变引号是否闭合
+    """
+    quotes = block.count(b'"')
+    end = len(block)
+    while True:
+        newline = block.rfind(b'\n', 0, end)
+        if newline < 0:
+            return 0
+        quotes -= block.count(b'"', newline, end)
+        if quotes % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+class ConversionDeadline:
+    """
+    尽力而为的转换时限（CreateTaskRequest.max_latency_ms）
+
+    时限从创建任务时开始计算（包含排队时间），worker渐进地转换：
+    - PDF按页区间转换，每个区间开始前检查时限
+    - 流式转换格式（CSV/JSON/TXT）到期后停止读取输入，已读取的内容照常转换完
+
+    到期时返回已转换的部分，附加截断标记，并在结果中记录覆盖范围。
+    至少转换第一个区间/数据块；其他格式无法部分转换，仍完整转换。
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.unit: Optional[str] = None  # 覆盖范围单位，不支持渐进转换的格式为None
+        self.converted = 0
+        self.total = 0
+
+    @classmethod
+    def from_task(cls, task_data: dict) -> Optional['ConversionDeadline']:
+        expires_at = task_data.get('deadline')
+        return cls(expires_at) if expires_at else None
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def track(self, unit: str, total: int):
+        """开始渐进转换"""
+        self.unit = unit
+        self.total = total
+        self.converted = 0
+
+    def reset(self):
+        """渐进转换失败改为整体转换时清除覆盖范围"""
+        self.unit = None
+        self.converted = self.total = 0
+
+    def limit_blocks(self, blocks: Iterable[bytes], total: int, extension: str = None) -> Iterator[bytes]:
+        """
+        按块读取输入，到期后停止读取；每块在最后一个换行处切分，截断时不输出半行内容
+
+        CSV的带引号字段可以包含换行，只在引号闭合处（记录边界）的换行切分，
+        截断时不输出半条记录（未闭合的引号会把后面的内容都并入同一字段）
+        """
+        self.track("bytes", total)
+        records = extension in QUOTED_RECORD_EXTENSIONS
+        carry = b''
+        for block in blocks:
+            if self.converted and self.expired():
+                return
+            block = carry + bytes(block) if carry else block
+            if records:
+                cut = _record_end(block)
+            else:
+                cut = block.rfind(b'\n') + 1 or len(block)
+            carry = block[cut:]
+            self.converted += cut
+            if cut:
+                yield block[:cut]
+        if carry:
+            self.converted += len(carry)
+            yield carry
+
+    @property
+    def truncated(self) -> bool:
+        return self.unit is not None and self.converted < self.total
+
+    def marker(self) -> str:
+        return TRUNCATION_MARKER.format(converted=self.converted, total=self.total, unit=UNIT_LABELS[self.unit])
+
+    def coverage(self) -> Optional[dict]:
+        """覆盖范围元数据，不支持渐进转换的格式为None"""
+        if self.unit is None:
+            return None
+        return {
+            "unit": self.unit,
+            "converted": self.converted,
+            "total": self.total,
+            "ratio": round(self.converted / self.total, 4) if self.total else 1.0,
+        }
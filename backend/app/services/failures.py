@@ -0,0 +1,154 @@
+"""
+转换失败分类
+
+- transient: 存储/网络/磁盘等临时故障、任务软超时、无法识别的异常，重试可能成功
+- permanent: 文件格式或内容问题、资源超限、缺少依赖等，重试结果相同，立即失败
+
+permanent 中由文件内容本身导致的失败（poison=True）会被隔离，
+后续相同内容的提交在API层直接拒绝。
+"""
+import socket
+import struct
+import sys
+import xml.etree.ElementTree as ElementTree
+import zipfile
+from typing import Optional
+
+import urllib3.exceptions
+from celery.exceptions import SoftTimeLimitExceeded
+from minio.error import S3Error
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# 沙箱资源超限：同一文件在相同限制下必然再次超限
+RESOURCE_LIMIT_ERRORS = {'memory_limit', 'cpu_limit', 'timeout'}
+# 对象不存在：重试无意义，但不是文件内容问题
+MISSING_OBJECT_CODES = {'NoSuchKey', 'NoSuchBucket', 'NoSuchUpload'}
+# 文件解析类异常（KeyError/IndexError 更常见于代码缺陷，不在此列）
+PARSE_ERRORS = (
+    ValueError,  # 包括 UnicodeDecodeError 以及转换器的各种格式校验
+    zipfile.BadZipFile,
+    ElementTree.ParseError,
+    EOFError,
+    struct.error,
+)
+NETWORK_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+    socket.gaierror,
+    urllib3.exceptions.HTTPError,
+    RedisConnectionError,
+    RedisTimeoutError,
+)
+# 沙箱子进程内分类为临时故障的类型（子进程只回传 error_type）
+TRANSIENT_ERROR_TYPES = {'soft_time_limit', 'storage_error', 'network_error', 'io_error', 'unknown'}
+
+
+class Failure:
+    """失败分类结果"""
+
+    def __init__(self, category: str, error_type: str, poison: bool = False):
+        self.category = category
+        self.error_type = error_type
+        self.poison = poison
+
+    @property
+    def retryable(self) -> bool:
+        return self.category == TRANSIENT
+
+    def __repr__(self):
+        return f"Failure({self.category}, {self.error_type}, poison={self.poison})"
+
+
+def _markitdown_failure(exc: BaseException) -> Optional[Failure]:
+    # 只在已加载markitdown的进程中识别（API进程不加载转换器，也不会产生这类异常）
+    markitdown = sys.modules.get('markitdown')
+    if markitdown is None:
+        return None
+    FileConversionException = markitdown.FileConversionException
+    MissingDependencyException = markitdown.MissingDependencyException
+    UnsupportedFormatException = markitdown.UnsupportedFormatException
+
+    if isinstance(exc, MissingDependencyException):
+        return Failure(PERMANENT, 'missing_dependency')
+    if isinstance(exc, UnsupportedFormatException):
+        return Failure(PERMANENT, 'unsupported_format', poison=True)
+    if isinstance(exc, FileConversionException):
+        # 转换器因缺少可选依赖而失败时是部署问题，不隔离文件
+        for attempt in getattr(exc, 'attempts', None) or []:
+            exc_info = getattr(attempt, 'exc_info', None)
+            if exc_info and isinstance(exc_info[1], MissingDependencyException):
+                return Failure(PERMANENT, 'missing_dependency')
+        return Failure(PERMANENT, 'corrupt_file', poison=True)
+    return None
+
+
+def _classify_one(exc: BaseException) -> Optional[Failure]:
+    if isinstance(exc, SoftTimeLimitExceeded):
+        # 长文档分段转换已保存检查点，重试从已完成的区间继续
+        return Failure(TRANSIENT, 'soft_time_limit')
+    sandbox = sys.modules.get('app.services.sandbox')
+    if sandbox is not None and isinstance(exc, sandbox.ConversionSandboxError):
+        if exc.kind in RESOURCE_LIMIT_ERRORS:
+            return Failure(PERMANENT, exc.kind, poison=True)
+        if exc.kind == 'conversion_error':
+            # 子进程内已按相同规则分类
+            cause = exc.cause or 'corrupt_file'
+            if cause in TRANSIENT_ERROR_TYPES:
+                return Failure(TRANSIENT, cause)
+            return Failure(PERMANENT, cause, poison=cause in ('unsupported_format', 'corrupt_file'))
+        return Failure(TRANSIENT, exc.kind)
+
+    failure = _markitdown_failure(exc)
+    if failure is not None:
+        return failure
+
+    if isinstance(exc, S3Error):
+        if exc.code in MISSING_OBJECT_CODES:
+            return Failure(PERMANENT, 'source_missing')
+        return Failure(TRANSIENT, 'storage_error')
+    if isinstance(exc, FileNotFoundError):
+        # 本地存储对象不存在
+        return Failure(PERMANENT, 'source_missing')
+    if isinstance(exc, MemoryError):
+        return Failure(PERMANENT, 'memory_limit', poison=True)
+    if isinstance(exc, NETWORK_ERRORS):
+        return Failure(TRANSIENT, 'network_error')
+    if isinstance(exc, OSError):
+        # 磁盘空间不足、文件句柄耗尽等环境问题
+        return Failure(TRANSIENT, 'io_error')
+    if isinstance(exc, PARSE_ERRORS):
+        return Failure(PERMANENT, 'corrupt_file', poison=True)
+    return None
+
+
+def _authoritative(exc: BaseException) -> bool:
+    """任务软超时与沙箱失败由本服务判定，出现在异常链任意位置都以其为准"""
+    if isinstance(exc, SoftTimeLimitExceeded):
+        return True
+    sandbox = sys.modules.get('app.services.sandbox')
+    return sandbox is not None and isinstance(exc, sandbox.ConversionSandboxError)
+
+
+def classify_failure(exc: BaseException) -> Failure:
+    """
+    分类异常
+
+    沿 __cause__ / __context__ 链找到最内层的根因，按根因分类（外层通常是
+    "转换失败" 之类的通用包装，不能代表失败原因）。根因无法识别时（代码缺陷等）
+    按临时故障处理，保持原有的重试行为，不会因外层的ValueError被当作文件问题隔离。
+    任务软超时和沙箱失败可能在处理其他异常时抛出，出现在链中任意位置都以其为准。
+    """
+    chain = []
+    current = exc
+    while current is not None and all(current is not seen for seen in chain):
+        chain.append(current)
+        current = current.__cause__ or current.__context__
+
+    for current in chain:
+        if _authoritative(current):
+            return _classify_one(current)
+    return _classify_one(chain[-1]) or Failure(TRANSIENT, 'unknown')
@@ -0,0 +1,252 @@
+"""
+MarkItDown快速转换器
+
+- FastHtmlConverter: HTML改用lxml快速引擎（app.services.fast_html），
+  引擎出错时MarkItDown会继续尝试内置的HtmlConverter
+- ParallelEpubConverter: EPUB章节在进程内共享的章节进程池中并行转换，按spine顺序拼接，
+  输出格式与MarkItDown的EpubConverter一致；转换进程受RLIMIT_AS限制（沙箱）时，
+  章节进程平分该上限，并计入沙箱回收判断的RSS
+
+转换服务、沙箱子进程与任务统一通过 create_markitdown() 创建MarkItDown实例。
+"""
+import io
+import multiprocessing
+import os
+import resource
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import markdownify
+from defusedxml import minidom
+from loguru import logger
+from markitdown import (
+    MarkItDown,
+    DocumentConverterResult,
+    StreamInfo,
+    PRIORITY_GENERIC_FILE_FORMAT,
+)
+from markitdown.converters import EpubConverter, HtmlConverter
+
+from app.core.config import (
+    FAST_HTML_ENABLED,
+    EPUB_CHAPTER_WORKERS,
+    EPUB_PARALLEL_MIN_CHAPTERS,
+)
+from app.services.fast_html import FAST_HTML_AVAILABLE, html_to_markdown
+
+# markdownify的转换参数；快速引擎只支持 keep_data_uris，传入其他参数时交给MarkItDown
+MARKDOWNIFY_OPTIONS = frozenset(
+    name for name in vars(markdownify.MarkdownConverter.DefaultOptions) if not name.startswith('_')
+)
+FAST_HTML_OPTIONS = frozenset({'keep_data_uris'})
+OWNER_CHECK_SECONDS = 1.0  # 章节进程检查转换进程是否存活的间隔
+CHAPTER_MIN_MEMORY = 384 * 1024 * 1024  # 章节进程平分的内存上限低于该值时不并行（进程本身约占200MB地址空间）
+CHAPTER_MIMETYPES = {
+    '.html': 'text/html',
+    '.xhtml': 'application/xhtml+xml',
+}
+
+
+def _markdownify_options(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in kwargs.items() if key in MARKDOWNIFY_OPTIONS}
+
+
+def _use_fast_html(options: Dict[str, Any]) -> bool:
+    return FAST_HTML_ENABLED and FAST_HTML_AVAILABLE and options.keys() <= FAST_HTML_OPTIONS
+
+
+class FastHtmlConverter(HtmlConverter):
+    """HTML → Markdown（lxml快速引擎）"""
+
+    def accepts(self, file_stream: BinaryIO, stream_info: StreamInfo, **kwargs: Any) -> bool:
+        if not _use_fast_html(_markdownify_options(kwargs)):
+            return False
+        return super().accepts(file_stream, stream_info, **kwargs)
+
+    def convert(self, file_stream: BinaryIO, stream_info: StreamInfo, **kwargs: Any) -> DocumentConverterResult:
+        markdown, title = html_to_markdown(
+            file_stream.read(),
+            stream_info.charset,
+            keep_data_uris=kwargs.get('keep_data_uris', False),
+        )
+        return DocumentConverterResult(markdown=markdown, title=title)
+
+
+def convert_chapter(content: bytes, filename: str, options: Dict[str, Any]) -> str:
+    """
+    转换一个EPUB章节（章节进程池任务）
+
+    Returns:
+        str: 去除首尾空白的Markdown，与MarkItDown的EpubConverter一致
+    """
+    if _use_fast_html(options):
+        try:
+            return html_to_markdown(content, keep_data_uris=options.get('keep_data_uris', False))[0]
+        except Exception as e:
+            logger.warning(f"快速引擎转换章节失败，改用MarkItDown: {filename}: {str(e)}")
+
+    extension = os.path.splitext(filename)[1].lower()
+    result = HtmlConverter().convert(
+        io.BytesIO(content),
+        StreamInfo(mimetype=CHAPTER_MIMETYPES.get(extension), extension=extension, filename=filename),
+        **options,
+    )
+    return result.markdown.strip()
+
+
+def _init_chapter_process(owner_pid: int, memory_limit: Optional[int]):
+    """章节进程初始化：限制地址空间，并在转换进程退出后随之退出"""
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    _exit_with_owner(owner_pid)
+
+
+def _exit_with_owner(owner_pid: int):
+    """
+    转换进程退出后随之退出
+
+    转换进程被强制终止时（沙箱超时、超出内存上限、回收子进程都会SIGKILL），
+    进程池来不及通知章节进程，而章节进程自身持有任务队列的两端，读不到EOF，需要自行检测。
+    """
+    def watch():
+        while True:
+            time.sleep(OWNER_CHECK_SECONDS)
+            try:
+                os.kill(owner_pid, 0)
+            except ProcessLookupError:
+                os._exit(0)
+
+    threading.Thread(target=watch, name="chapter-owner-watch", daemon=True).start()
+
+
+_chapter_pool: Optional[ProcessPoolExecutor] = None
+
+
+def chapter_memory_limit() -> Optional[int]:
+    """
+    每个章节进程的RLIMIT_AS
+
+    章节进程从forkserver继承转换进程的上限，不限制时一个EPUB任务最多可使用 (1+N) 倍的上限。
+    转换进程受限时由各章节进程平分，章节进程合计不超过转换进程的上限；不受限时为None
+    """
+    soft, _ = resource.getrlimit(resource.RLIMIT_AS)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return soft // EPUB_CHAPTER_WORKERS
+
+
+def get_chapter_pool() -> ProcessPoolExecutor:
+    """
+    获取当前进程的章节进程池（每个转换进程一个，首次使用时创建）
+
+    使用forkserver启动方式：转换进程可能有其他线程（API线程池），不直接fork；
+    forkserver预加载本模块，章节进程创建时无需重新导入MarkItDown。
+    """
+    global _chapter_pool
+    if _chapter_pool is None:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        _chapter_pool = ProcessPoolExecutor(
+            max_workers=EPUB_CHAPTER_WORKERS,
+            mp_context=context,
+            initializer=_init_chapter_process,
+            initargs=(os.getpid(), chapter_memory_limit()),
+        )
+    return _chapter_pool
+
+
+def chapter_pool_pids() -> List[int]:
+    """章节进程的PID（未创建进程池时为空）"""
+    if _chapter_pool is None:
+        return []
+    return list(getattr(_chapter_pool, '_processes', None) or ())
+
+
+def close_chapter_pool():
+    global _chapter_pool
+    if _chapter_pool is not None:
+        _chapter_pool.shutdown(wait=False, cancel_futures=True)
+        _chapter_pool = None
+
+
+class ParallelEpubConverter(EpubConverter):
+    """EPUB → Markdown，章节并行转换"""
+
+    def convert(self, file_stream: BinaryIO, stream_info: StreamInfo, **kwargs: Any) -> DocumentConverterResult:
+        with zipfile.ZipFile(file_stream, 'r') as z:
+            # 定位并解析content.opf
+            container_dom = minidom.parse(z.open('META-INF/container.xml'))
+            opf_path = container_dom.getElementsByTagName('rootfile')[0].getAttribute('full-path')
+            opf_dom = minidom.parse(z.open(opf_path))
+            metadata: Dict[str, Any] = {
+                'title': self._get_text_from_node(opf_dom, 'dc:title'),
+                'authors': self._get_all_texts_from_nodes(opf_dom, 'dc:creator'),
+                'language': self._get_text_from_node(opf_dom, 'dc:language'),
+                'publisher': self._get_text_from_node(opf_dom, 'dc:publisher'),
+                'date': self._get_text_from_node(opf_dom, 'dc:date'),
+                'description': self._get_text_from_node(opf_dom, 'dc:description'),
+                'identifier': self._get_text_from_node(opf_dom, 'dc:identifier'),
+            }
+
+            # spine顺序 → ZIP内的章节文件
+            manifest = {
+                item.getAttribute('id'): item.getAttribute('href')
+                for item in opf_dom.getElementsByTagName('item')
+            }
+            spine_order = [item.getAttribute('idref') for item in opf_dom.getElementsByTagName('itemref')]
+            base_path = '/'.join(opf_path.split('/')[:-1])
+            zip_names = set(z.namelist())
+            spine = [
+                self._resolve_manifest_href(manifest[item_id], base_path, zip_names)
+                for item_id in spine_order
+                if item_id in manifest
+            ]
+            chapters = [(z.read(name), os.path.basename(name)) for name in spine if name in zip_names]
+
+        markdown_content = self._convert_chapters(chapters, _markdownify_options(kwargs))
+
+        metadata_markdown = []
+        for key, value in metadata.items():
+            if isinstance(value, list):
+                value = ', '.join(value)
+            if value:
+                metadata_markdown.append(f'**{key.capitalize()}:** {value}')
+        markdown_content.insert(0, '\n'.join(metadata_markdown))
+
+        return DocumentConverterResult(markdown='\n\n'.join(markdown_content), title=metadata['title'])
+
+    @staticmethod
+    def _convert_chapters(chapters: List[tuple], options: Dict[str, Any]) -> List[str]:
+        """章节数达到阈值时并行转换，结果按spine顺序返回"""
+        memory_limit = chapter_memory_limit()
+        if (
+            EPUB_CHAPTER_WORKERS > 1
+            and len(chapters) >= EPUB_PARALLEL_MIN_CHAPTERS
+            and (memory_limit is None or memory_limit >= CHAPTER_MIN_MEMORY)
+        ):
+            contents = [content for content, _ in chapters]
+            filenames = [filename for _, filename in chapters]
+            chunksize = max(1, len(chapters) // (EPUB_CHAPTER_WORKERS * 4))
+            try:
+                return list(get_chapter_pool().map(
+                    convert_chapter, contents, filenames, [options] * len(chapters), chunksize=chunksize,
+                ))
+            except BrokenProcessPool as e:
+                # 章节进程异常退出（如超出资源限制），重建进程池，本次改为串行转换
+                logger.warning(f"章节进程池异常，改为串行转换: {str(e)}")
+                close_chapter_pool()
+        return [convert_chapter(content, filename, options) for content, filename in chapters]
+
+
+def create_markitdown() -> MarkItDown:
+    """创建注册了快速转换器的MarkItDown实例"""
+    markitdown = MarkItDown()
+    if FAST_HTML_ENABLED and FAST_HTML_AVAILABLE:
+        # 与内置HtmlConverter同优先级，后注册的先尝试；URL专用转换器（维基百科等）优先级更高，不受影响
+        markitdown.register_converter(FastHtmlConverter(), priority=PRIORITY_GENERIC_FILE_FORMAT)
+    markitdown.register_converter(ParallelEpubConverter())
+    return markitdown
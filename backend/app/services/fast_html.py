@@ -0,0 +1,665 @@
+"""
+HTML快速转换引擎
+
+基于lxml（libxml2 C解析器）解析HTML，直接遍历lxml树生成Markdown。
+输出规则与MarkItDown的HtmlConverter（markdownify + MarkItDown定制）保持一致：
+空白折叠、块级元素换行合并、*/_ 转义、标题/列表/表格/代码块/链接/图像格式等，
+差异可用 scripts/compare_html_engines.py 在语料上核对。
+
+与MarkItDown相比：
+    - 不经过BeautifulSoup，解析与遍历开销低一个数量级
+    - 迭代遍历，深层嵌套的文档不会触发RecursionError退化为纯文本
+    - XHTML（带XML声明）按XML解析，自闭合标签语义与html.parser一致
+
+lxml未安装时 FAST_HTML_AVAILABLE 为False，调用方回退到MarkItDown。
+"""
+import codecs
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote, urlparse, urlunparse
+
+try:
+    from lxml import etree
+    FAST_HTML_AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    etree = None
+    FAST_HTML_AVAILABLE = False
+
+# 转换前移除的元素（与MarkItDown一致，移除后前后文本成为相邻兄弟节点）
+REMOVED_TAGS = frozenset({'script', 'style'})
+# 块级元素：内部首尾及前后的空白文本被忽略
+BLOCK_TAGS = frozenset({
+    'p', 'blockquote', 'article', 'div', 'section', 'ol', 'ul', 'li',
+    'dl', 'dt', 'dd', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th',
+})
+HEADING_TAG = re.compile(r'h(\d+)')
+BULLETS = '*+-'
+
+NEWLINE_WHITESPACE = re.compile(r'[\t \r\n]*[\r\n][\t \r\n]*')
+WHITESPACE = re.compile(r'[\t ]+')
+ALL_WHITESPACE = re.compile(r'[\t \r\n]+')
+PRE_LSTRIP = re.compile(r'^[ \n]*\n')
+PRE_RSTRIP = re.compile(r'[ \n]*$')
+BACKTICK_RUNS = re.compile(r'`+')
+PERCENT_ENCODED_OCTET = re.compile(r'%[0-9A-Fa-f]{2}')
+BODY_TAG = re.compile(rb'<body[\s>/]', re.IGNORECASE)
+XML_DECLARATION = re.compile(rb'^\s*<\?xml[\s?]')
+DECLARED_CHARSET = re.compile(rb'''(?:<meta[^>]+charset|<\?xml[^>]+encoding)\s*=\s*["']?([\w.:-]+)''', re.IGNORECASE)
+DECLARED_CHARSET_WINDOW = 4096  # 只在文件头查找编码声明
+
+# 子节点上下文标志（对应markdownify的parent_tags）
+IN_PRE = 1  # 位于<pre>内：不折叠空白与换行
+NO_FORMAT = 2  # 位于pre/code/kbd/samp内：不转义、不加行内标记
+INLINE = 4  # 位于标题/表格单元格内：块级元素按行内输出
+IN_LI = 8  # 位于<li>内：嵌套列表
+
+# 注释、处理指令等非元素节点在兄弟序列中的占位
+_NODE = object()
+
+
+class _TagInfo:
+    """标签名对应的空白规则与子节点上下文"""
+
+    __slots__ = ('strip_inside', 'strip_outside', 'heading', 'child_flags', 'is_ul')
+
+    def __init__(self, name: str):
+        match = HEADING_TAG.match(name)
+        self.heading = int(match.group(1)) if match else 0
+        self.strip_inside = bool(match) or name in BLOCK_TAGS
+        self.strip_outside = self.strip_inside or name == 'pre'
+        flags = 0
+        if match or name in ('td', 'th'):
+            flags |= INLINE
+        if name in ('pre', 'code', 'kbd', 'samp'):
+            flags |= NO_FORMAT
+        if name == 'pre':
+            flags |= IN_PRE
+        if name == 'li':
+            flags |= IN_LI
+        self.child_flags = flags
+        self.is_ul = name == 'ul'
+
+
+class _Frame:
+    """遍历栈中的一个元素"""
+
+    __slots__ = ('el', 'name', 'flags', 'ul_depth', 'child_flags', 'child_ul_depth', 'entries', 'pos', 'strings')
+
+    def __init__(self, el, name: str, flags: int, ul_depth: int, info: _TagInfo, entries: list):
+        self.el = el
+        self.name = name
+        self.flags = flags  # 祖先元素决定的上下文
+        self.ul_depth = ul_depth  # 祖先中<ul>的个数
+        self.child_flags = flags | info.child_flags
+        self.child_ul_depth = ul_depth + info.is_ul
+        self.entries = entries
+        self.pos = 0
+        self.strings = []
+
+
+def _chomp(text: str) -> Tuple[str, str, str]:
+    """行内标记两侧的空格移到标记外"""
+    prefix = ' ' if text and text[0] == ' ' else ''
+    suffix = ' ' if text and text[-1] == ' ' else ''
+    return prefix, suffix, text.strip()
+
+
+def _quote_path(path: str) -> str:
+    """转义URL路径，保留已有的 %HH 编码"""
+    parts = []
+    last_end = 0
+    for match in PERCENT_ENCODED_OCTET.finditer(path):
+        parts.append(quote(path[last_end:match.start()]))
+        parts.append(match.group(0))
+        last_end = match.end()
+    parts.append(quote(path[last_end:]))
+    return ''.join(parts)
+
+
+def _prefix_lines(text: str, prefix: str, empty: str) -> str:
+    """为每个非空行加前缀，空行替换为empty"""
+    return '\n'.join(prefix + line if line else empty for line in text.split('\n'))
+
+
+def _colspan(el) -> int:
+    value = el.get('colspan')
+    if value is not None and value.isdigit():
+        return max(1, min(1000, int(value)))
+    return 1
+
+
+def _previous_element(el):
+    """前一个兄弟元素（跳过注释与已移除的元素）"""
+    for sibling in el.itersiblings(preceding=True):
+        if isinstance(sibling.tag, str) and sibling.tag not in REMOVED_TAGS:
+            return sibling
+    return None
+
+
+def _next_content_sibling(el):
+    """后一个有内容的兄弟节点：元素返回元素，非空白文本返回True"""
+    tail = el.tail
+    if tail and tail.strip():
+        return True
+    for sibling in el.itersiblings():
+        if isinstance(sibling.tag, str) and sibling.tag not in REMOVED_TAGS:
+            return sibling
+        tail = sibling.tail
+        if tail and tail.strip():
+            return True
+    return None
+
+
+def _collapse_newlines(strings: list) -> str:
+    """合并相邻子节点边界处的换行，最多保留两个"""
+    parts = ['']
+    for string in strings:
+        if string[0] != '\n' and string[-1] != '\n':
+            parts.append('')
+            parts.append(string)
+            parts.append('')
+            continue
+        content = string.lstrip('\n')
+        leading = len(string) - len(content)
+        stripped = content.rstrip('\n')
+        trailing = content[len(stripped):]
+        if parts[-1] and leading:
+            previous = len(parts.pop())
+            leading = min(2, max(previous, leading))
+        parts.append('\n' * leading)
+        parts.append(stripped)
+        parts.append(trailing)
+    return ''.join(parts)
+
+
+class FastHtmlMarkdown:
+    """lxml树 → Markdown（每次转换一个实例，不跨线程共享）"""
+
+    def __init__(self, keep_data_uris: bool = False):
+        self.keep_data_uris = keep_data_uris
+        self._tag_info = {}
+        self._converters = {
+            'a': self._convert_a,
+            'b': self._convert_strong,
+            'strong': self._convert_strong,
+            'em': self._convert_em,
+            'i': self._convert_em,
+            'del': self._convert_del,
+            's': self._convert_del,
+            'strike': self._convert_del,
+            'sub': self._convert_plain_inline,
+            'sup': self._convert_plain_inline,
+            'u': self._convert_u,
+            'code': self._convert_code,
+            'kbd': self._convert_code,
+            'samp': self._convert_code,
+            'blockquote': self._convert_blockquote,
+            'br': self._convert_br,
+            'div': self._convert_div,
+            'article': self._convert_div,
+            'section': self._convert_div,
+            'dl': self._convert_div,
+            'dd': self._convert_dd,
+            'dt': self._convert_dt,
+            'hr': self._convert_hr,
+            'img': self._convert_img,
+            'video': self._convert_video,
+            'input': self._convert_input,
+            'ul': self._convert_list,
+            'ol': self._convert_list,
+            'li': self._convert_li,
+            'p': self._convert_p,
+            'pre': self._convert_pre,
+            'q': self._convert_q,
+            'table': self._convert_table,
+            'caption': self._convert_caption,
+            'figcaption': self._convert_figcaption,
+            'td': self._convert_cell,
+            'th': self._convert_cell,
+            'tr': self._convert_tr,
+        }
+
+    def _info(self, name: str) -> _TagInfo:
+        info = self._tag_info.get(name)
+        if info is None:
+            info = self._tag_info[name] = _TagInfo(name)
+        return info
+
+    # ---- 遍历 ----
+
+    def convert_element(self, root) -> str:
+        """转换元素及其子树，返回未去除首尾空白的Markdown"""
+        stack = [self._frame(root, 0, 0)]
+        result = None
+        while stack:
+            frame = stack[-1]
+            if result is not None:
+                if result:
+                    frame.strings.append(result)
+                result = None
+            entries = frame.entries
+            while frame.pos < len(entries):
+                entry = entries[frame.pos]
+                frame.pos += 1
+                if entry.__class__ is str:
+                    frame.strings.append(entry)
+                else:
+                    stack.append(self._frame(entry, frame.child_flags, frame.child_ul_depth))
+                    break
+            else:
+                stack.pop()
+                result = self._finish(frame)
+        return result
+
+    def _frame(self, el, flags: int, ul_depth: int) -> _Frame:
+        """收集需要转换的子节点，文本节点在此直接处理"""
+        name = el.tag
+        info = self._info(name)
+        child_flags = flags | info.child_flags
+
+        # 兄弟序列：文本、元素、注释占位（script/style已移除，其前后文本保持相邻）
+        nodes = []
+        if el.text:
+            nodes.append(el.text)
+        for child in el:
+            tag = child.tag
+            if tag.__class__ is not str:
+                nodes.append(_NODE)
+            elif tag not in REMOVED_TAGS:
+                nodes.append(child)
+            if child.tail:
+                nodes.append(child.tail)
+
+        entries = []
+        last = len(nodes) - 1
+        for index, node in enumerate(nodes):
+            if node.__class__ is not str:
+                if node is not _NODE:
+                    entries.append(node)
+                continue
+            previous = nodes[index - 1] if index else None
+            following = nodes[index + 1] if index < last else None
+            strip_before = (previous is None and info.strip_inside) or self._strips_outside(previous)
+            strip_after = (following is None and info.strip_inside) or self._strips_outside(following)
+            if not node.strip() and (strip_before or strip_after):
+                continue
+            text = self._convert_text(node, child_flags, strip_before, strip_after)
+            if text:
+                entries.append(text)
+        return _Frame(el, name, flags, ul_depth, info, entries)
+
+    def _strips_outside(self, node) -> bool:
+        return node is not None and node.__class__ is not str and node is not _NODE \
+            and self._info(node.tag).strip_outside
+
+    @staticmethod
+    def _convert_text(text: str, flags: int, strip_before: bool, strip_after: bool) -> str:
+        if not flags & IN_PRE:
+            if '\n' in text or '\r' in text:
+                text = NEWLINE_WHITESPACE.sub('\n', text)
+            if '\t' in text or '  ' in text:
+                text = WHITESPACE.sub(' ', text)
+        if not flags & NO_FORMAT:
+            text = text.replace('*', r'\*').replace('_', r'\_')
+        if strip_before:
+            text = text.lstrip(' \t\r\n')
+        if strip_after:
+            text = text.rstrip()
+        return text
+
+    def _finish(self, frame: _Frame) -> str:
+        """合并子节点结果并应用当前元素的转换规则"""
+        if frame.name == 'pre' or frame.flags & IN_PRE:
+            text = ''.join(frame.strings)
+        else:
+            text = _collapse_newlines(frame.strings)
+        converter = self._converters.get(frame.name)
+        if converter is not None:
+            return converter(frame, text)
+        heading = self._info(frame.name).heading
+        if heading:
+            return self._convert_heading(frame, text, heading)
+        return text
+
+    # ---- 行内元素 ----
+
+    @staticmethod
+    def _inline(frame: _Frame, text: str, markup: str) -> str:
+        if frame.flags & NO_FORMAT:
+            return text
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ''
+        return f'{prefix}{markup}{text}{markup}{suffix}'
+
+    def _convert_strong(self, frame: _Frame, text: str) -> str:
+        return self._inline(frame, text, '**')
+
+    def _convert_em(self, frame: _Frame, text: str) -> str:
+        return self._inline(frame, text, '*')
+
+    def _convert_del(self, frame: _Frame, text: str) -> str:
+        return self._inline(frame, text, '~~')
+
+    def _convert_plain_inline(self, frame: _Frame, text: str) -> str:
+        return self._inline(frame, text, '')
+
+    @staticmethod
+    def _convert_u(frame: _Frame, text: str) -> str:
+        if not text.strip():
+            return text
+        prefix, suffix, text = _chomp(text)
+        return f'{prefix}<u>{text}</u>{suffix}'
+
+    @staticmethod
+    def _convert_code(frame: _Frame, text: str) -> str:
+        if frame.flags & NO_FORMAT:
+            return text
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ''
+        max_backticks = max((len(run) for run in BACKTICK_RUNS.findall(text)), default=0)
+        delimiter = '`' * (max_backticks + 1)
+        if max_backticks > 0:
+            text = f' {text} '
+        return f'{prefix}{delimiter}{text}{delimiter}{suffix}'
+
+    @staticmethod
+    def _convert_a(frame: _Frame, text: str) -> str:
+        """链接：跳过非http/https/file协议，转义路径"""
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ''
+        if frame.flags & IN_PRE:
+            return text
+
+        href = frame.el.get('href')
+        title = frame.el.get('title')
+        if href:
+            try:
+                parsed = urlparse(href)
+                if parsed.scheme and parsed.scheme.lower() not in ('http', 'https', 'file'):
+                    return f'{prefix}{text}{suffix}'
+                href = urlunparse(parsed._replace(path=_quote_path(parsed.path)))
+            except ValueError:
+                return f'{prefix}{text}{suffix}'
+
+        if text.replace(r'\_', '_') == href and not title:
+            return f'<{href}>'
+        if not href:
+            return text
+        title_part = ' "%s"' % title.replace('"', r'\"') if title else ''
+        return f'{prefix}[{text}]({href}{title_part}){suffix}'
+
+    def _convert_img(self, frame: _Frame, text: str) -> str:
+        """图像：默认截断data URI"""
+        el = frame.el
+        alt = el.get('alt') or ''
+        src = el.get('src') or ''
+        data_src = el.get('data-src') or ''
+        # 懒加载图像的src常为占位data URI，真实地址在data-src
+        if data_src and (not src or (src[:5].lower() == 'data:' and not self.keep_data_uris)):
+            src = data_src
+        title = el.get('title') or ''
+        title_part = ' "%s"' % title.replace('"', r'\"') if title else ''
+        alt = alt.replace('\n', ' ')
+        if src[:5].lower() == 'data:' and not self.keep_data_uris:
+            src = src.split(',')[0] + '...'
+        return f'![{alt}]({src}{title_part})'
+
+    @staticmethod
+    def _convert_video(frame: _Frame, text: str) -> str:
+        if frame.flags & INLINE:
+            return text
+        el = frame.el
+        src = el.get('src') or ''
+        if not src:
+            for source in el.iterdescendants('source'):
+                if source.get('src') is not None:
+                    src = source.get('src') or ''
+                    break
+        poster = el.get('poster') or ''
+        if src and poster:
+            return f'[![{text}]({poster})]({src})'
+        if src:
+            return f'[{text}]({src})'
+        if poster:
+            return f'![{text}]({poster})'
+        return text
+
+    @staticmethod
+    def _convert_input(frame: _Frame, text: str) -> str:
+        if frame.el.get('type') == 'checkbox':
+            return '[x] ' if frame.el.get('checked') is not None else '[ ] '
+        return ''
+
+    @staticmethod
+    def _convert_br(frame: _Frame, text: str) -> str:
+        if frame.flags & INLINE:
+            return text + ' ' if text else ' '
+        return '  \n' + text
+
+    @staticmethod
+    def _convert_q(frame: _Frame, text: str) -> str:
+        return '"' + text + '"'
+
+    # ---- 块级元素 ----
+
+    @staticmethod
+    def _convert_heading(frame: _Frame, text: str, level: int) -> str:
+        if frame.flags & INLINE:
+            return text
+        level = max(1, min(6, level))
+        text = ALL_WHITESPACE.sub(' ', text.strip())
+        return '\n\n%s %s\n\n' % ('#' * level, text)
+
+    @staticmethod
+    def _convert_p(frame: _Frame, text: str) -> str:
+        if frame.flags & INLINE:
+            return ' ' + text.strip(' \t\r\n') + ' '
+        text = text.strip(' \t\r\n')
+        return f'\n\n{text}\n\n' if text else ''
+
+    @staticmethod
+    def _convert_div(frame: _Frame, text: str) -> str:
+        if frame.flags & INLINE:
+            return ' ' + text.strip() + ' '
+        text = text.strip()
+        return f'\n\n{text}\n\n' if text else ''
+
+    @staticmethod
+    def _convert_blockquote(frame: _Frame, text: str) -> str:
+        text = text.strip(' \t\r\n')
+        if frame.flags & INLINE:
+            return ' ' + text + ' '
+        if not text:
+            return '\n'
+        return '\n' + _prefix_lines(text, '> ', '>') + '\n\n'
+
+    @staticmethod
+    def _convert_dd(frame: _Frame, text: str) -> str:
+        text = text.strip()
+        if frame.flags & INLINE:
+            return ' ' + text + ' '
+        if not text:
+            return '\n'
+        text = _prefix_lines(text, '    ', '')
+        return ':' + text[1:] + '\n'
+
+    @staticmethod
+    def _convert_dt(frame: _Frame, text: str) -> str:
+        text = ALL_WHITESPACE.sub(' ', text.strip())
+        if frame.flags & INLINE:
+            return ' ' + text + ' '
+        if not text:
+            return '\n'
+        return f'\n\n{text}\n'
+
+    @staticmethod
+    def _convert_hr(frame: _Frame, text: str) -> str:
+        return '\n\n---\n\n'
+
+    @staticmethod
+    def _convert_pre(frame: _Frame, text: str) -> str:
+        if not text:
+            return ''
+        text = PRE_RSTRIP.sub('', PRE_LSTRIP.sub('', text))
+        return f'\n\n```\n{text}\n```\n\n'
+
+    @staticmethod
+    def _convert_list(frame: _Frame, text: str) -> str:
+        if frame.flags & IN_LI:
+            return '\n' + text.rstrip()
+        following = _next_content_sibling(frame.el)
+        before_paragraph = following is True or (following is not None and following.tag not in ('ul', 'ol'))
+        return '\n\n' + text + ('\n' if before_paragraph else '')
+
+    @staticmethod
+    def _convert_li(frame: _Frame, text: str) -> str:
+        text = text.strip()
+        if not text:
+            return '\n'
+        el = frame.el
+        parent = el.getparent()
+        if parent is not None and parent.tag == 'ol':
+            start = parent.get('start')
+            start = int(start) if start and start.isnumeric() else 1
+            siblings = sum(1 for _ in el.itersiblings('li', preceding=True))
+            bullet = f'{start + siblings}.'
+        else:
+            bullet = BULLETS[(frame.ul_depth - 1) % len(BULLETS)]
+        bullet += ' '
+        text = _prefix_lines(text, ' ' * len(bullet), '')
+        return bullet + text[len(bullet):] + '\n'
+
+    # ---- 表格 ----
+
+    @staticmethod
+    def _convert_table(frame: _Frame, text: str) -> str:
+        return '\n\n' + text.strip() + '\n\n'
+
+    @staticmethod
+    def _convert_caption(frame: _Frame, text: str) -> str:
+        return text.strip() + '\n\n'
+
+    @staticmethod
+    def _convert_figcaption(frame: _Frame, text: str) -> str:
+        return '\n\n' + text.strip() + '\n\n'
+
+    @staticmethod
+    def _convert_cell(frame: _Frame, text: str) -> str:
+        return ' ' + text.strip().replace('\n', ' ') + ' |' * _colspan(frame.el)
+
+    @staticmethod
+    def _convert_tr(frame: _Frame, text: str) -> str:
+        """表格行：首行为表头时输出分隔线，缺少表头时补空表头"""
+        el = frame.el
+        parent = el.getparent()
+        parent_tag = parent.tag if parent is not None else None
+        cells = list(el.iterdescendants('td', 'th'))
+        is_first_row = _previous_element(el) is None
+        is_head_row = all(cell.tag == 'th' for cell in cells) or (
+            parent_tag == 'thead' and sum(1 for _ in parent.iterdescendants('tr')) == 1
+        )
+        if parent_tag == 'tbody':
+            grandparent = parent.getparent()
+            has_thead = grandparent is not None and next(grandparent.iterdescendants('thead'), None) is not None
+            is_head_row_missing = is_first_row and not has_thead
+        else:
+            is_head_row_missing = is_first_row
+        columns = sum(_colspan(cell) for cell in cells)
+
+        overline = underline = ''
+        if is_head_row and is_first_row:
+            underline = '| ' + ' | '.join(['---'] * columns) + ' |\n'
+        elif is_head_row_missing or (is_first_row and (
+                parent_tag == 'table' or (parent_tag == 'tbody' and _previous_element(parent) is None))):
+            overline = '| ' + ' | '.join([''] * columns) + ' |\n'
+            overline += '| ' + ' | '.join(['---'] * columns) + ' |\n'
+        return overline + '|' + text + '\n' + underline
+
+
+def _normalize_xml_tags(root):
+    """XML解析结果去掉XHTML命名空间并转小写，与HTML解析结果一致"""
+    for el in root.iter():
+        tag = el.tag
+        if tag.__class__ is str:
+            if tag[0] == '{':
+                tag = tag[tag.index('}') + 1:]
+            el.tag = tag.lower()
+
+
+def _to_utf8(data: bytes, charset: Optional[str]) -> bytes:
+    """
+    解码并统一为UTF-8字节
+
+    与BeautifulSoup一致：先用给定编码（默认UTF-8），失败时依次尝试文档声明的编码、windows-1252，
+    都失败时替换无法解码的字节。
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return data[3:]
+    declared = DECLARED_CHARSET.search(data, 0, DECLARED_CHARSET_WINDOW)
+    candidates = [charset or 'utf-8']
+    if declared:
+        candidates.append(declared.group(1).decode('ascii'))
+    candidates.append('windows-1252')
+    for candidate in candidates:
+        try:
+            encoding = codecs.lookup(candidate).name
+            if encoding == 'utf-8' or encoding == 'ascii':
+                data.decode('utf-8')
+                return data
+            return data.decode(encoding).encode('utf-8')
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return data.decode('utf-8', errors='replace').encode('utf-8')
+
+
+def parse_html(data: bytes, charset: Optional[str] = None):
+    """
+    解析HTML字节内容，返回lxml根元素（空文档返回None）
+
+    带XML声明的XHTML优先按XML解析（自闭合标签与html.parser语义一致），失败时回退HTML解析。
+    """
+    data = _to_utf8(data, charset)
+    if XML_DECLARATION.match(data):
+        parser = etree.XMLParser(encoding='utf-8', resolve_entities=False, no_network=True, huge_tree=True)
+        try:
+            root = etree.fromstring(data, parser)
+            _normalize_xml_tags(root)
+            return root
+        except etree.XMLSyntaxError:
+            pass
+
+    parser = etree.HTMLParser(encoding='utf-8', huge_tree=True)
+    try:
+        return etree.fromstring(data, parser)
+    except etree.XMLSyntaxError:
+        return None
+
+
+def html_to_markdown(data: bytes, charset: Optional[str] = None, keep_data_uris: bool = False) -> Tuple[str, Optional[str]]:
+    """
+    HTML字节内容转换为Markdown
+
+    Args:
+        data: HTML内容
+        charset: 已知的字符编码，默认UTF-8（与MarkItDown一致）
+        keep_data_uris: 是否保留图像的data URI
+
+    Returns:
+        (Markdown内容, 文档标题)
+    """
+    root = parse_html(data, charset)
+    if root is None:
+        return '', None
+
+    title = None
+    title_el = next(root.iter('title'), None)
+    if title_el is not None and len(title_el) == 0:
+        title = title_el.text
+
+    # 与MarkItDown一致：只转换<body>；源文件没有<body>时转换整个文档
+    body = next(root.iter('body'), None) if BODY_TAG.search(data) else None
+    target = body if body is not None else root
+    return FastHtmlMarkdown(keep_data_uris=keep_data_uris).convert_element(target).strip(), title
@@ -0,0 +1,178 @@
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from app.core.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_PER_HOST_CONCURRENCY,
+    HTTP_TIMEOUT_SECONDS,
+    URL_CACHE_MAX_ENTRIES,
+)
+
+
+class FetchResult:
+    """URL抓取结果"""
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        content: bytes = b'',
+        content_type: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+
+class URLCacheEntry:
+    """URL缓存条目：校验器 + 已转换的Markdown"""
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], markdown: str):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.markdown = markdown
+
+
+class URLCache:
+    """按URL缓存转换结果的LRU缓存，用于条件请求"""
+
+    def __init__(self, max_entries: int = URL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, URLCacheEntry]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[URLCacheEntry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], markdown: str):
+        """仅缓存带有校验器的响应，否则无法做条件请求"""
+        if not etag and not last_modified:
+            self._entries.pop(url, None)
+            return
+        self._entries[url] = URLCacheEntry(etag, last_modified, markdown)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class AsyncHTTPFetcher:
+    """
+    共享的异步HTTP抓取器
+
+    - 进程内复用同一个连接池（keep-alive）
+    - 按主机限制并发，避免对单个站点发起过多请求
+    - 支持 If-None-Match / If-Modified-Since 条件请求
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        per_host_concurrency: int = HTTP_PER_HOST_CONCURRENCY,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: dict = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """延迟创建客户端，保证在事件循环内初始化"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                follow_redirects=True,
+                transport=self.transport,
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def fetch(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> FetchResult:
+        """
+        抓取URL内容
+
+        Args:
+            url: 目标URL
+            etag: 上次响应的ETag（可选）
+            last_modified: 上次响应的Last-Modified（可选）
+
+        Returns:
+            FetchResult: 抓取结果，304时content为空
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        async with self._host_semaphore(url):
+            response = await self.client.get(url, headers=headers)
+
+        if response.status_code == 304:
+            logger.debug(f"URL未修改: {url}")
+            return FetchResult(url, 304, etag=etag, last_modified=last_modified)
+
+        response.raise_for_status()
+        return FetchResult(
+            url,
+            response.status_code,
+            content=response.content,
+            content_type=response.headers.get("content-type"),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._host_semaphores.clear()
+
+
+# 进程级共享实例
+http_fetcher = AsyncHTTPFetcher()
+url_cache = URLCache()
@@ -0,0 +1,240 @@
+"""
+文档内嵌图像提取
+
+- DOCX/PPTX: 转换时保留data URI（keep_data_uris），从Markdown中解析图像
+- EPUB: 从压缩包中读取图像，按文件名匹配Markdown中的相对路径
+- PDF: 提取页面引用的JPEG/JPEG2000图像，附加到文档末尾；解析在沙箱操作中执行（见 pdf_sections.extract_images）
+
+图像按SHA-256去重后通过有界线程池并发上传到MinIO，并改写Markdown中的图像链接。
+"""
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import (
+    IMAGE_UPLOAD_CONCURRENCY,
+    IMAGE_PUBLIC_BASE_URL,
+    IMAGE_ROUTE_PREFIX,
+    STORAGE_PUBLIC_BASE_URL,
+)
+from app.services.storage import storage
+from app.services import pdf_sections
+
+# 需要在转换时保留data URI的格式
+DATA_URI_EXTENSIONS = {'.docx', '.pptx'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.svg'}
+
+DATA_URI_PATTERN = re.compile(r'!\[([^\]]*)\]\(data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)\)')
+IMAGE_LINK_PATTERN = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)')
+
+
+def conversion_options(file_extension: str, extract_images: bool) -> dict:
+    """返回MarkItDown转换参数"""
+    if extract_images and file_extension in DATA_URI_EXTENSIONS:
+        return {"keep_data_uris": True}
+    return {}
+
+
+class ExtractedImage:
+    """去重后的图像"""
+
+    def __init__(self, content: bytes, extension: str):
+        self.content = content
+        self.extension = extension
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.object_name = f"images/{self.digest}{extension}"
+        self.url: Optional[str] = None
+
+
+class ImageExtractionStats:
+    """图像提取统计"""
+
+    def __init__(self):
+        self.references = 0  # Markdown中引用的图像数
+        self.unique = 0  # 去重后的图像数
+        self.uploaded = 0  # 实际上传的图像数（不含已存在的对象）
+        self.total_bytes = 0  # 去重前的图像总字节数
+        self.unique_bytes = 0  # 去重后的图像字节数
+        self.uploaded_bytes = 0  # 实际上传的字节数
+        self.elapsed = 0.0
+
+    @property
+    def dedup_saved_bytes(self) -> int:
+        """文档内重复图像节省的字节数"""
+        return self.total_bytes - self.unique_bytes
+
+    @property
+    def reused_bytes(self) -> int:
+        """存储中已存在（此前的任务上传过）而跳过上传的字节数"""
+        return self.unique_bytes - self.uploaded_bytes
+
+    def to_dict(self) -> dict:
+        return {
+            "references": self.references,
+            "unique": self.unique,
+            "uploaded": self.uploaded,
+            "total_bytes": self.total_bytes,
+            "unique_bytes": self.unique_bytes,
+            "uploaded_bytes": self.uploaded_bytes,
+            "dedup_saved_bytes": self.dedup_saved_bytes,
+            "reused_bytes": self.reused_bytes,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_mb_s": round(self.uploaded_bytes / self.elapsed / 1024 / 1024, 2) if self.elapsed else 0,
+        }
+
+
+class ImageExtractor:
+    """提取、去重、上传文档图像并改写Markdown"""
+
+    def __init__(self, concurrency: int = IMAGE_UPLOAD_CONCURRENCY, run_operation: Callable[..., dict] = None):
+        """
+        Args:
+            concurrency: 上传并发数
+            run_operation: 执行 pdf_sections 操作的函数 (input_path, operation, **args)，
+                转换任务传入沙箱执行的版本；默认在当前进程执行
+        """
+        self.concurrency = concurrency
+        self.run_operation = run_operation or _run_operation
+        self.stats = ImageExtractionStats()
+        self._images: Dict[str, ExtractedImage] = {}
+        self._stats_lock = threading.Lock()
+
+    def _register(self, content: bytes, extension: str, references: int = 1) -> ExtractedImage:
+        """登记图像，按内容哈希去重"""
+        image = ExtractedImage(content, extension)
+        self.stats.references += references
+        self.stats.total_bytes += len(content) * references
+        return self._images.setdefault(image.digest, image)
+
+    def process(self, markdown: str, file_content: bytes, file_extension: str) -> str:
+        """
+        提取并上传图像，返回改写后的Markdown
+
+        Args:
+            markdown: 转换后的Markdown
+            file_content: 原始文件内容
+            file_extension: 文件扩展名
+
+        Returns:
+            str: 图像链接指向MinIO对象的Markdown
+        """
+        started = time.perf_counter()
+
+        pending: List[Tuple[str, ExtractedImage]] = []
+        markdown = self._collect_data_uris(markdown, pending)
+        if file_extension == '.epub':
+            markdown = self._collect_archive_images(markdown, file_content, pending)
+        appendix = self._collect_pdf_images(file_content) if file_extension == '.pdf' else []
+
+        self.stats.unique = len(self._images)
+        self.stats.unique_bytes = sum(len(image.content) for image in self._images.values())
+        self._upload_all()
+
+        for placeholder, image in pending:
+            markdown = markdown.replace(placeholder, image.url)
+        if appendix:
+            markdown += "\n\n## Images\n\n" + "\n\n".join(
+                f"![page {page}]({image.url})" for page, image in appendix
+            ) + "\n"
+
+        self.stats.elapsed = time.perf_counter() - started
+        logger.info(f"图像提取完成: {self.stats.to_dict()}")
+        return markdown
+
+    def _collect_data_uris(self, markdown: str, pending: list) -> str:
+        def replace(match):
+            alt, mimetype, payload = match.groups()
+            try:
+                content = base64.b64decode(payload)
+            except ValueError:
+                return match.group(0)
+            extension = mimetypes.guess_extension(mimetype) or '.bin'
+            image = self._register(content, extension)
+            placeholder = f"\x00image:{image.digest}\x00"
+            pending.append((placeholder, image))
+            return f"![{alt}]({placeholder})"
+
+        return DATA_URI_PATTERN.sub(replace, markdown)
+
+    def _collect_archive_images(self, markdown: str, file_content: bytes, pending: list) -> str:
+        """EPUB中的图像以相对路径引用，按文件名匹配压缩包内的图像"""
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            by_name = {}
+            for name in archive.namelist():
+                extension = os.path.splitext(name)[1].lower()
+                if extension in IMAGE_EXTENSIONS:
+                    by_name.setdefault(posixpath.basename(name), (name, extension))
+
+            def replace(match):
+                alt, src = match.groups()
+                entry = by_name.get(posixpath.basename(src.split('#')[0].split('?')[0]))
+                if src.startswith(('http://', 'https://', '\x00')) or entry is None:
+                    return match.group(0)
+                image = self._register(archive.read(entry[0]), entry[1])
+                placeholder = f"\x00image:{image.digest}\x00"
+                pending.append((placeholder, image))
+                return f"![{alt}]({placeholder})"
+
+            return IMAGE_LINK_PATTERN.sub(replace, markdown)
+
+    def _collect_pdf_images(self, file_content: bytes) -> List[Tuple[int, ExtractedImage]]:
+        """PDF转换结果不含图像引用，提取JPEG/JPEG2000图像附加在文末"""
+        with tempfile.TemporaryDirectory(prefix="pdf-images-") as directory:
+            input_path = os.path.join(directory, "input.pdf")
+            with open(input_path, 'wb') as f:
+                f.write(file_content)
+            output_dir = os.path.join(directory, "images")
+            os.mkdir(output_dir)
+
+            appendix = []
+            for item in self.run_operation(input_path, "pdf_images", output_dir=output_dir)["images"]:
+                with open(os.path.join(output_dir, item["file"]), 'rb') as f:
+                    image = self._register(f.read(), item["extension"], item["references"])
+                appendix.append((item["page"], image))
+        return appendix
+
+    def _upload_one(self, image: ExtractedImage):
+        """上传单个图像，内容寻址的对象已存在时跳过"""
+        if not storage.object_exists(image.object_name):
+            content_type = mimetypes.guess_type(f"x{image.extension}")[0] or 'application/octet-stream'
+            storage.upload_file_from_memory(image.object_name, image.content, content_type=content_type)
+            with self._stats_lock:
+                self.stats.uploaded += 1
+                self.stats.uploaded_bytes += len(image.content)
+
+        # 不使用会过期的预签名URL：保存和打包的结果中的链接需要长期有效
+        if IMAGE_PUBLIC_BASE_URL:
+            image.url = f"{IMAGE_PUBLIC_BASE_URL.rstrip('/')}/{image.object_name}"
+        else:
+            image.url = f"{STORAGE_PUBLIC_BASE_URL.rstrip('/')}{IMAGE_ROUTE_PREFIX}/{image.digest}{image.extension}"
+
+    def _upload_all(self):
+        if not self._images:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(self._images))) as executor:
+            # list() 触发所有任务并传播上传异常
+            list(executor.map(self._upload_one, self._images.values()))
+
+
+def _run_operation(input_path: str, operation: str, **args) -> dict:
+    return pdf_sections.OPERATIONS[operation](input_path, **args)
+
+
+def extract_images(markdown: str, file_content: bytes, file_extension: str,
+                   run_operation: Callable[..., dict] = None) -> Tuple[str, dict]:
+    """提取图像并返回 (改写后的Markdown, 统计信息)"""
+    extractor = ImageExtractor(run_operation=run_operation)
+    markdown = extractor.process(markdown, file_content, file_extension)
+    return markdown, extractor.stats.to_dict()
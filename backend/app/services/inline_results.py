@@ -0,0 +1,67 @@
+import gzip
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import INLINE_RESULT_MAX_BYTES, INLINE_RESULT_TTL_SECONDS, INLINE_RESULT_GZIP
+from app.services.redis_client import redis_bytes_client
+
+INLINE_RESULT_KEY_PREFIX = "inline_result:"
+GZIP_MIN_BYTES = 1024  # 小于该大小的内容压缩收益有限，原样存储
+GZIP_LEVEL = 6
+
+
+class InlineResultStore:
+    """
+    小结果内联存储
+
+    不超过 INLINE_RESULT_MAX_BYTES 的转换结果以Redis哈希（content/encoding）保存，
+    按任务ID存取并设置TTL；worker不再上传对象存储，客户端从 /task/{task_id} 直接拿到内容，
+    省去上传和预签名下载两次网络往返。写入失败时返回False，由调用方改走对象存储。
+    """
+
+    def __init__(self, redis=redis_bytes_client, max_bytes: int = INLINE_RESULT_MAX_BYTES,
+                 ttl_seconds: int = INLINE_RESULT_TTL_SECONDS, compress: bool = INLINE_RESULT_GZIP):
+        self.redis = redis
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.compress = compress
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def accepts(self, size: int) -> bool:
+        return self.enabled and size <= self.max_bytes
+
+    def put(self, task_id: str, content: bytes) -> bool:
+        """保存结果，成功返回True"""
+        encoding = b"identity"
+        if self.compress and len(content) >= GZIP_MIN_BYTES:
+            compressed = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+            if len(compressed) < len(content):
+                content, encoding = compressed, b"gzip"
+        key = f"{INLINE_RESULT_KEY_PREFIX}{task_id}"
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={"content": content, "encoding": encoding})
+            pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"内联保存结果失败 {task_id}: {str(e)}")
+            return False
+
+    def get(self, task_id: str) -> Optional[bytes]:
+        """读取结果（已解压），不存在或已过期时返回None"""
+        content, encoding = self.redis.hmget(f"{INLINE_RESULT_KEY_PREFIX}{task_id}", ["content", "encoding"])
+        if content is None:
+            return None
+        return gzip.decompress(content) if encoding == b"gzip" else content
+
+    def delete(self, task_id: str):
+        self.redis.delete(f"{INLINE_RESULT_KEY_PREFIX}{task_id}")
+
+
+# 创建全局内联结果实例
+inline_results = InlineResultStore()
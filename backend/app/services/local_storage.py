@@ -0,0 +1,430 @@
+import hashlib
+import hmac
+import json
+import math
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Union
+from urllib.parse import quote, urlencode
+
+from loguru import logger
+
+from app.core.config import (
+    LOCAL_STORAGE_SECRET,
+    LOCAL_STORAGE_ROOT,
+    LOCAL_STORAGE_ROUTE_PREFIX,
+    STORAGE_PUBLIC_BASE_URL,
+    MINIO_BUCKET_NAME,
+    MINIO_PRESIGNED_EXPIRE_SECONDS,
+    MAX_FILE_SIZE,
+    MULTIPART_PART_SIZE,
+    MULTIPART_MAX_PARTS,
+)
+from app.services.storage_backend import StorageBackend
+
+META_DIR = ".meta"
+MULTIPART_DIR = ".multipart"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalObjectStat:
+    """本地对象元数据，与MinIO stat_object返回值的常用属性一致"""
+
+    def __init__(self, object_name: str, size: int, etag: str, content_type: str, last_modified: datetime):
+        self.object_name = object_name
+        self.size = size
+        self.etag = etag
+        self.content_type = content_type
+        self.last_modified = last_modified
+
+
+class LocalPart:
+    """已上传的分片"""
+
+    def __init__(self, part_number: int, etag: str, size: int):
+        self.part_number = part_number
+        self.etag = etag
+        self.size = size
+
+
+class LocalObjectNotFound(FileNotFoundError):
+    """对象不存在"""
+
+
+class LocalStorage(StorageBackend):
+    """
+    本地文件系统存储
+
+    - 写入先写临时文件再 os.replace，读者不会看到写了一半的对象
+    - 读取使用mmap，转换器直接从页缓存读取，不额外复制
+    - 上传/下载URL为HMAC签名的API地址，下载通过FileResponse发送
+      （服务器支持pathsend扩展或配置了X-Accel-Redirect时为零拷贝sendfile）
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT):
+        self.root = os.path.abspath(root)
+        self.bucket_name = MINIO_BUCKET_NAME
+        self.secret_key = LOCAL_STORAGE_SECRET.encode('utf-8')
+        os.makedirs(os.path.join(self.root, META_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.root, MULTIPART_DIR), exist_ok=True)
+
+    # --- 路径与签名 ---
+
+    def object_path(self, object_name: str) -> str:
+        """对象名转换为本地路径，拒绝越出存储根目录的对象名"""
+        normalized = os.path.normpath(object_name.lstrip('/'))
+        if normalized.startswith(('..', '.meta', '.multipart')) or os.path.isabs(normalized):
+            raise ValueError(f"非法对象名: {object_name}")
+        return os.path.join(self.root, normalized)
+
+    def _meta_path(self, object_name: str) -> str:
+        return os.path.join(self.root, META_DIR, os.path.normpath(object_name.lstrip('/')) + '.json')
+
+    def _multipart_dir(self, upload_id: str) -> str:
+        if not upload_id or not all(c.isalnum() or c == '-' for c in upload_id):
+            raise ValueError(f"非法upload_id: {upload_id}")
+        return os.path.join(self.root, MULTIPART_DIR, upload_id)
+
+    def sign(self, method: str, object_name: str, expires: int, upload_id: str = '', part_number: str = '',
+             filename: str = '') -> str:
+        """生成本地存储URL签名（下载文件名也参与签名，持有链接者不能改写Content-Disposition）"""
+        string_to_sign = f"{method.upper()}:{object_name}:{expires}:{upload_id}:{part_number}:{filename}"
+        return hmac.new(self.secret_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, object_name: str, expires: int, signature: str,
+               upload_id: str = '', part_number: str = '', filename: str = '') -> bool:
+        """校验本地存储URL签名和有效期"""
+        if expires < int(time.time()):
+            return False
+        expected = self.sign(method, object_name, expires, upload_id, part_number, filename)
+        return hmac.compare_digest(expected, signature or '')
+
+    def _signed_url(self, method: str, object_name: str, expires_seconds: int, **extra) -> str:
+        expires = int(time.time()) + expires_seconds
+        params = {k: v for k, v in extra.items() if v}
+        params["expires"] = expires
+        params["signature"] = self.sign(
+            method, object_name, expires, extra.get("uploadId", ''), str(extra.get("partNumber", '') or ''),
+            extra.get("filename") or '',
+        )
+        return f"{STORAGE_PUBLIC_BASE_URL.rstrip('/')}{LOCAL_STORAGE_ROUTE_PREFIX}/{quote(object_name)}?{urlencode(params)}"
+
+    # --- 写入 ---
+
+    def _write_meta(self, object_name: str, etag: str, content_type: Optional[str]):
+        meta_path = self._meta_path(object_name)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        self._atomic_write(meta_path, json.dumps({"etag": etag, "content_type": content_type}).encode('utf-8'))
+
+    @staticmethod
+    def _atomic_write(path: str, content: bytes):
+        """写入临时文件后原子替换"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def open_writer(self, object_name: str) -> "LocalObjectWriter":
+        """流式写入对象（签名上传接口使用）"""
+        return LocalObjectWriter(self, object_name)
+
+    def upload_file_from_memory(self, object_name: str, content: Union[str, bytes], content_type: str = None) -> str:
+        """写入对象"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self._atomic_write(self.object_path(object_name), content)
+        self._write_meta(object_name, hashlib.md5(content).hexdigest(), content_type or 'application/octet-stream')
+        return object_name
+
+    def upload_file_from_path(self, object_name: str, file_path: str, content_type: str = None) -> str:
+        """按块复制本地文件为对象"""
+        target = self.object_path(object_name)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        md5 = hashlib.md5()
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with open(file_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+                while True:
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    md5.update(chunk)
+                    dst.write(chunk)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._write_meta(object_name, md5.hexdigest(), content_type or 'application/octet-stream')
+        return object_name
+
+    # --- 读取 ---
+
+    def download_file_to_memory(self, object_name: str) -> Union[bytes, mmap.mmap]:
+        """
+        读取对象内容
+
+        非空文件返回只读mmap（bytes-like，支持切片、写入文件和哈希计算），
+        内容按需从页缓存读取，不会整体复制到进程内存。
+        """
+        path = self.object_path(object_name)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise LocalObjectNotFound(f"对象不存在: {object_name}")
+
+    def iter_object(self, object_name: str, offset: int = 0, length: Optional[int] = None,
+                    chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """按块读取对象的指定范围"""
+        path = self.object_path(object_name)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            raise LocalObjectNotFound(f"对象不存在: {object_name}")
+        with f:
+            f.seek(offset)
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def stat_object(self, object_name: str) -> LocalObjectStat:
+        """获取对象元数据"""
+        path = self.object_path(object_name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise LocalObjectNotFound(f"对象不存在: {object_name}")
+        try:
+            with open(self._meta_path(object_name), 'rb') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        etag = meta.get("etag") or f"{st.st_ino:x}-{st.st_size:x}-{int(st.st_mtime_ns):x}"
+        return LocalObjectStat(
+            object_name,
+            st.st_size,
+            etag,
+            meta.get("content_type") or 'application/octet-stream',
+            datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+        )
+
+    def object_exists(self, object_name: str) -> bool:
+        return os.path.isfile(self.object_path(object_name))
+
+    def delete_object(self, object_name: str):
+        """删除对象"""
+        for path in (self.object_path(object_name), self._meta_path(object_name)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        logger.info(f"删除对象: {object_name}")
+
+    # --- 签名URL ---
+
+    def generate_upload_url(self, filename: str, content_type: str = None) -> dict:
+        file_id = str(uuid.uuid4())
+        object_name = f"uploads/{file_id}{os.path.splitext(filename)[1]}"
+        return {
+            "upload_url": self._signed_url("PUT", object_name, MINIO_PRESIGNED_EXPIRE_SECONDS),
+            "object_name": object_name,
+            "file_id": file_id,
+            "expires_in": MINIO_PRESIGNED_EXPIRE_SECONDS
+        }
+
+    def generate_download_url(self, object_name: str, filename: str = None, expires_seconds: int = None) -> str:
+        return self._signed_url(
+            "GET", object_name, expires_seconds or MINIO_PRESIGNED_EXPIRE_SECONDS, filename=filename
+        )
+
+    # --- 分片上传 ---
+
+    def create_multipart_upload(self, filename: str, file_size: int, content_type: str = None) -> dict:
+        if file_size <= 0 or file_size > MAX_FILE_SIZE:
+            raise ValueError(f"文件大小不合法: {file_size}")
+
+        part_size = max(MULTIPART_PART_SIZE, math.ceil(file_size / MULTIPART_MAX_PARTS))
+        part_count = math.ceil(file_size / part_size)
+        file_id = str(uuid.uuid4())
+        object_name = f"uploads/{file_id}{os.path.splitext(filename)[1]}"
+        upload_id = uuid.uuid4().hex
+
+        upload_dir = self._multipart_dir(upload_id)
+        os.makedirs(upload_dir)
+        self._atomic_write(
+            os.path.join(upload_dir, "upload.json"),
+            json.dumps({"object_name": object_name, "content_type": content_type}).encode('utf-8'),
+        )
+        return {
+            "upload_id": upload_id,
+            "object_name": object_name,
+            "file_id": file_id,
+            "part_size": part_size,
+            "part_count": part_count,
+            "parts": self.generate_part_upload_urls(object_name, upload_id, range(1, part_count + 1)),
+            "expires_in": MINIO_PRESIGNED_EXPIRE_SECONDS
+        }
+
+    def generate_part_upload_urls(self, object_name: str, upload_id: str, part_numbers: Iterable[int]) -> List[dict]:
+        return [
+            {
+                "part_number": part_number,
+                "upload_url": self._signed_url(
+                    "PUT", object_name, MINIO_PRESIGNED_EXPIRE_SECONDS,
+                    uploadId=upload_id, partNumber=str(part_number),
+                ),
+            }
+            for part_number in part_numbers
+        ]
+
+    def part_path(self, upload_id: str, part_number: int) -> str:
+        return os.path.join(self._multipart_dir(upload_id), f"{part_number:05d}.part")
+
+    def write_part_etag(self, upload_id: str, part_number: int, etag: str):
+        """记录分片上传时计算的MD5，列出分片时不必重新读取分片内容"""
+        self._atomic_write(f"{self.part_path(upload_id, part_number)}.md5", etag.encode('ascii'))
+
+    def _part_etag(self, path: str, st: os.stat_result) -> str:
+        """分片内容的MD5；记录缺失或早于分片文件（重新上传）时重新计算"""
+        try:
+            if os.stat(f"{path}.md5").st_mtime_ns >= st.st_mtime_ns:
+                with open(f"{path}.md5", 'r') as f:
+                    return f.read().strip()
+        except OSError:
+            pass
+        with open(path, 'rb') as f:
+            return _md5_file(f).hexdigest()
+
+    def _upload_meta(self, object_name: str, upload_id: str) -> dict:
+        try:
+            with open(os.path.join(self._multipart_dir(upload_id), "upload.json"), 'rb') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise LocalObjectNotFound(f"分片上传不存在: {upload_id}")
+        if meta.get("object_name") != object_name:
+            raise LocalObjectNotFound(f"分片上传与对象不匹配: {upload_id}")
+        return meta
+
+    def list_uploaded_parts(self, object_name: str, upload_id: str) -> List[LocalPart]:
+        self._upload_meta(object_name, upload_id)
+        parts = []
+        for entry in os.scandir(self._multipart_dir(upload_id)):
+            if entry.name.endswith('.part'):
+                st = entry.stat()
+                parts.append(LocalPart(int(entry.name[:-5]), self._part_etag(entry.path, st), st.st_size))
+        return sorted(parts, key=lambda p: p.part_number)
+
+    def complete_multipart_upload(self, object_name: str, upload_id: str, part_count: int) -> str:
+        """
+        按序合并分片，使用sendfile在内核中拷贝，完成后原子替换
+
+        ETag与S3一致：各分片内容MD5（二进制）拼接后的MD5加分片数，由合并时读取的分片内容计算
+        """
+        meta = self._upload_meta(object_name, upload_id)
+        uploaded = {part.part_number for part in self.list_uploaded_parts(object_name, upload_id)}
+        missing = [n for n in range(1, part_count + 1) if n not in uploaded]
+        if missing:
+            raise ValueError(f"分片未全部上传，缺少: {missing[:20]}")
+
+        target = self.object_path(object_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+        md5 = hashlib.md5()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for part_number in range(1, part_count + 1):
+                    with open(self.part_path(upload_id, part_number), 'rb') as part:
+                        size = os.fstat(part.fileno()).st_size
+                        md5.update(_md5_file(part, size).digest())
+                        offset = 0
+                        while offset < size:
+                            offset += os.sendfile(out.fileno(), part.fileno(), offset, size - offset)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        self._write_meta(object_name, f"{md5.hexdigest()}-{part_count}", meta.get("content_type"))
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+        return object_name
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        self._upload_meta(object_name, upload_id)
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+
+def _md5_file(f, size: int = None):
+    """通过mmap计算文件内容的MD5，直接读取页缓存"""
+    md5 = hashlib.md5()
+    if size is None:
+        size = os.fstat(f.fileno()).st_size
+    if size:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            md5.update(mapped)
+    return md5
+
+
+class LocalObjectWriter:
+    """流式写入对象：边写边算MD5，关闭时原子替换目标文件"""
+
+    def __init__(self, storage: LocalStorage, object_name: str, target: str = None):
+        self.storage = storage
+        self.object_name = object_name
+        self.target = target or storage.object_path(object_name)
+        self.size = 0
+        self._md5 = hashlib.md5()
+        os.makedirs(os.path.dirname(self.target), exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(dir=os.path.dirname(self.target), prefix='.tmp-')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > MAX_FILE_SIZE:
+            raise ValueError(f"文件超过大小上限 {MAX_FILE_SIZE}")
+        self._md5.update(chunk)
+        self._file.write(chunk)
+
+    @property
+    def etag(self) -> str:
+        return self._md5.hexdigest()
+
+    def commit(self, content_type: str = None, write_meta: bool = True):
+        self._file.close()
+        os.replace(self._temp_path, self.target)
+        if write_meta:
+            self.storage._write_meta(self.object_name, self.etag, content_type)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._temp_path)
+        except OSError:
+            pass
@@ -1,10 +1,17 @@
 import io
+import math
 import os
+import socket
+import threading
 from datetime import timedelta
-from typing import Union
+from typing import Iterator, List, Optional, Union
 import uuid
 
+import certifi
+import urllib3
+from urllib3.connection import HTTPConnection
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
 from loguru import logger
 
@@ -15,27 +22,109 @@ from app.core.config import (
     MINIO_SECURE,
     MINIO_BUCKET_NAME,
     MINIO_PRESIGNED_EXPIRE_SECONDS,
+    MINIO_REGION,
+    MINIO_POOL_MAXSIZE,
+    MINIO_CONNECT_TIMEOUT,
+    MINIO_READ_TIMEOUT,
+    MINIO_TCP_KEEPALIVE,
+    MINIO_BUCKET_CHECK_TTL,
+    MAX_FILE_SIZE,
+    MULTIPART_PART_SIZE,
+    MULTIPART_MAX_PARTS,
 )
+from app.services.storage_backend import StorageBackend
 
 
-class MinioClient:
-    """MinIO客户端封装类"""
+BUCKET_READY_KEY_PREFIX = "minio:bucket_ready:"
+
+
+def _build_http_client() -> urllib3.PoolManager:
+    """创建可配置大小和keep-alive的连接池"""
+    socket_options = list(HTTPConnection.default_socket_options)
+    if MINIO_TCP_KEEPALIVE:
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=MINIO_POOL_MAXSIZE,
+        block=False,
+        timeout=urllib3.Timeout(connect=MINIO_CONNECT_TIMEOUT, read=MINIO_READ_TIMEOUT),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        socket_options=socket_options,
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+    )
+
+
+class MinioClient(StorageBackend):
+    """
+    MinIO客户端封装类
+    
+    底层Minio客户端及其连接池在首次使用时按进程创建，导入和fork时不产生网络I/O，
+    uvicorn/Celery的子进程各自在fork之后建立自己的连接池。
+    """
     
     def __init__(self):
-        self.client = Minio(
-            MINIO_ENDPOINT,
-            access_key=MINIO_ACCESS_KEY,
-            secret_key=MINIO_SECRET_KEY,
-            secure=MINIO_SECURE,
-        )
         self.bucket_name = MINIO_BUCKET_NAME
+        self._client = None
+        self._pid = None
+        self._bucket_checked = False
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self) -> Minio:
+        """获取当前进程的Minio客户端（fork后自动重建），首次使用时检查存储桶"""
+        client = self._process_client()
+        if not self._bucket_checked:
+            self._bucket_checked = True
+            try:
+                self._ensure_bucket_once()
+            except Exception:
+                self._bucket_checked = False
+                raise
+        return client
+    
+    def _process_client(self) -> Minio:
+        """按进程创建Minio客户端"""
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    self._client = Minio(
+                        MINIO_ENDPOINT,
+                        access_key=MINIO_ACCESS_KEY,
+                        secret_key=MINIO_SECRET_KEY,
+                        secure=MINIO_SECURE,
+                        region=MINIO_REGION or None,
+                        http_client=_build_http_client(),
+                    )
+                    self._pid = pid
+                    self._bucket_checked = False
+        return self._client
+    
+    def _ensure_bucket_once(self):
+        """存储桶检查结果缓存在Redis中，同一部署只检查一次"""
+        from app.services.redis_client import redis_client
+        
+        ready_key = f"{BUCKET_READY_KEY_PREFIX}{MINIO_ENDPOINT}/{self.bucket_name}"
+        try:
+            if redis_client.exists(ready_key):
+                return
+        except Exception as e:
+            logger.warning(f"读取存储桶检查缓存失败: {e}")
+        
         self.ensure_bucket_exists()
+        
+        try:
+            redis_client.set(ready_key, "1", ex=MINIO_BUCKET_CHECK_TTL)
+        except Exception as e:
+            logger.warning(f"写入存储桶检查缓存失败: {e}")
     
     def ensure_bucket_exists(self):
         """确保存储桶存在"""
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            client = self._process_client()
+            if not client.bucket_exists(self.bucket_name):
+                client.make_bucket(self.bucket_name, location=MINIO_REGION or None)
                 logger.info(f"创建存储桶: {self.bucket_name}")
             else:
                 logger.info(f"存储桶已存在: {self.bucket_name}")
@@ -75,13 +164,135 @@ class MinioClient:
             logger.error(f"生成上传URL失败: {e}")
             raise
     
-    def generate_download_url(self, object_name: str, filename: str = None) -> str:
+    def create_multipart_upload(self, filename: str, file_size: int, content_type: str = None) -> dict:
+        """
+        初始化分片上传并为所有分片生成预签名URL
+        
+        Args:
+            filename: 原始文件名
+            file_size: 文件大小（字节）
+            content_type: 文件MIME类型
+            
+        Returns:
+            dict: 包含upload_id、对象名、分片大小和各分片上传URL的字典
+        """
+        if file_size <= 0 or file_size > MAX_FILE_SIZE:
+            raise ValueError(f"文件大小不合法: {file_size}")
+        
+        part_size = max(MULTIPART_PART_SIZE, math.ceil(file_size / MULTIPART_MAX_PARTS))
+        part_count = math.ceil(file_size / part_size)
+        
+        try:
+            file_id = str(uuid.uuid4())
+            file_extension = os.path.splitext(filename)[1]
+            object_name = f"uploads/{file_id}{file_extension}"
+            
+            headers = {"Content-Type": content_type or 'application/octet-stream'}
+            upload_id = self.client._create_multipart_upload(self.bucket_name, object_name, headers)
+            
+            return {
+                "upload_id": upload_id,
+                "object_name": object_name,
+                "file_id": file_id,
+                "part_size": part_size,
+                "part_count": part_count,
+                "parts": self.generate_part_upload_urls(object_name, upload_id, range(1, part_count + 1)),
+                "expires_in": MINIO_PRESIGNED_EXPIRE_SECONDS
+            }
+        except S3Error as e:
+            logger.error(f"初始化分片上传失败: {e}")
+            raise
+    
+    def generate_part_upload_urls(self, object_name: str, upload_id: str, part_numbers) -> List[dict]:
+        """为指定分片生成预签名PUT URL"""
+        try:
+            return [
+                {
+                    "part_number": part_number,
+                    "upload_url": self.client.get_presigned_url(
+                        "PUT",
+                        self.bucket_name,
+                        object_name,
+                        expires=timedelta(seconds=MINIO_PRESIGNED_EXPIRE_SECONDS),
+                        extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)},
+                    ),
+                }
+                for part_number in part_numbers
+            ]
+        except S3Error as e:
+            logger.error(f"生成分片上传URL失败 {object_name}: {e}")
+            raise
+    
+    def list_uploaded_parts(self, object_name: str, upload_id: str) -> List[Part]:
+        """列出已上传的分片（用于断点续传和完成上传）"""
+        try:
+            parts = []
+            marker = None
+            while True:
+                result = self.client._list_parts(
+                    self.bucket_name,
+                    object_name,
+                    upload_id,
+                    max_parts=1000,
+                    part_number_marker=marker,
+                )
+                parts.extend(result.parts)
+                if not result.is_truncated:
+                    break
+                marker = result.next_part_number_marker
+            return parts
+        except S3Error as e:
+            logger.error(f"列出已上传分片失败 {object_name}: {e}")
+            raise
+    
+    def complete_multipart_upload(self, object_name: str, upload_id: str, part_count: int) -> str:
+        """
+        完成分片上传
+        
+        分片ETag由服务端从MinIO查询，客户端无需读取响应头中的ETag。
+        
+        Args:
+            object_name: MinIO中的对象名
+            upload_id: 分片上传ID
+            part_count: 期望的分片数量
+            
+        Returns:
+            str: 合并后的对象名
+        """
+        parts = sorted(self.list_uploaded_parts(object_name, upload_id), key=lambda p: p.part_number)
+        uploaded = {part.part_number for part in parts}
+        missing = [n for n in range(1, part_count + 1) if n not in uploaded]
+        if missing:
+            raise ValueError(f"分片未全部上传，缺少: {missing[:20]}")
+        
+        try:
+            self.client._complete_multipart_upload(
+                self.bucket_name,
+                object_name,
+                upload_id,
+                [Part(part.part_number, part.etag) for part in parts if part.part_number <= part_count],
+            )
+            return object_name
+        except S3Error as e:
+            logger.error(f"完成分片上传失败 {object_name}: {e}")
+            raise
+    
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        """取消分片上传并清理已上传分片"""
+        try:
+            self.client._abort_multipart_upload(self.bucket_name, object_name, upload_id)
+        except S3Error as e:
+            logger.error(f"取消分片上传失败 {object_name}: {e}")
+            raise
+    
+    def generate_download_url(self, object_name: str, filename: str = None, expires_seconds: int = None) -> str:
         """
         生成文件下载的预签名URL
         
         Args:
             object_name: MinIO中的对象名
             filename: 下载时的文件名（可选）
+            expires_seconds: URL有效期（可选，默认MINIO_PRESIGNED_EXPIRE_SECONDS）
             
         Returns:
             str: 预签名下载URL
@@ -94,7 +305,7 @@ class MinioClient:
             download_url = self.client.presigned_get_object(
                 self.bucket_name,
                 object_name,
-                expires=timedelta(seconds=MINIO_PRESIGNED_EXPIRE_SECONDS),
+                expires=timedelta(seconds=expires_seconds or MINIO_PRESIGNED_EXPIRE_SECONDS),
                 response_headers=response_headers
             )
             return download_url
@@ -121,6 +332,30 @@ class MinioClient:
             logger.error(f"下载文件失败 {object_name}: {e}")
             raise
     
+    def iter_object(self, object_name: str, offset: int = 0, length: Optional[int] = None,
+                    chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """
+        按块流式读取对象（使用S3 Range请求，只传输需要的字节）
+        
+        Args:
+            object_name: MinIO中的对象名
+            offset: 起始偏移
+            length: 读取长度，None表示读到末尾
+            chunk_size: 每块大小
+        """
+        response = self.client.get_object(
+            self.bucket_name,
+            object_name,
+            offset=offset,
+            length=length or 0,
+        )
+        try:
+            for chunk in response.stream(chunk_size):
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+    
     def upload_file_from_memory(self, object_name: str, content: Union[str, bytes], content_type: str = None) -> str:
         """
         上传文件到MinIO
@@ -152,6 +387,30 @@ class MinioClient:
             logger.error(f"上传文件失败 {object_name}: {e}")
             raise
     
+    def upload_file_from_path(self, object_name: str, file_path: str, content_type: str = None) -> str:
+        """
+        上传本地文件到MinIO（大文件自动分片上传，按分片读取）
+        
+        Args:
+            object_name: MinIO中的对象名
+            file_path: 本地文件路径
+            content_type: 文件MIME类型
+            
+        Returns:
+            str: 上传的对象名
+        """
+        try:
+            self.client.fput_object(
+                self.bucket_name,
+                object_name,
+                file_path,
+                content_type=content_type or 'application/octet-stream'
+            )
+            return object_name
+        except S3Error as e:
+            logger.error(f"上传文件失败 {object_name}: {e}")
+            raise
+    
     def delete_object(self, object_name: str):
         """删除对象"""
         try:
@@ -161,6 +420,14 @@ class MinioClient:
             logger.error(f"删除对象失败 {object_name}: {e}")
             raise
     
+    def stat_object(self, object_name: str):
+        """获取对象元数据（大小、ETag、类型等）"""
+        try:
+            return self.client.stat_object(self.bucket_name, object_name)
+        except S3Error as e:
+            logger.error(f"获取对象信息失败 {object_name}: {e}")
+            raise
+    
     def object_exists(self, object_name: str) -> bool:
         """检查对象是否存在"""
         try:
@@ -172,5 +439,5 @@ class MinioClient:
             raise
 
 
-# 创建全局MinIO客户端实例
+# 创建全局MinIO客户端实例（不会在导入时连接MinIO）
 minio_client = MinioClient()
\ No newline at end of file
@@ -0,0 +1,203 @@
+import hashlib
+import mmap
+import os
+import time
+import uuid
+from typing import Iterator, Optional, Union
+
+from loguru import logger
+
+from app.core.config import (
+    ORIGINAL_CACHE_ENABLED,
+    ORIGINAL_CACHE_DIR,
+    ORIGINAL_CACHE_MAX_BYTES,
+    ORIGINAL_CACHE_MAX_FILE_BYTES,
+)
+from app.services.storage import storage
+
+TEMP_PREFIX = ".tmp-"
+STALE_TEMP_SECONDS = 3600  # 超过该时间的临时文件视为被强制终止的进程遗留
+
+
+class OriginalCache:
+    """
+    worker本地的原始文件磁盘缓存（按总大小淘汰的LRU）
+
+    - 以 对象名 + ETag 为键，对象被覆盖后ETag变化，旧条目不会被命中，随LRU淘汰
+    - 同一台机器的worker子进程共享缓存目录：先写临时文件再原子替换，命中时更新mtime作为最近使用时间
+    - 任务重试、同一文件以不同参数重新转换时直接读本地磁盘，不再从对象存储下载
+    - 缓存读写失败（磁盘已满等）只记录警告，回退到直接读取对象存储
+    """
+
+    def __init__(self, directory: str = ORIGINAL_CACHE_DIR, max_bytes: int = ORIGINAL_CACHE_MAX_BYTES,
+                 max_file_bytes: int = ORIGINAL_CACHE_MAX_FILE_BYTES, enabled: bool = ORIGINAL_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.enabled = enabled
+
+    def _path(self, object_name: str, etag: str) -> str:
+        etag = etag.strip('"')
+        key = hashlib.sha256(f"{object_name}\0{etag}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key)
+
+    def _temp_path(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{TEMP_PREFIX}{os.getpid()}-{uuid.uuid4().hex}")
+
+    @staticmethod
+    def _resolve_etag(object_name: str, etag: Optional[str]) -> str:
+        """任务数据中没有ETag时查询对象元数据（只有一次HEAD请求）"""
+        return etag or storage.stat_object(object_name).etag
+
+    def _open(self, path: str):
+        """打开缓存条目并刷新最近使用时间；条目不存在（未缓存或已被淘汰）时返回None"""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f
+
+    def read(self, object_name: str, etag: Optional[str] = None) -> Union[bytes, memoryview, mmap.mmap]:
+        """
+        读取原始文件内容，未命中时从对象存储下载并写入缓存
+
+        命中时返回缓存文件的只读mmap（与LocalStorage一致），条目随后被淘汰也不影响已映射的内容。
+
+        Args:
+            object_name: 对象名
+            etag: 派发任务时API层获取的ETag（可选）
+        """
+        if not self.enabled:
+            return storage.download_file_to_memory(object_name)
+
+        path = self._path(object_name, self._resolve_etag(object_name, etag))
+        f = self._open(path)
+        if f is not None:
+            with f:
+                logger.info(f"原始文件缓存命中: {object_name}")
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        content = storage.download_file_to_memory(object_name)
+        if len(content) <= self.max_file_bytes:
+            temp_path = None
+            try:
+                temp_path = self._temp_path()
+                with open(temp_path, 'wb') as f:
+                    f.write(content)
+                self._commit(temp_path, path)
+            except OSError as e:
+                logger.warning(f"写入原始文件缓存失败 {object_name}: {str(e)}")
+                self._discard(temp_path)
+        return content
+
+    def iter_object(self, object_name: str, etag: Optional[str] = None,
+                    chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """
+        按块读取原始文件（流式转换使用）
+
+        未命中时边从对象存储读取边写入临时文件，完整读完后才加入缓存；
+        超过单文件上限的对象不缓存。
+        """
+        if not self.enabled:
+            yield from storage.iter_object(object_name, chunk_size=chunk_size)
+            return
+
+        path = self._path(object_name, self._resolve_etag(object_name, etag))
+        f = self._open(path)
+        if f is not None:
+            logger.info(f"原始文件缓存命中: {object_name}")
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        temp_path, temp_file, written = None, None, 0
+        try:
+            temp_path = self._temp_path()
+            temp_file = open(temp_path, 'wb')
+        except OSError as e:
+            logger.warning(f"写入原始文件缓存失败 {object_name}: {str(e)}")
+        try:
+            for chunk in storage.iter_object(object_name, chunk_size=chunk_size):
+                if temp_file is not None:
+                    written += len(chunk)
+                    temp_file = self._write_chunk(temp_file, chunk, written, object_name)
+                yield chunk
+            if temp_file is not None:
+                try:
+                    temp_file.close()
+                    temp_file = None
+                    self._commit(temp_path, path)
+                    temp_path = None
+                except OSError as e:
+                    logger.warning(f"写入原始文件缓存失败 {object_name}: {str(e)}")
+        finally:
+            if temp_file is not None:
+                temp_file.close()
+            self._discard(temp_path)
+
+    def _write_chunk(self, temp_file, chunk: bytes, written: int, object_name: str):
+        """写入一块到临时文件；超过单文件上限或写入失败时放弃缓存该对象，返回None"""
+        try:
+            if written > self.max_file_bytes:
+                raise OSError(f"超过单文件缓存上限 {self.max_file_bytes} 字节")
+            temp_file.write(chunk)
+            return temp_file
+        except OSError as e:
+            logger.info(f"原始文件不缓存 {object_name}: {str(e)}")
+            temp_file.close()
+            return None
+
+    def _commit(self, temp_path: str, path: str):
+        os.replace(temp_path, path)
+        self._evict()
+
+    @staticmethod
+    def _discard(temp_path: Optional[str]):
+        if temp_path is None:
+            return
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """总大小超过上限时按最近使用时间淘汰最旧的条目，顺带清理遗留的临时文件"""
+        entries = []
+        total = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith(TEMP_PREFIX):
+                    if now - st.st_mtime > STALE_TEMP_SECONDS:
+                        self._discard(entry.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._discard(path)
+            total -= size
+        logger.info(f"原始文件缓存淘汰后大小: {total} 字节")
+
+
+# 创建全局原始文件缓存实例
+original_cache = OriginalCache()
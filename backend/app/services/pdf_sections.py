@@ -0,0 +1,155 @@
+"""
+PDF分段转换
+
+把MarkItDown的PdfConverter拆成按页区间执行的步骤，每个区间的结果可以单独保存为检查点（见 app.services.checkpoints）：
+
+- layout: pdfplumber逐页识别表单/表格，表单页输出表格内容，普通页输出页面文本
+- text: 没有表单页（或结果为空）时，MarkItDown对整个文档使用pdfminer提取文本；
+  pdfminer逐页独立排版，各区间文本按顺序拼接与整体提取的结果一致
+
+merge_layout() / postprocess() 按PdfConverter的规则拼接各区间结果，输出与整体转换一致。
+使用了PdfConverter的内部函数，requirements.txt 固定了MarkItDown版本。
+图像提取（pdf_images，见 app.services.image_extractor）同样作为沙箱操作执行。
+区间操作在沙箱子进程（或未启用沙箱时在worker进程）中执行，只在调用时导入PDF解析库。
+"""
+import re
+from typing import Callable, Dict, List, Optional
+
+NEWLINE_RUN = re.compile(r"\n{3,}")
+LINE_BREAK = re.compile(r"\r?\n")
+
+
+def page_count(input_path: str) -> dict:
+    """PDF页数"""
+    from pdfminer.pdfpage import PDFPage
+
+    with open(input_path, 'rb') as f:
+        return {"pages": sum(1 for _ in PDFPage.get_pages(f))}
+
+
+def extract_layout(input_path: str, start: int, end: int) -> dict:
+    """
+    pdfplumber处理 [start, end) 页（从0开始）
+
+    Returns:
+        dict: form_pages 表单页数；chunks 非空的页面内容（与PdfConverter的markdown_chunks一致）
+    """
+    import pdfplumber
+    from markitdown.converters._pdf_converter import _extract_form_content_from_words
+
+    form_pages = 0
+    chunks = []
+    with pdfplumber.open(input_path, pages=range(start + 1, end + 1)) as pdf:
+        for page in pdf.pages:
+            page_content = _extract_form_content_from_words(page)
+            if page_content is not None:
+                form_pages += 1
+                if page_content.strip():
+                    chunks.append(page_content)
+            else:
+                text = page.extract_text()
+                if text and text.strip():
+                    chunks.append(text.strip())
+            page.close()
+    return {"form_pages": form_pages, "chunks": chunks}
+
+
+def extract_text(input_path: str, start: int, end: int) -> dict:
+    """pdfminer提取 [start, end) 页的文本"""
+    import pdfminer.high_level
+
+    with open(input_path, 'rb') as f:
+        return {"text": pdfminer.high_level.extract_text(f, page_numbers=set(range(start, end)))}
+
+
+def _image_streams(resources, visited: set):
+    """页面（及其引用的表单XObject）资源中的图像流"""
+    from pdfminer.pdftypes import PDFStream, resolve1
+    from pdfminer.psparser import LIT
+
+    xobjects = resolve1((resolve1(resources) or {}).get("XObject")) or {}
+    for xobject in xobjects.values():
+        xobject = resolve1(xobject)
+        if not isinstance(xobject, PDFStream) or id(xobject) in visited:
+            continue
+        visited.add(id(xobject))
+        subtype = xobject.get("Subtype")
+        if subtype is LIT("Image"):
+            yield xobject
+        elif subtype is LIT("Form"):
+            yield from _image_streams(xobject.get("Resources"), visited)
+
+
+def extract_images(input_path: str, output_dir: str) -> dict:
+    """
+    提取页面引用的JPEG/JPEG2000图像，按内容去重写入 output_dir
+
+    只读取页面资源中的图像对象，不做文本排版分析
+
+    Returns:
+        dict: images 按首次出现的页码排列的图像
+              [{"page": 页码, "file": 文件名, "extension": 扩展名, "references": 引用的页数}]
+    """
+    import hashlib
+    import os
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import LITERALS_DCT_DECODE, LITERALS_JPX_DECODE
+
+    images = {}
+    with open(input_path, 'rb') as f:
+        for page_number, page in enumerate(PDFPage.get_pages(f), start=1):
+            for stream in _image_streams(page.resources, set()):
+                filters = [name for name, _ in stream.get_filters()]
+                if not filters:
+                    continue
+                if filters[-1] in LITERALS_DCT_DECODE:
+                    extension = '.jpg'
+                elif filters[-1] in LITERALS_JPX_DECODE:
+                    extension = '.jp2'
+                else:
+                    continue
+                content = stream.get_rawdata()
+                filename = f"{hashlib.sha256(content).hexdigest()}{extension}"
+                if filename in images:
+                    images[filename]["references"] += 1
+                    continue
+                with open(os.path.join(output_dir, filename), 'wb') as image_file:
+                    image_file.write(content)
+                images[filename] = {"page": page_number, "file": filename, "extension": extension, "references": 1}
+    return {"images": list(images.values())}
+
+
+# 沙箱子进程可执行的操作
+OPERATIONS: Dict[str, Callable[..., dict]] = {
+    "pdf_page_count": page_count,
+    "pdf_layout": extract_layout,
+    "pdf_text": extract_text,
+    "pdf_images": extract_images,
+}
+
+
+def sections(pages: int, pages_per_section: int) -> List[tuple]:
+    """按固定页数划分区间 [(start, end), ...]"""
+    return [(start, min(start + pages_per_section, pages)) for start in range(0, pages, pages_per_section)]
+
+
+def merge_layout(layouts: List[dict]) -> Optional[str]:
+    """
+    拼接layout结果
+
+    Returns:
+        有表单页且内容非空时返回Markdown，否则为None（需要使用text结果）
+    """
+    if not any(layout["form_pages"] for layout in layouts):
+        return None
+    markdown = "\n\n".join(chunk for layout in layouts for chunk in layout["chunks"]).strip()
+    return markdown or None
+
+
+def postprocess(markdown: str) -> str:
+    """与PdfConverter及MarkItDown.convert一致的后处理：合并MasterFormat式的编号行，去除行尾空白并压缩连续空行"""
+    from markitdown.converters._pdf_converter import _merge_partial_numbering_lines
+
+    markdown = _merge_partial_numbering_lines(markdown)
+    markdown = "\n".join([line.rstrip() for line in LINE_BREAK.split(markdown)])
+    return NEWLINE_RUN.sub("\n\n", markdown)
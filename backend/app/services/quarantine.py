@@ -0,0 +1,69 @@
+import hashlib
+import json
+import time
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import QUARANTINE_ENABLED, QUARANTINE_TTL_SECONDS
+from app.services.redis_client import redis_client
+
+QUARANTINE_KEY_PREFIX = "quarantine:"
+
+
+class PoisonQuarantine:
+    """
+    毒文件隔离
+
+    因文件本身问题（格式不支持、文件损坏、超出资源上限）永久失败的内容
+    按（对象ETag+大小+扩展名）记录在Redis中，隔离期内再次提交时在API层直接拒绝，
+    不再占用worker。
+    """
+
+    def __init__(self, redis=redis_client, enabled: bool = QUARANTINE_ENABLED,
+                 ttl_seconds: int = QUARANTINE_TTL_SECONDS):
+        self.redis = redis
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def build_key(content_hash: str, size: int, extension: str) -> str:
+        """根据内容哈希、大小和扩展名生成隔离键（相同内容换用其他扩展名会走不同的转换器）"""
+        payload = f"{content_hash.strip(chr(34))}:{size}:{extension.lower()}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def add(self, key: str, error_type: str, error: str, filename: str = None):
+        """隔离文件内容，失败只记录日志"""
+        if not self.enabled or not key:
+            return
+        record = {
+            "error_type": error_type,
+            "error": error[:500],
+            "filename": filename,
+            "quarantined_at": int(time.time()),
+        }
+        try:
+            self.redis.set(f"{QUARANTINE_KEY_PREFIX}{key}", json.dumps(record, ensure_ascii=False),
+                           ex=self.ttl_seconds)
+            logger.warning(f"文件已隔离: {filename}, 原因: {error_type}")
+        except Exception as e:
+            logger.warning(f"隔离文件失败 {filename}: {str(e)}")
+
+    def get(self, key: str) -> Optional[dict]:
+        """返回隔离记录，未隔离或查询失败时返回None"""
+        if not self.enabled or not key:
+            return None
+        try:
+            record = self.redis.get(f"{QUARANTINE_KEY_PREFIX}{key}")
+        except Exception as e:
+            logger.warning(f"查询隔离记录失败: {str(e)}")
+            return None
+        return json.loads(record) if record else None
+
+    def release(self, key: str) -> bool:
+        """解除隔离（例如升级转换器或调整资源上限后）"""
+        return bool(self.redis.delete(f"{QUARANTINE_KEY_PREFIX}{key}"))
+
+
+# 创建全局隔离实例
+poison_quarantine = PoisonQuarantine()
@@ -0,0 +1,124 @@
+import bisect
+import hashlib
+import time
+from typing import List, Optional
+
+import redis
+from loguru import logger
+
+from app.core.config import (
+    CELERY_BROKER_URL,
+    QUEUE_AFFINITY_ENABLED,
+    QUEUE_AFFINITY_PREFIX,
+    QUEUE_AFFINITY_HEARTBEAT_SECONDS,
+    QUEUE_AFFINITY_TTL_SECONDS,
+    QUEUE_AFFINITY_MAX_BACKLOG,
+)
+from app.services.queue_registry import QueueRegistry
+
+AFFINITY_REGISTRY_KEY = "queue_affinity:workers"
+AFFINITY_RETIRED_KEY = "queue_affinity:retired"
+RING_REPLICAS = 64  # 每个worker队列在哈希环上的虚拟节点数
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环：worker增减时只有约 1/N 的文件换到其他worker"""
+
+    def __init__(self, nodes: List[str], replicas: int = RING_REPLICAS):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+class QueueAffinity:
+    """
+    原始文件的队列亲和路由
+
+    每个worker节点除默认队列外还消费自己的专属队列，并在broker Redis中定期登记心跳。
+    API按对象名在存活worker的一致性哈希环上选择专属队列，同一文件的重新转换
+    落到已缓存原始文件的worker（见 app.services.original_cache）；Celery重试沿用原队列。
+
+    专属队列积压达到上限或没有存活worker时返回None，任务投递到默认队列，亲和只是偏好，不影响负载均衡。
+    worker异常退出或换了主机名时，其专属队列中的任务由 drain() 移回默认队列（API与存活的worker定期执行）。
+    """
+
+    def __init__(self, broker_url: str = CELERY_BROKER_URL, enabled: bool = QUEUE_AFFINITY_ENABLED):
+        self.enabled = enabled
+        self.registry = QueueRegistry(
+            AFFINITY_REGISTRY_KEY, AFFINITY_RETIRED_KEY,
+            QUEUE_AFFINITY_HEARTBEAT_SECONDS, QUEUE_AFFINITY_TTL_SECONDS, broker_url,
+        )
+        self._ring = HashRing([])
+        self._ring_checked_at = 0.0
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self.registry.redis
+
+    @staticmethod
+    def worker_queue(hostname: str) -> str:
+        """worker节点的专属队列名"""
+        return f"{QUEUE_AFFINITY_PREFIX}{hostname}"
+
+    # ---- worker端 ----
+
+    def register(self, queue: str):
+        """登记专属队列并启动心跳线程（worker主进程调用）"""
+        self.registry.register(queue)
+        logger.info(f"worker专属队列: {queue}")
+
+    def unregister(self, queue: str):
+        """worker正常退出时注销，API不再向该队列派发新任务；队列中剩余（及退出时归还）的任务移回默认队列"""
+        self.registry.unregister(queue)
+
+    def drain(self) -> int:
+        """把已下线worker专属队列中的任务移回默认队列，返回移动的消息数"""
+        return self.registry.drain()
+
+    # ---- API端 ----
+
+    def _live_ring(self) -> HashRing:
+        """存活worker的哈希环，按心跳间隔缓存"""
+        now = time.time()
+        if now - self._ring_checked_at >= QUEUE_AFFINITY_HEARTBEAT_SECONDS:
+            self._ring_checked_at = now
+            queues = sorted(self.registry.live())
+            if queues != self._ring.nodes:
+                self._ring = HashRing(queues)
+            self.drain()
+        return self._ring
+
+    def route(self, object_name: str) -> Optional[str]:
+        """
+        选择任务投递的专属队列
+
+        Returns:
+            队列名；未启用、没有存活worker、专属队列积压过多或查询失败时为None（使用默认队列）
+        """
+        if not self.enabled or not object_name:
+            return None
+        try:
+            queue = self._live_ring().get(object_name)
+            if queue is None:
+                return None
+            if self.redis.llen(queue) >= QUEUE_AFFINITY_MAX_BACKLOG:
+                return None
+            return queue
+        except Exception as e:
+            logger.warning(f"选择worker专属队列失败: {str(e)}")
+            return None
+
+
+# 创建全局队列亲和实例（首次使用时连接broker）
+queue_affinity = QueueAffinity()
@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import List
+
+import redis
+from loguru import logger
+
+from app.core.config import CELERY_BROKER_URL, CELERY_DEFAULT_QUEUE, CELERY_VISIBILITY_TIMEOUT
+
+DRAIN_BATCH_SIZE = 100  # 每次脚本调用最多移动的消息数，避免长时间阻塞Redis
+
+# 清理超时未续约的队列，返回已下线的队列：
+# 已下线的队列保留到broker可见性超时之后，期间acks_late未确认消息恢复到该队列时同样会被移走。
+RETIRE_SCRIPT = """
+local expired = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1])
+for _, queue in ipairs(expired) do
+    redis.call('zadd', KEYS[2], ARGV[2], queue)
+end
+redis.call('zremrangebyscore', KEYS[1], '-inf', ARGV[1])
+redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[3])
+return redis.call('zrange', KEYS[2], 0, -1)
+"""
+# 把一个已下线队列（KEYS[3]）中最多 ARGV[1] 条消息移到默认队列（KEYS[4]），返回移动的消息数；
+# Celery消息的 delivery_info.routing_key 改为默认队列，再次恢复时直接回到默认队列
+MOVE_SCRIPT = """
+if redis.call('zscore', KEYS[1], KEYS[3]) then
+    -- worker以相同的名字重新上线
+    redis.call('zrem', KEYS[2], KEYS[3])
+    return 0
+end
+local moved = 0
+for _ = 1, tonumber(ARGV[1]) do
+    local raw = redis.call('rpop', KEYS[3])
+    if not raw then
+        break
+    end
+    local ok, message = pcall(cjson.decode, raw)
+    if ok and type(message) == 'table' and type(message['properties']) == 'table'
+            and type(message['properties']['delivery_info']) == 'table' then
+        message['properties']['delivery_info']['routing_key'] = KEYS[4]
+        raw = cjson.encode(message)
+    end
+    redis.call('lpush', KEYS[4], raw)
+    moved = moved + 1
+end
+return moved
+"""
+
+
+class QueueRegistry:
+    """
+    worker专属队列的存活登记（broker Redis）
+
+    worker定期登记心跳（有序集合：队列 -> 最近心跳时间），正常退出时注销。
+    超时未续约或已注销的队列转入已下线集合，其中的消息由 drain() 移回默认队列，
+    由存活worker的心跳（及其他调用方）定期执行，worker异常退出时任务不会滞留在无人消费的队列中。
+    """
+
+    def __init__(self, registry_key: str, retired_key: str, heartbeat_seconds: float, ttl_seconds: float,
+                 broker_url: str = CELERY_BROKER_URL):
+        self.registry_key = registry_key
+        self.retired_key = retired_key
+        self.heartbeat_seconds = heartbeat_seconds
+        self.ttl_seconds = ttl_seconds
+        self.broker_url = broker_url
+        self._redis = None
+        self._retire_script = None
+        self._move_script = None
+        self._heartbeat_stop = threading.Event()
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.broker_url, decode_responses=True)
+        return self._redis
+
+    def register(self, queue: str):
+        """登记队列并启动心跳线程（worker主进程调用），心跳时顺带移走已下线队列中的任务"""
+        self._heartbeat_stop.clear()
+
+        def heartbeat():
+            while True:
+                try:
+                    self.redis.zadd(self.registry_key, {queue: time.time()})
+                    self.drain()
+                except Exception as e:
+                    logger.warning(f"登记队列 {queue} 失败: {str(e)}")
+                if self._heartbeat_stop.wait(self.heartbeat_seconds):
+                    return
+
+        threading.Thread(target=heartbeat, name=f"queue-heartbeat-{queue}", daemon=True).start()
+
+    def unregister(self, queue: str):
+        """worker正常退出时注销；队列中剩余（及退出时归还）的任务移回默认队列"""
+        self._heartbeat_stop.set()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.zrem(self.registry_key, queue)
+            pipe.zadd(self.retired_key, {queue: time.time()})
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"注销队列 {queue} 失败: {str(e)}")
+
+    def live(self) -> List[str]:
+        """心跳未超时的队列"""
+        return self.redis.zrangebyscore(self.registry_key, time.time() - self.ttl_seconds, '+inf')
+
+    def is_live(self, queue: str) -> bool:
+        """队列的心跳是否未超时"""
+        heartbeat = self.redis.zscore(self.registry_key, queue)
+        return heartbeat is not None and heartbeat >= time.time() - self.ttl_seconds
+
+    def drain(self) -> int:
+        """
+        清理超时未续约的队列（worker异常退出未注销），把已下线队列中的任务移回默认队列
+
+        Returns:
+            int: 移回默认队列的消息数
+        """
+        if self._retire_script is None:
+            self._retire_script = self.redis.register_script(RETIRE_SCRIPT)
+            self._move_script = self.redis.register_script(MOVE_SCRIPT)
+        now = time.time()
+        retired = self._retire_script(
+            keys=[self.registry_key, self.retired_key],
+            args=[now - self.ttl_seconds, now, now - CELERY_VISIBILITY_TIMEOUT * 2],
+        )
+        moved = 0
+        for queue in retired:
+            # 分批移动，批次之间Redis可以处理其他命令
+            while True:
+                count = self._move_script(
+                    keys=[self.registry_key, self.retired_key, queue, CELERY_DEFAULT_QUEUE], args=[DRAIN_BATCH_SIZE]
+                )
+                moved += count
+                if count < DRAIN_BATCH_SIZE:
+                    break
+        if moved:
+            logger.warning(f"已下线队列中有 {moved} 个任务，已移回默认队列")
+        return moved
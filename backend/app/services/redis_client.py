@@ -0,0 +1,10 @@
+import redis
+
+from app.core.config import REDIS_URL
+
+
+# 创建全局Redis客户端实例（连接按需建立，fork后自动重建连接池）
+redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+# 存取二进制数据（压缩内容等）的客户端，不解码响应
+redis_bytes_client = redis.Redis.from_url(REDIS_URL)
@@ -0,0 +1,303 @@
+"""
+转换沙箱
+
+在可复用的独立子进程中执行MarkItDown转换，子进程受 RLIMIT_AS / RLIMIT_CPU 限制。
+异常文件只会导致子进程失败并被回收，不会拖垮Celery worker进程。
+
+父子进程之间通过 stdin/stdout 传递JSON行消息，文件内容通过临时文件传递。
+除整体转换外，子进程也执行按页区间的分段转换操作（见 app.services.pdf_sections）。
+"""
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import (
+    SANDBOX_MEMORY_LIMIT_MB,
+    SANDBOX_CPU_LIMIT_SECONDS,
+    SANDBOX_TIMEOUT_SECONDS,
+    SANDBOX_RSS_RECYCLE_MB,
+    SANDBOX_MAX_JOBS,
+)
+
+MB = 1024 * 1024
+# 子进程内存耗尽后无法可靠地继续分配内存，直接以该退出码退出
+EXIT_MEMORY_LIMIT = 3
+EXIT_GLIBC_ALLOC_FAILURE = 127
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+class ConversionSandboxError(Exception):
+    """
+    沙箱转换失败
+
+    kind:
+        - memory_limit: 超出内存上限
+        - cpu_limit: 超出CPU时间上限
+        - timeout: 超出墙钟时间上限
+        - crashed: 子进程异常退出
+        - conversion_error: 转换器抛出异常（文件格式/内容问题）
+    """
+
+    def __init__(self, kind: str, message: str, cause: str = None):
+        super().__init__(f"[{kind}] {message}")
+        self.kind = kind
+        self.message = message
+        # conversion_error 时子进程内分类得到的具体原因（见 app.services.failures）
+        self.cause = cause
+
+
+class ConversionSandbox:
+    """可复用的转换子进程"""
+
+    def __init__(
+        self,
+        memory_limit_mb: int = SANDBOX_MEMORY_LIMIT_MB,
+        cpu_limit_seconds: int = SANDBOX_CPU_LIMIT_SECONDS,
+        timeout_seconds: int = SANDBOX_TIMEOUT_SECONDS,
+        rss_recycle_mb: int = SANDBOX_RSS_RECYCLE_MB,
+        max_jobs: int = SANDBOX_MAX_JOBS,
+    ):
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit_seconds = cpu_limit_seconds
+        self.timeout_seconds = timeout_seconds
+        self.rss_recycle_mb = rss_recycle_mb
+        self.max_jobs = max_jobs
+        self._process: Optional[subprocess.Popen] = None
+        self._jobs = 0
+
+    def _start(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+        env["SANDBOX_MEMORY_LIMIT_MB"] = str(self.memory_limit_mb)
+        env["SANDBOX_CPU_LIMIT_SECONDS"] = str(self.cpu_limit_seconds)
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "app.services.sandbox"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=str(BACKEND_DIR),
+            env=env,
+        )
+        self._jobs = 0
+        logger.info(f"启动转换沙箱进程: pid={self._process.pid}")
+
+    def _alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def close(self):
+        """终止子进程"""
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        for stream in (self._process.stdin, self._process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self._process = None
+
+    def _classify_exit(self) -> ConversionSandboxError:
+        """根据子进程退出码分类失败原因"""
+        returncode = self._process.wait()
+        # glibc在RLIMIT_AS下无法为新线程分配TLS时会以127退出
+        if returncode in (EXIT_MEMORY_LIMIT, EXIT_GLIBC_ALLOC_FAILURE):
+            return ConversionSandboxError("memory_limit", f"转换超出内存上限 {self.memory_limit_mb}MB")
+        if returncode == -signal.SIGXCPU:
+            return ConversionSandboxError("cpu_limit", f"转换超出CPU时间上限 {self.cpu_limit_seconds}s")
+        if returncode == -signal.SIGKILL:
+            return ConversionSandboxError("memory_limit", "转换进程被强制终止（可能超出内存上限）")
+        return ConversionSandboxError("crashed", f"转换进程异常退出，退出码 {returncode}")
+
+    def convert(self, input_path: str, output_path: str, file_extension: str, options: dict = None):
+        """
+        在沙箱中转换文件
+
+        Args:
+            input_path: 待转换文件路径
+            output_path: Markdown输出文件路径
+            file_extension: 文件扩展名
+            options: MarkItDown转换参数（可选）
+
+        Raises:
+            ConversionSandboxError: 转换失败
+        """
+        self._execute({
+            "input_path": input_path,
+            "output_path": output_path,
+            "extension": file_extension,
+            "options": options or {},
+        })
+
+    def run(self, operation: str, input_path: str, output_path: str, args: dict = None) -> dict:
+        """
+        在沙箱中执行分段转换操作（见 app.services.pdf_sections.OPERATIONS）
+
+        每次操作单独计算CPU时间和墙钟时间上限，结果以JSON写入输出文件后读回
+
+        Raises:
+            ConversionSandboxError: 操作失败
+        """
+        self._execute({
+            "operation": operation,
+            "input_path": input_path,
+            "output_path": output_path,
+            "args": args or {},
+        })
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _execute(self, request: dict):
+        if not self._alive():
+            self._start()
+
+        try:
+            self._process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            self._process.stdin.flush()
+
+            ready, _, _ = select.select([self._process.stdout], [], [], self.timeout_seconds)
+            if not ready:
+                self.close()
+                raise ConversionSandboxError("timeout", f"转换超出时间上限 {self.timeout_seconds}s")
+
+            line = self._process.stdout.readline()
+        except ConversionSandboxError:
+            raise
+        except (BrokenPipeError, OSError):
+            error = self._classify_exit()
+            self.close()
+            raise error
+        except BaseException:
+            # Celery软超时等情况下终止子进程，避免遗留占用资源的转换
+            self.close()
+            raise
+
+        if not line:
+            error = self._classify_exit()
+            self.close()
+            raise error
+
+        response = json.loads(line)
+        self._jobs += 1
+        if (
+            response.get("kind") == "memory_limit"
+            or response.get("rss", 0) > self.rss_recycle_mb * MB
+            or self._jobs >= self.max_jobs
+        ):
+            logger.info(f"回收转换沙箱进程: rss={response.get('rss', 0) // MB}MB, jobs={self._jobs}")
+            self.close()
+
+        if not response.get("ok"):
+            raise ConversionSandboxError(
+                response.get("kind", "conversion_error"), response.get("error", ""), response.get("cause")
+            )
+
+
+_sandbox: Optional[ConversionSandbox] = None
+
+
+def get_sandbox() -> ConversionSandbox:
+    """获取当前进程的沙箱实例（每个worker子进程一个）"""
+    global _sandbox
+    if _sandbox is None:
+        _sandbox = ConversionSandbox()
+    return _sandbox
+
+
+def close_sandbox():
+    global _sandbox
+    if _sandbox is not None:
+        _sandbox.close()
+        _sandbox = None
+
+
+def _process_rss(pid="self") -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _current_rss() -> int:
+    """沙箱进程及其EPUB章节进程的RSS合计"""
+    from app.services.fast_converters import chapter_pool_pids
+
+    return _process_rss() + sum(_process_rss(pid) for pid in chapter_pool_pids())
+
+
+def _serve():
+    """子进程主循环"""
+    import resource
+
+    memory_limit = int(os.environ.get("SANDBOX_MEMORY_LIMIT_MB", SANDBOX_MEMORY_LIMIT_MB)) * MB
+    cpu_limit = int(os.environ.get("SANDBOX_CPU_LIMIT_SECONDS", SANDBOX_CPU_LIMIT_SECONDS))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    # 协议使用原始stdout，转换库的输出重定向到stderr
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+
+    from app.services.fast_converters import create_markitdown
+    from app.services.failures import classify_failure
+    from app.services.pdf_sections import OPERATIONS as SECTION_OPERATIONS
+    markitdown = create_markitdown()
+
+    # 预先构造内存超限响应，发生MemoryError时不再需要分配内存
+    memory_limit_response = json.dumps(
+        {"ok": False, "kind": "memory_limit", "error": f"转换超出内存上限 {memory_limit // MB}MB"}
+    ) + "\n"
+
+    try:
+        for line in sys.stdin:
+            request = json.loads(line)
+
+            # RLIMIT_CPU按进程累计，每次转换前在已用CPU时间基础上重新设置软限制
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime)
+            resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_limit, resource.RLIM_INFINITY))
+
+            response = {"ok": True}
+            try:
+                operation = request.get("operation")
+                if operation:
+                    # 分段转换操作，结果以JSON写入输出文件
+                    result = SECTION_OPERATIONS[operation](request["input_path"], **request.get("args", {}))
+                    with open(request["output_path"], "w", encoding="utf-8") as f:
+                        json.dump(result, f, ensure_ascii=False)
+                else:
+                    result = markitdown.convert(request["input_path"], **request.get("options", {}))
+                    if not result or not hasattr(result, "text_content"):
+                        raise ValueError("转换结果为空")
+                    with open(request["output_path"], "w", encoding="utf-8") as f:
+                        f.write(result.text_content)
+                result = None
+            except MemoryError:
+                raise
+            except Exception as e:
+                response = {
+                    "ok": False,
+                    "kind": "conversion_error",
+                    "error": str(e),
+                    "cause": classify_failure(e).error_type,
+                }
+
+            response["rss"] = _current_rss()
+            protocol.write(json.dumps(response) + "\n")
+    except MemoryError:
+        try:
+            protocol.write(memory_limit_response)
+            protocol.flush()
+        finally:
+            os._exit(EXIT_MEMORY_LIMIT)
+
+
+if __name__ == "__main__":
+    _serve()
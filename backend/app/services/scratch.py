@@ -0,0 +1,78 @@
+import os
+import time
+
+from loguru import logger
+
+from app.core.config import PIPELINE_SCRATCH_DIR, PIPELINE_MAX_STAGED, PIPELINE_SCRATCH_MAX_AGE_SECONDS
+
+INPUTS_DIR = "inputs"
+OUTPUTS_DIR = "outputs"
+
+
+class ScratchArea:
+    """
+    流水线阶段之间传递文件的本机临时目录
+
+    - inputs/{task_id}{ext}  下载阶段写入的原始文件，转换阶段完成后删除；文件数即本机已下载、等待转换的任务数
+    - outputs/{task_id}.md   转换阶段写入的结果，上传阶段完成后删除
+
+    同一节点的I/O worker和转换worker必须使用同一目录。文件名只由任务ID决定，重试、重新投递时覆盖同一个文件。
+    """
+
+    def __init__(self, root: str = PIPELINE_SCRATCH_DIR, max_staged: int = PIPELINE_MAX_STAGED):
+        self.root = root
+        self.max_staged = max_staged
+
+    def _path(self, directory: str, filename: str) -> str:
+        directory = os.path.join(self.root, directory)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def input_path(self, task_id: str, file_extension: str) -> str:
+        return self._path(INPUTS_DIR, f"{task_id}{file_extension}")
+
+    def output_path(self, task_id: str) -> str:
+        return self._path(OUTPUTS_DIR, f"{task_id}.md")
+
+    def staged(self) -> int:
+        try:
+            return len(os.listdir(os.path.join(self.root, INPUTS_DIR)))
+        except FileNotFoundError:
+            return 0
+
+    def has_room(self) -> bool:
+        """本机等待转换的文件数是否未达上限（多个线程同时检查时可能略微超出）"""
+        return self.staged() < self.max_staged
+
+    @staticmethod
+    def remove(*paths: str):
+        for path in paths:
+            if not path:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def sweep(self, max_age: int = PIPELINE_SCRATCH_MAX_AGE_SECONDS):
+        """清理worker被强制终止等情况遗留的文件"""
+        threshold = time.time() - max_age
+        removed = 0
+        for directory in (INPUTS_DIR, OUTPUTS_DIR):
+            try:
+                with os.scandir(os.path.join(self.root, directory)) as it:
+                    for entry in it:
+                        try:
+                            if entry.stat().st_mtime < threshold:
+                                os.unlink(entry.path)
+                                removed += 1
+                        except OSError:
+                            pass
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"清理流水线遗留文件 {removed} 个")
+
+
+# 创建全局临时目录实例
+pipeline_scratch = ScratchArea()
@@ -0,0 +1,168 @@
+"""
+Markdown结果的章节偏移索引
+
+在上传结果时一次扫描生成，与结果文件存放在一起（results/{task_id}/{name}.index.json）：
+- sections: 每个标题的层级、标题文本、字节范围 [start, end)（包含子章节）及估算token数
+- pages: PDF分页（换页符）或PPTX幻灯片（<!-- Slide number: N -->）的字节范围
+
+下游按索引中的字节范围读取单个章节，无需下载整个结果文件。
+"""
+import bisect
+import json
+import re
+from typing import List, Tuple
+
+INDEX_VERSION = 1
+
+HEADING_PATTERN = re.compile(rb'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*\r?$')
+FENCE_PATTERN = re.compile(rb'^ {0,3}(`{3,}|~{3,})')
+SLIDE_PATTERN = re.compile(rb'^<!-- Slide number: (\d+) -->')
+# token估算：ASCII约4字节1个token，非ASCII字符（CJK等）各计1个
+ASCII_BYTES = bytes(range(0x80))
+NON_LEAD_BYTES = bytes(range(0xC0))  # ASCII与UTF-8后续字节，删除后只剩多字节字符的首字节
+# 按窗口计数，mmap的大文件不会被整体切片复制
+TOKEN_WINDOW = 8 * 1024 * 1024
+NON_SPACE = re.compile(rb'\S')
+
+
+def index_object_name(result_object_name: str) -> str:
+    """索引文件对象名：与结果文件同目录"""
+    base = result_object_name[:-3] if result_object_name.endswith('.md') else result_object_name
+    return f"{base}.index.json"
+
+
+def estimate_tokens(data: bytes, start: int = 0, end: int = None) -> int:
+    """
+    估算UTF-8文本 data[start:end] 的token数
+
+    直接在字节上计数（translate为C实现），300MB结果也只需秒级；
+    与具体模型的分词结果有偏差，仅用于切分预算
+    """
+    end = len(data) if end is None else end
+    ascii_count = 0
+    lead_count = 0
+    for pos in range(start, end, TOKEN_WINDOW):
+        window = data[pos:min(pos + TOKEN_WINDOW, end)]
+        ascii_count += len(window) - len(window.translate(None, ASCII_BYTES))
+        lead_count += len(window.translate(None, NON_LEAD_BYTES))
+    return (ascii_count + 3) // 4 + lead_count
+
+
+def _scan(data: bytes) -> Tuple[List[tuple], List[tuple]]:
+    """
+    逐行扫描，返回标题 (start, level, title) 与分页 (start, number) 列表
+
+    代码块内的 # 行不视为标题
+    """
+    headings = []
+    pages = []
+    fence = None
+    pos = 0
+    size = len(data)
+    while pos < size:
+        newline = data.find(b'\n', pos)
+        end = size if newline == -1 else newline + 1
+        line = data[pos:end].rstrip(b'\n')
+
+        fence_match = FENCE_PATTERN.match(line)
+        if fence is not None:
+            if fence_match and fence_match.group(1)[:1] == fence[:1] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+        elif fence_match:
+            fence = fence_match.group(1)
+        elif b'#' in line[:4]:
+            match = HEADING_PATTERN.match(line)
+            if match:
+                title = (match.group(2) or b'').decode('utf-8', 'replace').strip()
+                headings.append((pos, len(match.group(1)), title))
+        elif line.startswith(b'<!--'):
+            match = SLIDE_PATTERN.match(line)
+            if match:
+                pages.append((pos, int(match.group(1))))
+
+        pos = end
+
+    # pdfminer在每页末尾输出换页符，下一页从其后开始
+    if not pages:
+        form_feed = data.find(b'\x0c')
+        while form_feed != -1:
+            if form_feed + 1 < size:
+                pages.append((form_feed + 1, None))
+            form_feed = data.find(b'\x0c', form_feed + 1)
+    return headings, pages
+
+
+def _page_ranges(pages: List[tuple], size: int) -> List[dict]:
+    if not pages:
+        return []
+    # 换页符只标记后续页的起点，第1页从文件开头开始
+    if pages[0][1] is None:
+        pages.insert(0, (0, None))
+    ranges = []
+    for i, (start, number) in enumerate(pages):
+        end = pages[i + 1][0] if i + 1 < len(pages) else size
+        ranges.append({"number": number if number is not None else i + 1, "start": start, "end": end})
+    return ranges
+
+
+def build_section_index(data: bytes) -> dict:
+    """
+    为UTF-8编码的Markdown内容构建章节索引
+
+    Args:
+        data: 结果文件内容（与上传的字节完全一致，偏移才能对应），也可以是结果文件的mmap
+
+    Returns:
+        dict: 可直接序列化为JSON的索引
+    """
+    size = len(data)
+    headings, pages = _scan(data)
+    page_ranges = _page_ranges(pages, size)
+
+    # 相邻边界之间的token数，章节token数为其覆盖的片段之和
+    boundaries = [0] + [start for start, _, _ in headings if start > 0] + [size]
+    cumulative = {0: 0}
+    total = 0
+    for start, end in zip(boundaries, boundaries[1:]):
+        total += estimate_tokens(data, start, end)
+        cumulative[end] = total
+
+    sections = []
+    # 第一个标题前的内容作为0级前言
+    first = headings[0][0] if headings else size
+    if first > 0 and NON_SPACE.search(data, 0, first):
+        sections.append({"id": 0, "level": 0, "title": "", "start": 0, "end": first, "parent": None})
+
+    stack = []  # (level, section)
+    for start, level, title in headings:
+        while stack and stack[-1][0] >= level:
+            stack.pop()[1]["end"] = start
+        section = {
+            "id": len(sections),
+            "level": level,
+            "title": title,
+            "start": start,
+            "end": size,
+            "parent": stack[-1][1]["id"] if stack else None,
+        }
+        sections.append(section)
+        stack.append((level, section))
+
+    page_starts = [item["start"] for item in page_ranges]
+    for section in sections:
+        section["tokens"] = cumulative[section["end"]] - cumulative[section["start"]]
+        if page_ranges:
+            i = bisect.bisect_right(page_starts, section["start"]) - 1
+            section["page"] = page_ranges[i]["number"] if i >= 0 else None
+
+    return {
+        "version": INDEX_VERSION,
+        "size": size,
+        "tokens": total,
+        "sections": sections,
+        "pages": page_ranges,
+    }
+
+
+def dump_index(index: dict) -> bytes:
+    return json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
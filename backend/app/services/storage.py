@@ -0,0 +1,15 @@
+from app.core.config import STORAGE_BACKEND
+from app.services.storage_backend import StorageBackend
+
+
+def create_storage() -> StorageBackend:
+    """根据 STORAGE_BACKEND 配置创建存储后端"""
+    if STORAGE_BACKEND == "local":
+        from app.services.local_storage import LocalStorage
+        return LocalStorage()
+    from app.services.minio_client import minio_client
+    return minio_client
+
+
+# 创建全局存储实例
+storage = create_storage()
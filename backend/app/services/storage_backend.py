@@ -0,0 +1,71 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Optional, Union
+
+
+class StorageBackend(ABC):
+    """
+    对象存储接口
+
+    业务代码只依赖该接口，具体实现由 STORAGE_BACKEND 配置选择:
+        - minio: MinioClient（默认）
+        - local: LocalStorage，单机部署时API与worker共享本地磁盘
+    """
+
+    bucket_name: str
+
+    @abstractmethod
+    def generate_upload_url(self, filename: str, content_type: str = None) -> dict:
+        """生成文件上传的预签名URL"""
+
+    @abstractmethod
+    def create_multipart_upload(self, filename: str, file_size: int, content_type: str = None) -> dict:
+        """初始化分片上传并为所有分片生成预签名URL"""
+
+    @abstractmethod
+    def generate_part_upload_urls(self, object_name: str, upload_id: str, part_numbers: Iterable[int]) -> List[dict]:
+        """为指定分片生成预签名PUT URL"""
+
+    @abstractmethod
+    def list_uploaded_parts(self, object_name: str, upload_id: str) -> list:
+        """列出已上传的分片，元素需有 part_number / etag 属性"""
+
+    @abstractmethod
+    def complete_multipart_upload(self, object_name: str, upload_id: str, part_count: int) -> str:
+        """完成分片上传"""
+
+    @abstractmethod
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        """取消分片上传"""
+
+    @abstractmethod
+    def generate_download_url(self, object_name: str, filename: str = None, expires_seconds: int = None) -> str:
+        """生成文件下载的预签名URL"""
+
+    @abstractmethod
+    def download_file_to_memory(self, object_name: str) -> Union[bytes, memoryview]:
+        """读取对象内容（bytes或只读的bytes-like对象）"""
+
+    @abstractmethod
+    def iter_object(self, object_name: str, offset: int = 0, length: Optional[int] = None,
+                    chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """从offset开始按块读取对象内容，length为None时读到末尾"""
+
+    @abstractmethod
+    def upload_file_from_memory(self, object_name: str, content: Union[str, bytes], content_type: str = None) -> str:
+        """上传对象"""
+
+    @abstractmethod
+    def upload_file_from_path(self, object_name: str, file_path: str, content_type: str = None) -> str:
+        """按块上传本地文件，不整体读入内存"""
+
+    @abstractmethod
+    def delete_object(self, object_name: str):
+        """删除对象"""
+
+    @abstractmethod
+    def stat_object(self, object_name: str):
+        """获取对象元数据，返回值需有 size / etag / content_type 属性"""
+
+    @abstractmethod
+    def object_exists(self, object_name: str) -> bool:
+        """检查对象是否存在"""
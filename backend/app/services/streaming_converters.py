@@ -0,0 +1,430 @@
+"""
+流式转换器
+
+MarkItDown 会把整个文件读入内存再转换，几百MB的CSV/JSON/TXT导出文件占用大量内存。
+流式转换器按块消费字节流、逐块产出Markdown，内存占用与文件大小无关；
+在 MarkdownConverter 中先于 MarkItDown 处理注册的扩展名。
+"""
+import codecs
+import csv
+import io
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, Optional
+
+from app.core.config import STREAMING_CONVERTER_EXTENSIONS
+
+READ_BUFFER_SIZE = 1024 * 1024
+# 每次产出的文本量（字符）
+OUTPUT_BLOCK_CHARS = 256 * 1024
+# 编码识别使用的文件头长度
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    """把字节块迭代器包装为可读的二进制流"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def detect_encoding(head: bytes) -> str:
+    """根据文件头识别文本编码：BOM > UTF-8 > charset_normalizer"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # 文件头可能在多字节字符中间截断
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    from charset_normalizer import from_bytes
+
+    best = from_bytes(head).best()
+    return best.encoding if best is not None else 'utf-8'
+
+
+def open_text(chunks: Iterable[bytes]) -> io.TextIOWrapper:
+    """以文本流方式读取字节块，编码按文件头识别，保留原始换行符"""
+    stream = io.BufferedReader(_ChunkReader(chunks), buffer_size=READ_BUFFER_SIZE)
+    encoding = detect_encoding(stream.peek(ENCODING_SNIFF_BYTES)[:ENCODING_SNIFF_BYTES])
+    return io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+
+
+def iter_file(path: str, chunk_size: int = READ_BUFFER_SIZE) -> Iterator[bytes]:
+    """按块读取本地文件"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+NEWLINE_RUN = re.compile(r'\n{3,}')
+
+
+class _MarkdownNormalizer:
+    """
+    增量执行MarkItDown对结果的规范化：去掉行尾空白、连续3个以上换行合并为2个
+
+    未结束的行和末尾的换行留到下一块再处理
+    """
+
+    def __init__(self):
+        self.carry = ''
+        self.newlines = 0
+
+    def _emit(self, body: str) -> str:
+        core = body.strip('\n')
+        if not core:
+            self.newlines += len(body)
+            return ''
+        lead = len(body) - len(body.lstrip('\n'))
+        output = '\n' * min(self.newlines + lead, 2) + NEWLINE_RUN.sub('\n\n', core)
+        self.newlines = len(body) - len(body.rstrip('\n'))
+        return output
+
+    def feed(self, text: str) -> str:
+        text = self.carry + text if self.carry else text
+        end = text.rfind('\n')
+        if end == -1:
+            self.carry = text
+            return ''
+        self.carry = text[end + 1:]
+        lines = text[:end].split('\n')
+        return self._emit('\n'.join([line.rstrip() for line in lines]) + '\n')
+
+    def close(self) -> str:
+        tail = self.carry.rstrip()
+        self.carry = ''
+        if tail:
+            return self._emit(tail)
+        return '\n' * min(self.newlines, 2)
+
+
+def normalize_markdown(blocks: Iterable[str]) -> Iterator[str]:
+    """对流式产出的Markdown执行与MarkItDown相同的规范化"""
+    normalizer = _MarkdownNormalizer()
+    for block in blocks:
+        output = normalizer.feed(block)
+        if output:
+            yield output
+    output = normalizer.close()
+    if output:
+        yield output
+
+
+class StreamingConverter(ABC):
+    """流式转换器：消费字节块，逐块产出Markdown文本"""
+
+    extensions = ()
+
+    @abstractmethod
+    def convert(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        """转换字节块迭代器，产出的文本按顺序拼接即为完整结果"""
+
+
+class TextStreamingConverter(StreamingConverter):
+    """纯文本：按识别的编码解码后原样输出"""
+
+    extensions = ('.txt',)
+
+    def convert(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        text = open_text(chunks)
+        while True:
+            block = text.read(OUTPUT_BLOCK_CHARS)
+            if not block:
+                break
+            yield block
+
+
+# 与MarkItDown一致：竖线前的反斜杠加倍后转义竖线
+PIPE_ESCAPE = re.compile(r'(?<!\\)(\\*)\|')
+ROW_BATCH = 1000
+
+
+def _escape_cell(value: str) -> str:
+    if '|' in value:
+        value = PIPE_ESCAPE.sub(lambda m: m.group(1) * 2 + r'\|', value)
+    if '\n' in value or '\r' in value:
+        value = value.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
+    return value
+
+
+class CsvStreamingConverter(StreamingConverter):
+    """
+    CSV转Markdown表格，输出与MarkItDown一致
+
+    区别：MarkItDown按最宽的行补齐所有行，流式转换只能按表头列数补齐，
+    比表头更宽的行保留全部单元格
+    """
+
+    extensions = ('.csv',)
+
+    def convert(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        width = 0
+        header_seen = False
+        after_header = False
+        blank_rows = 0  # 尚未输出的空行：只有后面还有数据行时才输出（去掉末尾空行）
+        batch = []
+
+        for row in csv.reader(open_text(chunks)):
+            if not row:
+                if header_seen and not after_header:
+                    blank_rows += 1
+                continue
+
+            cells = [_escape_cell(cell) for cell in row]
+            if not header_seen:
+                header_seen = after_header = True
+                width = len(cells)
+                batch.append("| " + " | ".join(cells) + " |")
+                batch.append("\n| " + " | ".join(["---"] * width) + " |")
+                continue
+
+            after_header = False
+            if blank_rows:
+                batch.extend(["\n| " + " | ".join([""] * width) + " |"] * blank_rows)
+                blank_rows = 0
+            if len(cells) < width:
+                cells.extend([""] * (width - len(cells)))
+            batch.append("\n| " + " | ".join(cells) + " |")
+            if len(batch) >= ROW_BATCH:
+                yield "".join(batch)
+                batch.clear()
+
+        if batch:
+            yield "".join(batch)
+
+
+JSON_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+JSON_LITERAL = r'[^ \t\r\n{}\[\],:"]+'
+# 常见组合（"键": 值, / 值, / }, 等）作为一个token匹配，减少Python层循环次数
+JSON_TOKEN = re.compile(rf"""
+    [ \t\r\n]*
+    (?:
+        ({JSON_STRING})[ \t\r\n]*:[ \t\r\n]*(?:({JSON_STRING}|{JSON_LITERAL})(?:[ \t\r\n]*(,))?)?
+      | ({JSON_STRING})(?:[ \t\r\n]*(,))?
+      | ([{{\[])
+      | ([}}\]])(?:[ \t\r\n]*(,))?
+      | (,)
+      | (:)
+      | (")
+      | ({JSON_LITERAL})(?:[ \t\r\n]*(,))?
+    )
+""", re.X)
+JSON_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+KEY, VALUE, OPEN, CLOSE, COMMA, COLON, QUOTE = range(7)
+# lastindex -> (类型, 内容所在分组, 是否带逗号)
+JSON_TOKEN_KINDS = {
+    1: (KEY, 1, False),
+    2: (KEY, 2, False),
+    3: (KEY, 2, True),
+    4: (VALUE, 4, False),
+    5: (VALUE, 4, True),
+    6: (OPEN, 6, False),
+    7: (CLOSE, 7, False),
+    8: (CLOSE, 7, True),
+    9: (COMMA, 9, False),
+    10: (COLON, 10, False),
+    11: (QUOTE, 11, False),
+    12: (VALUE, 12, False),
+    13: (VALUE, 12, True),
+}
+
+
+class _JsonFormatter:
+    """
+    增量JSON重新缩进
+
+    只跟踪嵌套深度和是否处于字符串中，不构建对象，内存与文档大小无关；
+    不校验JSON语法，多个顶层值（JSON Lines）各占一段
+    """
+
+    def __init__(self, indent: int = 2):
+        self.indent = indent
+        self.depth = 0
+        self.in_string = False
+        self.open_pending = False  # 刚输出 { 或 [，需看下一个token判断是否为空容器
+        self.started = False
+        self.carry = ''
+        self._newlines = ['\n']
+
+    def _newline(self) -> str:
+        depth = max(self.depth, 0)
+        while len(self._newlines) <= depth:
+            self._newlines.append('\n' + ' ' * (self.indent * len(self._newlines)))
+        return self._newlines[depth]
+
+    def _continue_string(self, buf: str, pos: int, out: list, final: bool) -> int:
+        """处理跨块字符串的剩余部分，返回新位置；字符串在本块内未结束时返回-1"""
+        match = JSON_STRING_REST.match(buf, pos)
+        out.append(match.group())
+        pos = match.end()
+        if pos < len(buf) and buf[pos] == '"':
+            out.append('"')
+            self.in_string = False
+            return pos + 1
+        if pos < len(buf):
+            # 块末尾的转义符：与下一块一起处理
+            if final:
+                out.append(buf[pos:])
+            else:
+                self.carry = buf[pos:]
+        return -1
+
+    def feed(self, text: str, final: bool = False) -> str:
+        buf = self.carry + text if self.carry else text
+        self.carry = ''
+        size = len(buf)
+        out = []
+        append = out.append
+        kinds = JSON_TOKEN_KINDS
+        pos = 0
+        while pos < size:
+            if self.in_string:
+                pos = self._continue_string(buf, pos, out, final)
+                if pos < 0:
+                    break
+                continue
+
+            next_pos = size
+            for match in JSON_TOKEN.finditer(buf, pos):
+                if match.end() == size and not final:
+                    # 块末尾的token可能不完整（数字被截断、键后的值或逗号在下一块），与下一块一起处理
+                    self.carry = buf[match.start():]
+                    break
+                kind, group, comma = kinds[match.lastindex]
+
+                if kind == CLOSE:
+                    self.depth -= 1
+                    if self.open_pending:
+                        self.open_pending = False
+                        append(match.group(group))
+                    else:
+                        append(self._newline() + match.group(group))
+                elif kind == COMMA:
+                    append(',' + self._newline())
+                    continue
+                elif kind == COLON:
+                    append(': ')
+                    continue
+                else:
+                    if self.open_pending:
+                        self.open_pending = False
+                        append(self._newline())
+                    elif self.depth <= 0 and self.started:
+                        append('\n')
+                    self.started = True
+
+                    if kind == KEY:
+                        append(match.group(1) + ': ' if group == 1 else match.group(1) + ': ' + match.group(2))
+                    elif kind == VALUE:
+                        append(match.group(group))
+                    elif kind == OPEN:
+                        append(match.group(group))
+                        self.depth += 1
+                        self.open_pending = True
+                    else:
+                        append('"')
+                        self.in_string = True
+                        next_pos = match.end()
+                        break
+
+                if comma:
+                    append(',' + self._newline())
+            pos = next_pos
+        return ''.join(out)
+
+    def close(self) -> str:
+        return self.feed('', final=True)
+
+
+class JsonStreamingConverter(StreamingConverter):
+    """
+    JSON：放入json代码块
+
+    压缩成一行的JSON重新缩进；已有换行的（已格式化的JSON、JSON Lines）原样输出，
+    逐token重新缩进比原样输出慢一个数量级
+    """
+
+    extensions = ('.json',)
+
+    def __init__(self, indent: int = 2):
+        self.indent = indent
+
+    def convert(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        text = open_text(chunks)
+        block = text.read(OUTPUT_BLOCK_CHARS)
+        yield "```json\n"
+        if '\n' in block.strip():
+            last = block
+            while block:
+                yield block
+                last = block
+                block = text.read(OUTPUT_BLOCK_CHARS)
+            # 原样输出时只保证代码块结束标记另起一行
+            yield "```" if last.endswith('\n') else "\n```"
+            return
+
+        formatter = _JsonFormatter(self.indent)
+        while block:
+            output = formatter.feed(block)
+            if output:
+                yield output
+            block = text.read(OUTPUT_BLOCK_CHARS)
+        yield formatter.close() + "\n```"
+
+
+class StreamingConverterRegistry:
+    """按扩展名注册的流式转换器"""
+
+    def __init__(self):
+        self._converters: Dict[str, StreamingConverter] = {}
+
+    def register(self, converter: StreamingConverter, extensions: Iterable[str] = None):
+        for extension in extensions or converter.extensions:
+            self._converters[extension.lower()] = converter
+
+    def unregister(self, extension: str):
+        self._converters.pop(extension.lower(), None)
+
+    def get(self, extension: Optional[str]) -> Optional[StreamingConverter]:
+        if not extension:
+            return None
+        return self._converters.get(extension.lower())
+
+    @property
+    def extensions(self) -> list:
+        return sorted(self._converters)
+
+
+def create_default_registry(extensions: Iterable[str] = STREAMING_CONVERTER_EXTENSIONS) -> StreamingConverterRegistry:
+    """注册内置流式转换器，只启用配置中列出的扩展名"""
+    enabled = {extension.lower() for extension in extensions}
+    registry = StreamingConverterRegistry()
+    for converter in (CsvStreamingConverter(), JsonStreamingConverter(), TextStreamingConverter()):
+        registry.register(converter, [ext for ext in converter.extensions if ext in enabled])
+    return registry
+
+
+# 创建全局流式转换器注册表
+streaming_converters = create_default_registry()
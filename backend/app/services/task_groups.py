@@ -0,0 +1,37 @@
+from typing import List
+
+from app.core.config import TASK_GROUP_ENABLED, TASK_GROUP_TTL_SECONDS, BUNDLE_MAX_TASKS
+from app.services.redis_client import redis_client
+
+TASK_GROUP_KEY_PREFIX = "task_group:"
+
+
+class TaskGroups:
+    """
+    任务分组
+
+    创建任务时指定 group_id，任务ID按创建顺序追加到该分组（Redis列表），
+    批量用户可以按分组一次打包下载所有结果。每次追加都会刷新有效期，与任务结果的保留时间一致。
+    """
+
+    def __init__(self, redis=redis_client, enabled: bool = TASK_GROUP_ENABLED,
+                 ttl_seconds: int = TASK_GROUP_TTL_SECONDS, max_tasks: int = BUNDLE_MAX_TASKS):
+        self.redis = redis
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_tasks = max_tasks
+
+    def add(self, group_id: str, task_id: str):
+        key = f"{TASK_GROUP_KEY_PREFIX}{group_id}"
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, task_id)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def members(self, group_id: str) -> List[str]:
+        """分组内的任务ID（按创建顺序，最多 max_tasks 个），分组不存在或已过期时为空列表"""
+        return self.redis.lrange(f"{TASK_GROUP_KEY_PREFIX}{group_id}", 0, self.max_tasks - 1)
+
+
+# 创建全局任务分组实例
+task_groups = TaskGroups()
@@ -0,0 +1,382 @@
+"""
+任务完成回调（webhook）
+
+创建任务时指定 callback_url，转换任务结束（完成或最终失败）后把事件写入Redis发件箱，
+由独立的投递进程（MODE=webhook，python -m app.services.webhooks）发送，转换worker不做任何HTTP请求。
+
+- 按回调地址分批：同一地址的待发事件合并为一个请求 {"events": [...]}，每批最多 WEBHOOK_BATCH_SIZE 个
+- 请求按 APIAuthMiddleware 的方案签名（X-API-Signature / X-API-Timestamp，METHOD:path:timestamp:body），
+  密钥为单独的 WEBHOOK_SECRET：回调路径由调用方指定，用API密钥签名的回调请求可以被重放到API本身；
+  接收方可以用 APIAuthMiddleware(WEBHOOK_SECRET) 校验
+- 投递进程复用一个keep-alive连接池，多个地址并发投递，同一地址同一时间只有一个请求
+- 失败（网络错误、5xx、408、429）按地址指数退避重试，超过 WEBHOOK_MAX_ATTEMPTS 次或其他4xx时丢弃该批事件
+- 回调主机解析到回环、内网、链路本地等非公网地址时拒绝（WEBHOOK_ALLOWED_HOSTS 中的主机除外）：
+  创建任务时检查一次；投递时在建立连接前解析并检查，直接连接检查过的地址（Host头和SNI不变），
+  不会因DNS重绑定（检查与连接之间解析结果改变）连到内网地址
+
+Redis数据：
+- webhook:due          有序集合，回调地址 -> 下次投递时间（投递中为租约到期时间）
+- webhook:events:{url} 列表，该地址待发送的事件（JSON）
+- webhook:attempts     哈希，回调地址 -> 连续失败次数
+"""
+import asyncio
+import ipaddress
+import json
+import random
+import signal
+import socket
+import ssl
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import certifi
+import httpcore
+import httpx
+from loguru import logger
+
+from app.core.config import (
+    WEBHOOK_ENABLED,
+    WEBHOOK_SECRET,
+    WEBHOOK_ALLOWED_HOSTS,
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_BATCH_WAIT_SECONDS,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_TIMEOUT_SECONDS,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_RETRY_BASE_SECONDS,
+    WEBHOOK_RETRY_MAX_SECONDS,
+    WEBHOOK_EVENT_TTL_SECONDS,
+    WEBHOOK_POLL_SECONDS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+)
+from app.services.redis_client import redis_client
+
+WEBHOOK_DUE_KEY = "webhook:due"
+WEBHOOK_EVENTS_KEY_PREFIX = "webhook:events:"
+WEBHOOK_ATTEMPTS_KEY = "webhook:attempts"
+LEASE_SECONDS = WEBHOOK_TIMEOUT_SECONDS + 30  # 投递进程异常退出时，租约到期后由其他进程接管
+RETRYABLE_STATUS = {408, 429}
+
+# 领取到期的回调地址，并把其投递时间设为租约到期时间
+CLAIM_SCRIPT = """
+local urls = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+for _, url in ipairs(urls) do
+    redis.call('zadd', KEYS[1], ARGV[2], url)
+end
+return urls
+"""
+# 结束一次投递：仍有待发事件时按指定时间重新排期，否则移出排期（与入队互斥，不会漏掉新事件）
+FINISH_SCRIPT = """
+if redis.call('llen', KEYS[2]) > 0 then
+    redis.call('zadd', KEYS[1], ARGV[2], ARGV[1])
+else
+    redis.call('zrem', KEYS[1], ARGV[1])
+end
+"""
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class BlockedAddressError(Exception):
+    """回调主机解析到非公网地址"""
+
+
+def _resolve_public(hostname: str, port: int) -> List[str]:
+    """
+    解析主机（阻塞），返回其地址
+
+    Raises:
+        OSError: 无法解析
+        BlockedAddressError: 解析结果中有非公网地址
+    """
+    try:
+        infos = socket.getaddrinfo(hostname, port, proto=socket.IPPROTO_TCP)
+    except UnicodeError as e:
+        raise OSError(str(e))
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    blocked = sorted(address for address in addresses if not _is_public_address(address))
+    if blocked:
+        raise BlockedAddressError(f"回调地址的主机解析到非公网地址: {hostname} -> {', '.join(blocked)}")
+    return addresses
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """
+    只连接公网地址的网络后端：建立连接时解析主机、检查地址后直接连接该地址
+
+    TLS握手的SNI和请求的Host头仍使用原主机名。允许列表中的主机不检查。
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None) -> httpcore.AsyncNetworkStream:
+        if host.lower() in WEBHOOK_ALLOWED_HOSTS:
+            return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        try:
+            addresses = await asyncio.to_thread(_resolve_public, host, port)
+        except (OSError, BlockedAddressError) as e:
+            raise httpcore.ConnectError(str(e))
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class PublicAddressTransport(httpx.AsyncHTTPTransport):
+    """使用 PublicAddressBackend 的HTTP传输（不经过代理）"""
+
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=ssl.create_default_context(cafile=certifi.where()),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicAddressBackend(),
+        )
+
+
+def validate_callback_url(url: str, reject_unresolved: bool = True) -> Optional[str]:
+    """
+    检查回调地址，返回错误信息；合法时返回None
+
+    允许列表中的主机直接通过；其他主机（允许列表为空时）必须只解析到公网地址，
+    避免回调被用来访问回环、内网、链路本地（云平台元数据）等地址。会进行DNS解析（阻塞）。
+
+    Args:
+        reject_unresolved: 主机无法解析时是否视为不合法；投递时为False，由随后的请求失败触发退避重试
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "回调地址必须是 http(s) URL"
+    hostname = parts.hostname.lower()
+    if hostname in WEBHOOK_ALLOWED_HOSTS:
+        return None
+    if WEBHOOK_ALLOWED_HOSTS:
+        return f"回调地址的主机不在允许列表中: {parts.hostname}"
+    try:
+        _resolve_public(hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    except BlockedAddressError as e:
+        return str(e)
+    except (OSError, ValueError) as e:
+        if not reject_unresolved:
+            return None
+        return f"无法解析回调地址的主机 {parts.hostname}: {str(e)}"
+    return None
+
+
+def task_event(task_id: str, result: dict) -> dict:
+    """转换任务结束事件（result 与 /task/{task_id} 返回的 result 一致）"""
+    return {
+        "event": "task.completed" if result.get("status") == "completed" else "task.failed",
+        "task_id": task_id,
+        "timestamp": int(time.time()),
+        "result": result,
+    }
+
+
+class WebhookOutbox:
+    """回调事件发件箱（Redis）"""
+
+    def __init__(self, redis=redis_client, enabled: bool = WEBHOOK_ENABLED):
+        self.redis = redis
+        self.enabled = enabled
+        self._claim = redis.register_script(CLAIM_SCRIPT)
+        self._finish = redis.register_script(FINISH_SCRIPT)
+
+    @staticmethod
+    def _events_key(url: str) -> str:
+        return f"{WEBHOOK_EVENTS_KEY_PREFIX}{url}"
+
+    def enqueue(self, url: str, event: dict):
+        """
+        写入事件，失败只记录日志
+
+        地址不在排期中时在 WEBHOOK_BATCH_WAIT_SECONDS 后投递，期间到达的事件合并为一批；
+        已在排期（等待、投递中或退避中）时不改变投递时间
+        """
+        if not self.enabled:
+            return
+        key = self._events_key(url)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.rpush(key, json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+            pipe.expire(key, WEBHOOK_EVENT_TTL_SECONDS)
+            pipe.zadd(WEBHOOK_DUE_KEY, {url: time.time() + WEBHOOK_BATCH_WAIT_SECONDS}, nx=True)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入回调事件失败 {event.get('task_id')}: {str(e)}")
+
+    def claim(self, limit: int) -> List[str]:
+        """领取到期的回调地址"""
+        now = time.time()
+        return self._claim(keys=[WEBHOOK_DUE_KEY], args=[now, now + LEASE_SECONDS, limit])
+
+    def peek(self, url: str, count: int) -> List[str]:
+        return self.redis.lrange(self._events_key(url), 0, count - 1)
+
+    def ack(self, url: str, count: int):
+        """移除已投递（或放弃投递）的事件，并清零失败次数"""
+        pipe = self.redis.pipeline()
+        pipe.ltrim(self._events_key(url), count, -1)
+        pipe.hdel(WEBHOOK_ATTEMPTS_KEY, url)
+        pipe.execute()
+
+    def fail(self, url: str) -> int:
+        """记录一次失败，返回连续失败次数"""
+        return self.redis.hincrby(WEBHOOK_ATTEMPTS_KEY, url, 1)
+
+    def finish(self, url: str, delay: float = 0):
+        self._finish(keys=[WEBHOOK_DUE_KEY, self._events_key(url)], args=[url, time.time() + delay])
+
+
+class WebhookDeliverer:
+    """回调投递进程"""
+
+    def __init__(self, outbox: WebhookOutbox = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        from app.core.auth import APIAuthMiddleware
+
+        self.outbox = outbox or webhook_outbox
+        self.signer = APIAuthMiddleware(WEBHOOK_SECRET)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """延迟创建客户端，保证在事件循环内初始化"""
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=WEBHOOK_CONCURRENCY,
+                max_keepalive_connections=max(HTTP_MAX_KEEPALIVE_CONNECTIONS, WEBHOOK_CONCURRENCY),
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            )
+            # 不读取代理环境变量：经代理转发时连接的地址不受 PublicAddressBackend 检查
+            self._client = httpx.AsyncClient(
+                limits=limits,
+                timeout=WEBHOOK_TIMEOUT_SECONDS,
+                transport=self.transport or PublicAddressTransport(limits),
+                trust_env=False,
+            )
+        return self._client
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        """领取到期的回调地址并发投递，直到 stop()"""
+        logger.info(f"回调投递进程启动: 并发 {WEBHOOK_CONCURRENCY}, 每批最多 {WEBHOOK_BATCH_SIZE} 个事件")
+        in_flight = set()
+        try:
+            while not self._stopping.is_set():
+                urls = []
+                free = WEBHOOK_CONCURRENCY - len(in_flight)
+                if free > 0:
+                    try:
+                        urls = await asyncio.to_thread(self.outbox.claim, free)
+                    except Exception as e:
+                        logger.warning(f"领取回调任务失败: {str(e)}")
+                for url in urls:
+                    task = asyncio.create_task(self.deliver(url))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if not urls:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), WEBHOOK_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+            if in_flight:
+                await asyncio.wait(in_flight)
+        finally:
+            if self._client is not None:
+                await self._client.aclose()
+
+    async def deliver(self, url: str):
+        """投递一个地址的一批事件；异常时保留事件，租约到期后重新投递"""
+        try:
+            events = await asyncio.to_thread(self.outbox.peek, url, WEBHOOK_BATCH_SIZE)
+            delay = 0
+            if events:
+                delay = await self._post(url, events)
+            await asyncio.to_thread(self.outbox.finish, url, delay)
+        except Exception as e:
+            logger.error(f"回调投递异常 {url}: {str(e)}")
+
+    async def _post(self, url: str, events: List[str]) -> float:
+        """发送一批事件，返回该地址下次投递前的等待时间"""
+        error = await asyncio.to_thread(validate_callback_url, url, False)
+        if error:
+            await asyncio.to_thread(self.outbox.ack, url, len(events))
+            logger.error(f"回调地址不可用，丢弃 {len(events)} 个事件 {url}: {error}")
+            return 0
+
+        body = ('{"events":[' + ','.join(events) + ']}').encode('utf-8')
+        timestamp = int(time.time())
+        signature = self.signer.generate_signature("POST", urlsplit(url).path or "/", timestamp, body)
+        headers = {
+            "Content-Type": "application/json",
+            self.signer.auth_header: signature,
+            self.signer.timestamp_header: str(timestamp),
+        }
+
+        try:
+            response = await self.client.post(url, content=body, headers=headers)
+            status, error = response.status_code, f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            status, error = None, f"{type(e).__name__}: {str(e)}"
+
+        if status is not None and 200 <= status < 300:
+            await asyncio.to_thread(self.outbox.ack, url, len(events))
+            logger.info(f"回调投递成功 {url}: {len(events)} 个事件")
+            return 0
+
+        if status is not None and status < 500 and status not in RETRYABLE_STATUS:
+            # 接收方拒绝（地址错误、签名校验失败等），重试结果相同
+            await asyncio.to_thread(self.outbox.ack, url, len(events))
+            logger.error(f"回调被拒绝，丢弃 {len(events)} 个事件 {url}: {error}")
+            return 0
+
+        attempts = await asyncio.to_thread(self.outbox.fail, url)
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            await asyncio.to_thread(self.outbox.ack, url, len(events))
+            logger.error(f"回调重试 {attempts} 次仍失败，丢弃 {len(events)} 个事件 {url}: {error}")
+            return 0
+        delay = min(WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), WEBHOOK_RETRY_MAX_SECONDS)
+        delay *= random.uniform(0.8, 1.2)
+        logger.warning(f"回调投递失败 {url}: {error}，{delay:.0f}s 后第 {attempts + 1} 次尝试")
+        return delay
+
+
+# 创建全局发件箱实例（转换worker写入事件）
+webhook_outbox = WebhookOutbox()
+
+
+def main():
+    deliverer = WebhookDeliverer()
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, deliverer.stop)
+        await deliverer.run()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+流式ZIP打包
+
+zipfile写入不可seek的输出时，每个条目的大小和CRC写在数据之后的数据描述符中，
+不需要预先知道内容大小，也不需要回写本地文件头：条目内容边读取边压缩，
+压缩后的字节立即交给调用方发送，内存占用与条目数量和大小无关。
+"""
+import io
+import time
+import zipfile
+from typing import Iterable, Iterator, Optional
+
+from loguru import logger
+
+
+class ZipEntry:
+    """ZIP条目：内容按块提供，读取出错时条目以已写入的内容结束并记录错误"""
+
+    def __init__(self, name: str, chunks: Iterable[bytes], size: Optional[int] = None, date_time: tuple = None):
+        self.name = name
+        self.chunks = chunks
+        self.size = size  # 已知大小时用于判断是否需要ZIP64
+        self.date_time = date_time or time.localtime()[:6]
+        self.written = 0
+        self.error: Optional[str] = None
+
+
+class _ZipOutput(io.RawIOBase):
+    """只写、不可seek的输出缓冲，每次取走已写入的数据"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[ZipEntry], compress_level: int = 6) -> Iterator[bytes]:
+    """
+    按条目顺序生成ZIP字节流
+
+    Args:
+        entries: ZIP条目（可以是生成器，前一个条目写完后才读取下一个）
+        compress_level: deflate压缩级别，0为不压缩（ZIP_STORED）
+    """
+    output = _ZipOutput()
+    compression = zipfile.ZIP_DEFLATED if compress_level > 0 else zipfile.ZIP_STORED
+    with zipfile.ZipFile(output, 'w', compression=compression, compresslevel=compress_level or None) as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, entry.date_time)
+            info.compress_type = compression
+            if entry.size is not None:
+                info.file_size = entry.size
+            # 大小未知时按ZIP64写入，避免超过4GB时无法结束条目
+            with archive.open(info, 'w', force_zip64=entry.size is None) as dest:
+                try:
+                    for chunk in entry.chunks:
+                        dest.write(chunk)
+                        entry.written += len(chunk)
+                        data = output.drain()
+                        if data:
+                            yield data
+                except Exception as e:
+                    logger.warning(f"打包条目读取失败 {entry.name}: {str(e)}")
+                    entry.error = str(e)
+            data = output.drain()
+            if data:
+                yield data
+    yield output.drain()
@@ -1,14 +1,46 @@
+import hashlib
+import mmap
 import os
+import tempfile
 from datetime import datetime
+from functools import partial
 
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import celeryd_after_setup, worker_process_shutdown, worker_shutdown
 from loguru import logger
 
-from app.core.worker import celery_app
-from app.services.minio_client import minio_client
+from app.core.config import (
+    SANDBOX_ENABLED,
+    PIPELINE_ENABLED,
+    PIPELINE_STAGE,
+    CHECKPOINT_PAGES_PER_SECTION,
+    CHECKPOINT_MIN_PAGES,
+    DEADLINE_PAGES_PER_STEP,
+)
+from app.core.worker import celery_app, CONVERT_TASK_NAME
+from app.services.storage import storage
+from app.services.original_cache import original_cache
+from app.services.queue_affinity import queue_affinity
+from app.services.content_index import content_index
+from app.services.inline_results import inline_results
+from app.services.checkpoints import conversion_checkpoints
+from app.services.deadline import ConversionDeadline
+from app.services import pdf_sections
+from app.services.coalescer import conversion_coalescer
+from app.services.webhooks import webhook_outbox, task_event
+from app.services.sandbox import ConversionSandboxError, get_sandbox, close_sandbox
+from app.services.failures import classify_failure
+from app.services.quarantine import poison_quarantine
+from app.services.image_extractor import conversion_options, extract_images as extract_document_images
+from app.services.section_index import build_section_index, dump_index, index_object_name
 from app.api.v1.md_conv.conv import MarkdownConverter
 
 
-@celery_app.task(bind=True, max_retries=3)
+# acks_late：任务执行完才确认消息，部署重启时执行中的任务被重新投递（任务ID不变），
+# 结果对象名由任务ID决定，重复执行只会覆盖；长PDF从检查点继续，不丢失已完成的区间。
+# worker子进程意外退出时同样重新投递，仅在启用沙箱时开启，避免直接拖垮worker的文件被反复投递
+@celery_app.task(bind=True, max_retries=3, name=CONVERT_TASK_NAME,
+                 acks_late=True, reject_on_worker_lost=SANDBOX_ENABLED)
 def convert_file_to_markdown(self, task_data: dict):
     """
     Celery任务：将文件转换为Markdown格式
@@ -19,11 +51,28 @@ def convert_file_to_markdown(self, task_data: dict):
             - original_filename: 原始文件名
             - extract_images: 是否提取图像
             - user_id: 用户ID (可选)
+            - file_size: 原始文件大小 (可选)
+            - file_extension: 按文件头识别的扩展名 (可选，默认取原始文件名的扩展名)
+            - etag: 原始文件ETag，用于本地缓存 (可选)
+            - coalesce_key: 任务合并键 (可选)
+            - quarantine_key: 毒文件隔离键 (可选)
+            - deadline: 截止时间（Unix时间戳，可选），到期返回已转换的部分结果
     """
+    if PIPELINE_ENABLED:
+        # 流水线模式：本任务只把原始文件下载到本机临时目录，转换和上传由后续阶段完成
+        from app.tasks.pipeline_tasks import fetch_original
+        return fetch_original(self, task_data)
+    
     original_object_name = task_data.get('original_object_name')
     original_filename = task_data.get('original_filename')
     extract_images = task_data.get('extract_images', False)
+    etag = task_data.get('etag')
     user_id = task_data.get('user_id')
+    deadline = ConversionDeadline.from_task(task_data)
+    # 长PDF分段转换的检查点，任务成功或最终失败后删除（有时限的任务渐进转换，不使用检查点）
+    checkpoint_run = (
+        conversion_checkpoints.run(self.request.id) if conversion_checkpoints.enabled and deadline is None else None
+    )
     
     try:
         logger.info(f"开始处理任务 {self.request.id}, 文件: {original_filename}")
@@ -38,87 +87,346 @@ def convert_file_to_markdown(self, task_data: dict):
             }
         )
         
-        # 从MinIO下载文件到内存
-        logger.info(f"从MinIO下载文件: {original_object_name}")
-        file_content = minio_client.download_file_to_memory(original_object_name)
-        
-        self.update_state(
-            state='PROCESSING',
-            meta={
-                'progress': 30,
-                'filename': original_filename,
-                'status': 'converting'
-            }
-        )
-        
-        # 获取文件扩展名
-        file_extension = os.path.splitext(original_filename)[1].lower()
+        # 获取文件扩展名：优先使用API层按文件头识别的结果
+        file_extension = task_data.get('file_extension') or os.path.splitext(original_filename)[1].lower()
+        result_filename, result_object_name = _result_names(self.request.id, task_data)
         
         # 创建转换器实例
         converter = MarkdownConverter()
         
-        # 转换文件内容 - 使用同步版本避免async问题
-        markdown_content = _convert_sync(converter, file_content, file_extension, extract_images)
-        
-        self.update_state(
-            state='PROCESSING',
-            meta={
-                'progress': 80,
-                'filename': original_filename,
-                'status': 'uploading_result'
-            }
-        )
+        image_stats = None
+        # 计算原始文件SHA-256登记到内容索引，供前端上传前预检
+        digest = _ContentDigest() if content_index.enabled else None
+        if converter.get_streaming_converter(file_extension) is not None:
+            # CSV/JSON/TXT等：边读取边转换边写入临时文件，内存占用与文件大小无关
+            self.update_state(
+                state='PROCESSING',
+                meta={
+                    'progress': 30,
+                    'filename': original_filename,
+                    'status': 'converting'
+                }
+            )
+            section_index_object, inline = _convert_streaming(
+                converter, original_object_name, etag, file_extension, result_object_name, self.request.id,
+                digest, deadline, task_data.get('file_size')
+            )
+        else:
+            # 读取原始文件到内存（重试/重新转换时命中本地缓存，不再从MinIO下载）
+            logger.info(f"读取原始文件: {original_object_name}")
+            file_content = original_cache.read(original_object_name, etag)
+            if digest is not None:
+                digest.update(file_content)
+                _record_content(digest, task_data)
+            
+            self.update_state(
+                state='PROCESSING',
+                meta={
+                    'progress': 30,
+                    'filename': original_filename,
+                    'status': 'converting'
+                }
+            )
+            
+            # 转换文件内容 - 使用同步版本避免async问题
+            markdown_content = _convert_sync(
+                converter, file_content, file_extension, extract_images, checkpoint_run, deadline
+            )
+            
+            # 提取内嵌图像，去重后并发上传并改写图像链接
+            if extract_images:
+                self.update_state(
+                    state='PROCESSING',
+                    meta={
+                        'progress': 60,
+                        'filename': original_filename,
+                        'status': 'extracting_images'
+                    }
+                )
+                markdown_content, image_stats = extract_document_images(
+                    markdown_content, file_content, file_extension, _pdf_operation
+                )
+            
+            if deadline is not None and deadline.truncated:
+                markdown_content += deadline.marker()
+            
+            self.update_state(
+                state='PROCESSING',
+                meta={
+                    'progress': 80,
+                    'filename': original_filename,
+                    'status': 'uploading_result'
+                }
+            )
+            
+            result_bytes = markdown_content.encode('utf-8')
+            inline = inline_results.accepts(len(result_bytes)) and inline_results.put(self.request.id, result_bytes)
+            section_index_object = None
+            if not inline:
+                # 上传转换结果到MinIO
+                storage.upload_file_from_memory(
+                    result_object_name, 
+                    result_bytes, 
+                    content_type="text/markdown"
+                )
+                
+                # 章节偏移索引，供按章节读取结果
+                section_index_object = _upload_section_index(result_object_name, result_bytes)
         
-        # 上传转换结果到MinIO
-        result_filename = f"{os.path.splitext(original_filename)[0]}.md"
-        result_object_name = f"results/{self.request.id}/{result_filename}"
-        minio_client.upload_file_from_memory(
-            result_object_name, 
-            markdown_content, 
-            content_type="text/markdown"
+        return _complete_task(
+            self.request.id, task_data, inline, image_stats, section_index_object,
+            truncated=deadline is not None and deadline.truncated,
+            coverage=deadline.coverage() if deadline is not None else None,
+            digest=digest,
+            checkpoint_objects=checkpoint_run.object_names if checkpoint_run is not None else (),
         )
         
-        # 生成下载URL
-        download_url = minio_client.generate_download_url(result_object_name, result_filename)
-        
-        logger.info(f"任务 {self.request.id} 完成，结果文件: {result_object_name}")
-        
-        return {
-            'status': 'completed',
-            'task_id': self.request.id,
-            'result_object_name': result_object_name,
-            'download_url': download_url,
-            'filename': result_filename,
-            'original_filename': original_filename,
-            'completed_at': datetime.utcnow().isoformat()
-        }
-        
     except Exception as e:
-        logger.error(f"任务 {self.request.id} 处理失败: {str(e)}")
-        
-        # 设置任务状态为失败
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'error': str(e),
-                'filename': original_filename
-            }
+        return _fail_task(
+            self, task_data, e, checkpoint_run.object_names if checkpoint_run is not None else ()
         )
-        
-        # 重试机制
-        if self.request.retries < 3:
-            logger.info(f"任务 {self.request.id} 重试 {self.request.retries + 1}/3")
-            raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
-        
-        return {
-            'status': 'failed',
-            'task_id': self.request.id,
-            'error': str(e),
-            'filename': original_filename
-        }
 
 
-def _convert_sync(converter, file_content: bytes, file_extension: str, extract_images: bool) -> str:
+def _result_names(task_id: str, task_data: dict) -> tuple:
+    """结果文件名与结果对象名：(result_filename, result_object_name)"""
+    result_filename = f"{os.path.splitext(task_data.get('original_filename'))[0]}.md"
+    return result_filename, f"results/{task_id}/{result_filename}"
+
+
+def _complete_task(task_id: str, task_data: dict, inline: bool, image_stats,
+                   section_index_object, truncated: bool = False, coverage: dict = None, digest=None,
+                   checkpoint_objects=()) -> dict:
+    """任务成功结束：生成任务结果，清理检查点，登记内容索引，释放合并键并写入回调事件"""
+    result_filename, result_object_name = _result_names(task_id, task_data)
+    # 生成下载URL（内联结果不在对象存储中，由 /download 按需上传后生成）
+    download_url = None if inline else storage.generate_download_url(result_object_name, result_filename)
+    
+    logger.info(f"任务 {task_id} 完成，结果文件: {result_object_name}")
+    conversion_checkpoints.clear(checkpoint_objects)
+    # 有时限的任务可能只有部分结果，不作为可复用的转换结果登记
+    _record_content(digest, task_data, None if task_data.get('deadline') else task_id)
+    _release_coalesce(task_data, task_id)
+    
+    result = {
+        'status': 'completed',
+        'task_id': task_id,
+        'result_object_name': result_object_name,
+        'download_url': download_url,
+        'inline': inline,
+        'filename': result_filename,
+        'original_filename': task_data.get('original_filename'),
+        'images': image_stats,
+        'index_object_name': section_index_object,
+        'truncated': truncated,
+        'coverage': coverage,
+        'completed_at': datetime.utcnow().isoformat()
+    }
+    _notify_callback(task_data, task_id, result)
+    return result
+
+
+def _fail_task(task, task_data: dict, e: Exception, checkpoint_objects=()) -> dict:
+    """
+    任务出错：临时故障（存储/网络）重试（抛出Retry）；文件格式、内容、资源超限等永久性失败
+    或重试次数用完时结束任务，返回失败结果
+    """
+    task_id = task.request.id
+    original_filename = task_data.get('original_filename')
+    failure = classify_failure(e)
+    logger.error(f"任务 {task_id} 处理失败 ({failure.category}/{failure.error_type}): {str(e)}")
+    
+    # 不写入中间FAILURE状态：结果后端要求FAILURE的结果是序列化的异常，
+    # 普通dict会导致随后保存RETRY/最终结果以及查询状态时解码失败
+    
+    # 重试机制
+    if failure.retryable and task.request.retries < 3:
+        logger.info(f"任务 {task_id} 重试 {task.request.retries + 1}/3")
+        raise task.retry(exc=e, countdown=60 * (task.request.retries + 1))
+    
+    # 文件本身导致的失败：隔离内容，后续相同文件在创建任务时直接拒绝
+    if failure.poison:
+        poison_quarantine.add(
+            task_data.get('quarantine_key'), failure.error_type, str(e), original_filename
+        )
+    
+    conversion_checkpoints.clear(checkpoint_objects)
+    _release_coalesce(task_data, task_id)
+    result = {
+        'status': 'failed',
+        'task_id': task_id,
+        'error': str(e),
+        'error_type': failure.error_type,
+        'error_class': failure.category,
+        'filename': original_filename
+    }
+    _notify_callback(task_data, task_id, result)
+    return result
+
+
+def _notify_callback(task_data: dict, task_id: str, result: dict):
+    """任务最终结束后写入回调事件，由回调投递进程发送（重试期间不通知）"""
+    callback_url = task_data.get('callback_url')
+    if callback_url:
+        webhook_outbox.enqueue(callback_url, task_event(task_id, result))
+
+
+def _release_coalesce(task_data: dict, task_id: str):
+    """任务最终结束后释放合并键，重试期间保留以便后续请求继续合并"""
+    coalesce_key = task_data.get('coalesce_key')
+    if not coalesce_key:
+        return
+    try:
+        conversion_coalescer.release(coalesce_key, task_id)
+    except Exception as e:
+        logger.warning(f"释放任务合并键失败 {task_id}: {str(e)}")
+
+
+class _ContentDigest:
+    """原始文件的SHA-256与已读取的字节数"""
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._hexdigest = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> '_ContentDigest':
+        """使用其他阶段计算好的结果（流水线模式由下载阶段计算）"""
+        digest = cls()
+        digest._hexdigest = data['sha256']
+        digest.size = data['size']
+        return digest
+
+    def to_dict(self) -> dict:
+        return {'sha256': self.hexdigest(), 'size': self.size}
+
+    def hexdigest(self) -> str:
+        return self._hexdigest or self.sha256.hexdigest()
+
+    def update(self, content):
+        self.sha256.update(content)
+        self.size += len(content)
+
+    def feed(self, blocks):
+        """边读取边计算"""
+        for block in blocks:
+            self.update(block)
+            yield block
+
+
+def _record_content(digest, task_data: dict, task_id: str = None):
+    """登记原始文件（及完成的任务）到内容索引；没有读完整个文件（字节数与文件大小不符）时不登记"""
+    if digest is None:
+        return
+    file_size = task_data.get('file_size')
+    if digest.size != file_size:
+        logger.warning(f"原始文件读取字节数 {digest.size} 与大小 {file_size} 不符，不登记内容索引")
+        return
+    content_index.record(
+        task_data.get('user_id'),
+        digest.hexdigest(),
+        digest.size,
+        task_data.get('original_object_name'),
+        task_data.get('original_filename'),
+        task_data.get('extract_images', False),
+        task_id,
+    )
+
+
+def _upload_section_index(result_object_name: str, result_bytes: bytes):
+    """构建并上传章节索引，失败不影响转换结果"""
+    object_name = index_object_name(result_object_name)
+    try:
+        index = build_section_index(result_bytes)
+        storage.upload_file_from_memory(object_name, dump_index(index), content_type="application/json")
+        return object_name
+    except Exception as e:
+        logger.warning(f"生成章节索引失败 {result_object_name}: {str(e)}")
+        return None
+
+
+def _convert_streaming(converter, object_name: str, etag, file_extension: str, result_object_name: str,
+                       task_id: str, digest=None, deadline=None, file_size: int = None):
+    """
+    流式转换：按块读取原始对象，转换结果写入临时文件后按块上传（小结果内联保存）
+
+    流式转换器只做文本解析，在worker进程内执行，不经过沙箱；
+    有时限时到期后停止读取原始对象，已读取的部分照常转换并附加截断标记
+
+    Returns:
+        tuple: (章节索引对象名（生成失败或内联时为None）, 是否内联保存)
+    """
+    blocks = original_cache.iter_object(object_name, etag)
+    if deadline is not None:
+        blocks = deadline.limit_blocks(blocks, file_size or 0, file_extension)
+    if digest is not None:
+        blocks = digest.feed(blocks)
+    fd, result_path = tempfile.mkstemp(suffix='.md')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            _write_stream(f, converter.convert_stream(blocks, file_extension), deadline)
+        return _publish_file(result_path, result_object_name, task_id)
+    finally:
+        try:
+            os.unlink(result_path)
+        except OSError:
+            pass
+
+
+def _write_stream(f, blocks, deadline=None):
+    """写入流式转换结果，有时限且被截断时附加截断标记"""
+    for block in blocks:
+        f.write(block)
+    if deadline is not None and deadline.truncated:
+        f.write(deadline.marker())
+
+
+def _publish_file(result_path: str, result_object_name: str, task_id: str):
+    """
+    保存结果文件：小结果内联保存，否则按块上传并生成章节索引
+
+    Returns:
+        tuple: (章节索引对象名（生成失败或内联时为None）, 是否内联保存)
+    """
+    if inline_results.accepts(os.path.getsize(result_path)):
+        with open(result_path, 'rb') as f:
+            if inline_results.put(task_id, f.read()):
+                return None, True
+    
+    storage.upload_file_from_path(result_object_name, result_path, content_type="text/markdown")
+    
+    # 索引直接扫描结果文件的mmap，不把结果读入内存
+    with open(result_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _upload_section_index(result_object_name, b''), False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _upload_section_index(result_object_name, data), False
+
+
+@worker_process_shutdown.connect
+def _shutdown_sandbox(**kwargs):
+    """worker子进程退出时终止转换沙箱进程"""
+    close_sandbox()
+
+
+@celeryd_after_setup.connect
+def _setup_affinity_queue(sender, instance, **kwargs):
+    """worker启动时额外消费本节点的专属队列，并登记供API按文件路由（流水线模式由I/O worker消费）"""
+    if not queue_affinity.enabled or PIPELINE_STAGE == 'cpu':
+        return
+    queue = queue_affinity.worker_queue(sender)
+    instance.app.amqp.queues.select_add(queue)
+    queue_affinity.register(queue)
+
+
+@worker_shutdown.connect
+def _unregister_affinity_queue(sender, **kwargs):
+    if queue_affinity.enabled and PIPELINE_STAGE != 'cpu':
+        queue_affinity.unregister(queue_affinity.worker_queue(sender.hostname))
+
+
+def _convert_sync(converter, file_content: bytes, file_extension: str, extract_images: bool,
+                  checkpoint_run=None, deadline=None) -> str:
     """
     同步转换文件内容为Markdown
     
@@ -127,37 +435,179 @@ def _convert_sync(converter, file_content: bytes, file_extension: str, extract_i
         file_content: 文件内容字节流
         file_extension: 文件扩展名
         extract_images: 是否提取图像
+        checkpoint_run: 检查点（可选，长PDF分段转换并从已完成的区间继续）
+        deadline: 转换时限（可选，PDF渐进转换，到期返回已转换的部分）
     
     Returns:
         str: 转换后的Markdown内容
     """
-    import tempfile
-    from markitdown import MarkItDown
-    
     try:
         # 使用临时文件进行转换
         with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as temp_file:
             temp_file.write(file_content)
             temp_file.flush()
             temp_file_path = temp_file.name
-        
+    except Exception as e:
+        logger.error(f"文件转换失败: {str(e)}")
+        raise ValueError(f"转换失败: {str(e)}")
+    
+    try:
+        return _convert_path(converter, temp_file_path, file_extension, extract_images, checkpoint_run, deadline)
+    finally:
+        # 清理临时文件
         try:
-            # 使用MarkItDown进行转换（同步调用）
-            markitdown = MarkItDown()
-            result = markitdown.convert(temp_file_path)
-            
-            if result and hasattr(result, 'text_content'):
-                return result.text_content
+            os.unlink(temp_file_path)
+        except OSError:
+            pass
+
+
+def _convert_path(converter, input_path: str, file_extension: str, extract_images: bool,
+                  checkpoint_run=None, deadline=None) -> str:
+    """转换本地文件为Markdown（参数同 _convert_sync），文件扩展名需与 file_extension 一致"""
+    from app.services.fast_converters import create_markitdown
+    
+    options = conversion_options(file_extension, extract_images)
+    
+    try:
+        if file_extension == '.pdf' and (checkpoint_run is not None or deadline is not None):
+            if deadline is not None:
+                markdown = _convert_progressive(input_path, deadline)
             else:
-                raise ValueError("转换结果为空")
-                
-        finally:
-            # 清理临时文件
+                markdown = _convert_checkpointed(input_path, checkpoint_run)
+            if markdown is not None:
+                return markdown
+        
+        if SANDBOX_ENABLED:
+            # 在受资源限制的子进程中转换，异常文件不会拖垮worker
+            output_path = f"{input_path}.md"
             try:
-                os.unlink(temp_file_path)
-            except OSError:
-                pass
+                get_sandbox().convert(input_path, output_path, file_extension, options)
+                with open(output_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            finally:
+                try:
+                    os.unlink(output_path)
+                except OSError:
+                    pass
+        
+        # 使用MarkItDown进行转换（同步调用）
+        markitdown = create_markitdown()
+        result = markitdown.convert(input_path, **options)
+        
+        if result and hasattr(result, 'text_content'):
+            return result.text_content
+        else:
+            raise ValueError("转换结果为空")
                 
+    except (ConversionSandboxError, SoftTimeLimitExceeded):
+        raise
     except Exception as e:
         logger.error(f"文件转换失败: {str(e)}")
-        raise ValueError(f"转换失败: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"转换失败: {str(e)}")
+
+
+def _pdf_operation(input_path: str, operation: str, **args) -> dict:
+    """执行PDF分段转换操作（见 app.services.pdf_sections），启用沙箱时每次操作单独计算CPU时间和墙钟时间上限"""
+    if not SANDBOX_ENABLED:
+        return pdf_sections.OPERATIONS[operation](input_path, **args)
+    output_path = f"{input_path}.json"
+    try:
+        return get_sandbox().run(operation, input_path, output_path, args)
+    finally:
+        try:
+            os.unlink(output_path)
+        except OSError:
+            pass
+
+
+def _convert_checkpointed(input_path: str, checkpoint_run):
+    """
+    长PDF分段转换：按页区间执行PdfConverter的各步骤（见 app.services.pdf_sections），
+    每个区间完成后保存检查点，软超时重试或重新投递时跳过已完成的区间
+    
+    Returns:
+        str: Markdown内容；页数不足或转换器报错时返回None，改为整体转换（保持MarkItDown的错误处理和失败分类）
+    """
+    try:
+        pages = _pdf_operation(input_path, "pdf_page_count")["pages"]
+        if pages < CHECKPOINT_MIN_PAGES:
+            return None
+        ranges = pdf_sections.sections(pages, CHECKPOINT_PAGES_PER_SECTION)
+        
+        try:
+            markdown = pdf_sections.merge_layout([
+                checkpoint_run.section("layout", start, end, partial(_pdf_operation, input_path, "pdf_layout", start=start, end=end))
+                for start, end in ranges
+            ])
+        except Exception as e:
+            if not _is_conversion_error(e):
+                raise
+            # 与PdfConverter一致：pdfplumber失败时整个文档使用pdfminer提取文本
+            logger.warning(f"PDF表单识别失败，使用文本提取: {str(e)}")
+            markdown = None
+        
+        if markdown is None:
+            markdown = "".join(
+                checkpoint_run.section("text", start, end, partial(_pdf_operation, input_path, "pdf_text", start=start, end=end))["text"]
+                for start, end in ranges
+            )
+    except Exception as e:
+        if not _is_conversion_error(e):
+            raise
+        logger.warning(f"PDF分段转换失败，改为整体转换: {str(e)}")
+        return None
+    
+    if checkpoint_run.resumed:
+        logger.info(f"任务 {checkpoint_run.task_id} 从检查点恢复了 {checkpoint_run.resumed} 个区间")
+    return pdf_sections.postprocess(markdown)
+
+
+def _convert_progressive(input_path: str, deadline: ConversionDeadline):
+    """
+    有时限的PDF渐进转换：每次转换 DEADLINE_PAGES_PER_STEP 页的表单识别（pdfplumber），到期后停止
+    
+    在时限内处理完所有页时与PdfConverter的结果一致（没有表单页时继续用pdfminer提取全文，
+    来不及提取时使用pdfplumber的页面文本）；到期时返回已转换页的内容，覆盖范围记录在deadline中
+    
+    Returns:
+        str: Markdown内容；转换器报错时返回None，改为整体转换
+    """
+    try:
+        pages = _pdf_operation(input_path, "pdf_page_count")["pages"]
+        ranges = pdf_sections.sections(pages, DEADLINE_PAGES_PER_STEP)
+        deadline.track("pages", pages)
+        layouts = []
+        for start, end in ranges:
+            if layouts and deadline.expired():
+                break
+            layouts.append(_pdf_operation(input_path, "pdf_layout", start=start, end=end))
+            deadline.converted = end
+        
+        markdown = None
+        if not deadline.truncated:
+            markdown = pdf_sections.merge_layout(layouts)
+            if markdown is None:
+                texts = []
+                for start, end in ranges:
+                    if deadline.expired():
+                        break
+                    texts.append(_pdf_operation(input_path, "pdf_text", start=start, end=end)["text"])
+                if len(texts) == len(ranges):
+                    markdown = "".join(texts)
+        if markdown is None:
+            markdown = "\n\n".join(chunk for layout in layouts for chunk in layout["chunks"]).strip()
+    except Exception as e:
+        if not _is_conversion_error(e):
+            raise
+        logger.warning(f"PDF渐进转换失败，改为整体转换: {str(e)}")
+        deadline.reset()
+        return None
+    
+    return pdf_sections.postprocess(markdown)
+
+
+def _is_conversion_error(e: Exception) -> bool:
+    """转换器自身报错（文件内容问题），区别于资源超限和软超时"""
+    if isinstance(e, ConversionSandboxError):
+        return e.kind == 'conversion_error'
+    return not isinstance(e, (SoftTimeLimitExceeded, MemoryError))
\ No newline at end of file
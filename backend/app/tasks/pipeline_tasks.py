@@ -0,0 +1,275 @@
+"""
+流水线模式的转换任务（PIPELINE_ENABLED）
+
+convert_file_to_markdown 在一个prefork子进程中依次下载、转换、上传，子进程在网络I/O期间空闲。
+流水线模式把它拆成三个阶段，按资源类型分别使用进程池：
+
+    下载（I/O worker，线程池）  convert_file_to_markdown 只把原始文件写入本机临时目录
+      -> 转换（CPU worker，prefork）  convert_staged，消费本节点的 {prefix}cpu.{node} 队列
+      -> 上传（I/O worker，线程池）  upload_staged，消费本节点的 {prefix}io.{node} 队列
+
+- 三个阶段使用同一个任务ID：API查询状态、撤销任务的方式不变，最后一个阶段的返回值即任务结果；
+  前两个阶段不保存结果（只更新进度），最终失败时直接写入失败结果
+- 文件通过本机临时目录传递（见 app.services.scratch），后续阶段投递到本节点的专属队列
+- 每个阶段单独重试，重试沿用原队列；临时文件缺失（节点重启等）时从下载阶段重新开始
+- 本机等待转换的文件数达到 PIPELINE_MAX_STAGED 时，下载阶段延后重新投递到默认队列，由空闲的节点领取
+- 阶段队列登记心跳（见 app.services.queue_registry）：节点下线后其队列中的任务移回默认队列，
+  由I/O worker领取：转换阶段转回本节点存活的转换队列，否则从下载阶段重新开始（I/O worker不做转换）；
+  本节点转换worker不在线时下载阶段延后重新投递
+"""
+import os
+
+from celery import states
+from celery.exceptions import Ignore
+from celery.signals import celeryd_after_setup, worker_shutdown
+from loguru import logger
+
+from app.core.config import (
+    SANDBOX_ENABLED,
+    CELERY_DEFAULT_QUEUE,
+    PIPELINE_ENABLED,
+    PIPELINE_STAGE,
+    PIPELINE_BACKPRESSURE_SECONDS,
+    PIPELINE_HEARTBEAT_SECONDS,
+    PIPELINE_QUEUE_TTL_SECONDS,
+)
+from app.core.worker import celery_app, CONVERT_TASK_NAME, submit_task, pipeline_queue
+from app.services.original_cache import original_cache
+from app.services.content_index import content_index
+from app.services.checkpoints import conversion_checkpoints
+from app.services.deadline import ConversionDeadline
+from app.services.scratch import pipeline_scratch
+from app.services.queue_registry import QueueRegistry
+from app.services.image_extractor import extract_images as extract_document_images
+from app.api.v1.md_conv.conv import MarkdownConverter
+from app.tasks.markdown_tasks import (
+    _ContentDigest,
+    _complete_task,
+    _convert_path,
+    _fail_task,
+    _pdf_operation,
+    _publish_file,
+    _record_content,
+    _result_names,
+    _write_stream,
+)
+
+SCRATCH_BLOCK_SIZE = 256 * 1024
+PIPELINE_REGISTRY_KEY = "pipeline:queues"
+PIPELINE_RETIRED_KEY = "pipeline:retired"
+
+# 创建全局阶段队列登记实例（首次使用时连接broker）
+pipeline_queues = QueueRegistry(
+    PIPELINE_REGISTRY_KEY, PIPELINE_RETIRED_KEY, PIPELINE_HEARTBEAT_SECONDS, PIPELINE_QUEUE_TTL_SECONDS
+)
+
+
+def _file_extension(task_data: dict) -> str:
+    return task_data.get('file_extension') or os.path.splitext(task_data.get('original_filename'))[1].lower()
+
+
+def _update_progress(task, task_data: dict, progress: int, status: str):
+    task.update_state(
+        state='PROCESSING',
+        meta={
+            'progress': progress,
+            'filename': task_data.get('original_filename'),
+            'status': status
+        }
+    )
+
+
+def _store_final(task, result: dict) -> dict:
+    """不保存结果的阶段最终失败时，直接写入任务结果"""
+    task.backend.store_result(task.request.id, result, states.SUCCESS, request=task.request)
+    return result
+
+
+def _restart(task, task_data: dict, reason: str):
+    """临时文件缺失（节点重启、临时目录被清理）时从下载阶段重新开始"""
+    logger.warning(f"任务 {task.request.id} {reason}，从下载阶段重新开始")
+    submit_task(CONVERT_TASK_NAME, [task_data], task.request.id, queue=CELERY_DEFAULT_QUEUE)
+    raise Ignore()
+
+
+def _cpu_stage_live() -> bool:
+    try:
+        return pipeline_queues.is_live(pipeline_queue('cpu'))
+    except Exception as e:
+        logger.warning(f"查询本节点转换队列失败: {str(e)}")
+        return False
+
+
+def fetch_original(task, task_data: dict) -> dict:
+    """
+    下载阶段（convert_file_to_markdown 在流水线模式下的执行内容）：原始文件写入本机临时目录后投递转换阶段
+
+    Returns:
+        dict: 最终失败时的任务结果；成功投递转换阶段时抛出Ignore，不保存结果
+    """
+    task_id = task.request.id
+    if not pipeline_scratch.has_room() or not _cpu_stage_live():
+        # 本机转换跟不上下载或转换worker不在线：延后重新投递到默认队列（不占用重试次数），由其他节点或稍后的本节点领取
+        task.signature_from_request(
+            queue=CELERY_DEFAULT_QUEUE, countdown=PIPELINE_BACKPRESSURE_SECONDS
+        ).apply_async()
+        raise Ignore()
+
+    logger.info(f"开始处理任务 {task_id}, 文件: {task_data.get('original_filename')}")
+    _update_progress(task, task_data, 10, 'downloading')
+
+    input_path = None
+    try:
+        input_path = pipeline_scratch.input_path(task_id, _file_extension(task_data))
+        digest = _ContentDigest()
+        with open(input_path, 'wb') as f:
+            for block in original_cache.iter_object(task_data.get('original_object_name'), task_data.get('etag')):
+                digest.update(block)
+                f.write(block)
+        if content_index.enabled:
+            _record_content(digest, task_data)
+        stage = {
+            'input_path': input_path,
+            'digest': digest.to_dict() if content_index.enabled else None,
+        }
+        submit_task(convert_staged.name, [task_data, stage], task_id, queue=pipeline_queue('cpu'))
+    except Exception as e:
+        pipeline_scratch.remove(input_path)
+        return _fail_task(task, task_data, e)
+    raise Ignore()
+
+
+@celery_app.task(bind=True, max_retries=3, ignore_result=True, acks_late=True, reject_on_worker_lost=SANDBOX_ENABLED)
+def convert_staged(self, task_data: dict, stage: dict):
+    """转换阶段：转换临时目录中的原始文件，结果写入临时目录后投递上传阶段"""
+    task_id = self.request.id
+    input_path = stage['input_path']
+    if not os.path.exists(input_path):
+        _restart(self, task_data, "原始文件临时副本不存在")
+    if PIPELINE_STAGE != 'cpu':
+        # 转换worker下线期间移回默认队列、由I/O worker领取：线程池共用一个转换沙箱，不能在这里转换
+        if _cpu_stage_live():
+            submit_task(convert_staged.name, [task_data, stage], task_id, queue=pipeline_queue('cpu'))
+            raise Ignore()
+        pipeline_scratch.remove(input_path)
+        _restart(self, task_data, "本节点转换worker不在线")
+
+    file_extension = _file_extension(task_data)
+    extract_images = task_data.get('extract_images', False)
+    deadline = ConversionDeadline.from_task(task_data)
+    checkpoint_run = (
+        conversion_checkpoints.run(task_id) if conversion_checkpoints.enabled and deadline is None else None
+    )
+    _update_progress(self, task_data, 30, 'converting')
+
+    output_path = pipeline_scratch.output_path(task_id)
+    image_stats = None
+    try:
+        converter = MarkdownConverter()
+        if converter.get_streaming_converter(file_extension) is not None:
+            blocks = _read_blocks(input_path)
+            if deadline is not None:
+                blocks = deadline.limit_blocks(blocks, os.path.getsize(input_path), file_extension)
+            with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                _write_stream(f, converter.convert_stream(blocks, file_extension), deadline)
+        else:
+            markdown_content = _convert_path(
+                converter, input_path, file_extension, extract_images, checkpoint_run, deadline
+            )
+            if extract_images:
+                _update_progress(self, task_data, 60, 'extracting_images')
+                with open(input_path, 'rb') as f:
+                    markdown_content, image_stats = extract_document_images(
+                        markdown_content, f.read(), file_extension, _pdf_operation
+                    )
+            if deadline is not None and deadline.truncated:
+                markdown_content += deadline.marker()
+            with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(markdown_content)
+        
+        stage = dict(
+            stage,
+            output_path=output_path,
+            images=image_stats,
+            truncated=deadline is not None and deadline.truncated,
+            coverage=deadline.coverage() if deadline is not None else None,
+            checkpoint_objects=checkpoint_run.object_names if checkpoint_run is not None else [],
+        )
+        submit_task(upload_staged.name, [task_data, stage], task_id, queue=pipeline_queue('io'))
+    except Exception as e:
+        pipeline_scratch.remove(output_path)
+        checkpoint_objects = checkpoint_run.object_names if checkpoint_run is not None else ()
+        result = _fail_task(self, task_data, e, checkpoint_objects)
+        pipeline_scratch.remove(input_path)
+        return _store_final(self, result)
+
+    # 转换完成，释放本机的等待转换名额
+    pipeline_scratch.remove(input_path)
+
+
+@celery_app.task(bind=True, max_retries=3, acks_late=True)
+def upload_staged(self, task_data: dict, stage: dict):
+    """上传阶段：保存临时目录中的转换结果，返回任务结果"""
+    task_id = self.request.id
+    output_path = stage['output_path']
+    if not os.path.exists(output_path):
+        _restart(self, task_data, "转换结果临时文件不存在")
+
+    _update_progress(self, task_data, 80, 'uploading_result')
+    try:
+        _, result_object_name = _result_names(task_id, task_data)
+        section_index_object, inline = _publish_file(output_path, result_object_name, task_id)
+    except Exception as e:
+        result = _fail_task(self, task_data, e, stage['checkpoint_objects'])
+        pipeline_scratch.remove(output_path)
+        return result
+
+    pipeline_scratch.remove(output_path)
+    return _complete_task(
+        task_id, task_data, inline, stage['images'], section_index_object,
+        truncated=stage['truncated'],
+        coverage=stage['coverage'],
+        digest=_ContentDigest.from_dict(stage['digest']) if stage['digest'] else None,
+        checkpoint_objects=stage['checkpoint_objects'],
+    )
+
+
+def _read_blocks(path: str):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(SCRATCH_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+@celeryd_after_setup.connect
+def _setup_pipeline_queues(sender, instance, **kwargs):
+    """
+    流水线模式下按worker角色选择队列：
+    CPU worker只消费本节点的转换队列；I/O worker消费默认队列（下载阶段）和本节点的上传队列。
+    本节点的阶段队列登记心跳，其他节点下线后遗留的阶段任务由心跳移回默认队列
+    """
+    if not PIPELINE_ENABLED:
+        return
+    queues = instance.app.amqp.queues
+    if PIPELINE_STAGE == 'cpu':
+        queues.select_add(pipeline_queue('cpu'))
+        queues.deselect(CELERY_DEFAULT_QUEUE)
+        logger.info(f"流水线转换worker，队列: {pipeline_queue('cpu')}")
+    else:
+        queues.select_add(pipeline_queue('io'))
+        pipeline_scratch.sweep()
+        logger.info(f"流水线I/O worker，队列: {CELERY_DEFAULT_QUEUE}, {pipeline_queue('io')}")
+    pipeline_queues.register(_stage_queue())
+
+
+@worker_shutdown.connect
+def _unregister_pipeline_queue(sender, **kwargs):
+    if PIPELINE_ENABLED:
+        pipeline_queues.unregister(_stage_queue())
+
+
+def _stage_queue() -> str:
+    """本worker消费的阶段队列"""
+    return pipeline_queue('cpu' if PIPELINE_STAGE == 'cpu' else 'io')
@@ -3,9 +3,31 @@
 set -e
 
 if [[ "${MODE}" == "worker" ]]; then
-  CONCURRENCY_OPTION="-c ${CELERY_WORKER_AMOUNT:-4}"
+  if [[ -n "${CELERY_AUTOSCALE}" ]]; then
+    # 例如 CELERY_AUTOSCALE=8,2 表示最多8个、最少2个进程，按队列积压和内存自动伸缩
+    CONCURRENCY_OPTION="--autoscale=${CELERY_AUTOSCALE}"
+  else
+    CONCURRENCY_OPTION="-c ${CELERY_WORKER_AMOUNT:-4}"
+  fi
+  if [[ "${PIPELINE_ENABLED}" == "true" ]]; then
+    # 流水线模式：I/O worker（线程池）负责下载和上传，转换worker（prefork）只消费本节点的转换队列，
+    # 两者通过本机临时目录传递文件；任一worker退出时结束容器，由编排系统重启
+    PIPELINE_STAGE=io celery -A app.core.worker worker -P ${PIPELINE_IO_POOL:-threads} \
+      -c ${PIPELINE_IO_CONCURRENCY:-32} -n io@%h --loglevel ${LOG_LEVEL:-INFO} &
+    PIPELINE_STAGE=cpu celery -A app.core.worker worker $CONCURRENCY_OPTION -n cpu@%h --loglevel ${LOG_LEVEL:-INFO} &
+    trap 'kill -TERM $(jobs -p) 2>/dev/null' TERM INT
+    STATUS=0
+    wait -n || STATUS=$?
+    kill -TERM $(jobs -p) 2>/dev/null || true
+    wait || true
+    exit $STATUS
+  fi
   exec celery -A app.core.worker worker $CONCURRENCY_OPTION --loglevel ${LOG_LEVEL:-INFO}
 
+elif [[ "${MODE}" == "webhook" ]]; then
+  # 任务完成回调投递进程
+  exec python -m app.services.webhooks
+
 elif [[ "${MODE}" == "beat" ]]; then
   exec celery -A app.core.worker beat --loglevel ${LOG_LEVEL:-INFO}
 
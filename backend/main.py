@@ -1,3 +1,4 @@
+import sys
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
@@ -16,11 +17,15 @@ from app.core.config import (
     CORS_ALLOW_CREDENTIALS,
     CORS_ALLOW_METHODS,
     CORS_ALLOW_HEADERS,
+    CORS_EXPOSE_HEADERS,
     MINIO_ENDPOINT,
-    REDIS_URL
+    REDIS_URL,
+    STORAGE_BACKEND,
+    TASK_RUNTIME,
 )
 from app.core.auth import api_auth_middleware
 from app.api.v1.md_conv.async_routes import router as async_router
+from app.api.v1.storage.image_routes import router as image_router
 
 
 @asynccontextmanager
@@ -32,13 +37,24 @@ async def register_init(app: FastAPI) -> AsyncGenerator[None, None]:
     :return:
     """
     logger.info("启动Markdown转换服务...")
+    logger.info(f"Storage backend: {STORAGE_BACKEND}")
     logger.info(f"MinIO endpoint: {MINIO_ENDPOINT}")
     logger.info(f"Redis URL: {REDIS_URL}")
+    logger.info(f"Task runtime: {TASK_RUNTIME}")
+    if TASK_RUNTIME == "local":
+        from app.core.local_runtime import local_runtime
+        await local_runtime.start()
     logger.success("服务启动完成")
 
     yield
 
     logger.info("停止Markdown转换服务...")
+    if TASK_RUNTIME == "local":
+        await local_runtime.stop()
+    # URL抓取客户端只在使用过转换器的进程中加载，避免API进程启动时导入
+    http_client = sys.modules.get("app.services.http_client")
+    if http_client is not None:
+        await http_client.http_fetcher.aclose()
     logger.success("服务停止完成")
 
 app = FastAPI(
@@ -59,6 +75,7 @@ app.add_middleware(
     allow_credentials=CORS_ALLOW_CREDENTIALS,
     allow_methods=CORS_ALLOW_METHODS,
     allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=CORS_EXPOSE_HEADERS,
 )
 
 # API认证中间件
@@ -82,6 +99,10 @@ async def auth_middleware(request: Request, call_next):
 # 注册路由
 # app.include_router(md_conv_router, prefix="/api/v1")
 app.include_router(async_router, prefix="/api/v1")
+app.include_router(image_router, prefix="/api/v1")
+if STORAGE_BACKEND == "local":
+    from app.api.v1.storage.local_routes import router as local_storage_router
+    app.include_router(local_storage_router, prefix="/api/v1")
 
 
 @app.get("/")
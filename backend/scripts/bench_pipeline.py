@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+流水线模式基准测试：单任务 vs 下载/转换/上传分阶段（PIPELINE_ENABLED）
+
+在本机模拟一个worker节点，两种模式都执行真实的任务代码，只把Celery的消息投递换成进程内的进程池/线程池：
+    monolithic  --cpu-workers 个进程，每个进程依次下载、转换、上传（convert_file_to_markdown，等同prefork worker）
+    pipeline    --io-threads 个线程执行下载和上传（convert_file_to_markdown 的下载阶段、upload_staged），
+                --cpu-workers 个进程执行转换（convert_staged），本机等待转换的文件数不超过 --max-staged
+
+对象存储使用本地存储后端，并为每次请求注入延迟和带宽限制（--latency-ms / --bandwidth-mbps）模拟远端MinIO。
+输出每种模式的吞吐（文件/秒）、测试期间的节点CPU利用率（/proc/stat）以及流水线模式下转换进程的忙碌比例。
+
+用法（在 backend 目录下）:
+    python scripts/bench_pipeline.py --files 24 --latency-ms 100 --bandwidth-mbps 100
+    python scripts/bench_pipeline.py --input-dir ~/samples --files 60 --cpu-workers 4 --io-threads 32
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORDS = ["markdown", "convert", "storage", "pipeline", "worker", "queue", "latency", "document", "table", "stage"]
+# 子进程中由 _init_worker 设置：转换阶段投递下一阶段时记录在这里，返回给主进程
+_handoff = {}
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+
+
+def _write_html(path: str, rng: random.Random, sections: int):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<html><body>")
+        for i in range(sections):
+            f.write(f"<h2>Section {i}</h2><p>{_paragraph(rng)}</p><ul>")
+            f.write("".join(f"<li><b>{rng.choice(WORDS)}</b> {_paragraph(rng)}</li>" for _ in range(4)))
+            f.write("</ul><table><tr><th>key</th><th>value</th><th>note</th></tr>")
+            f.write("".join(f"<tr><td>{j}</td><td>{rng.random():.6f}</td><td>{rng.choice(WORDS)}</td></tr>" for j in range(8)))
+            f.write("</table>")
+        f.write("</body></html>")
+
+
+def _write_csv(path: str, rng: random.Random, rows: int):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("id,name,value,note\n")
+        for i in range(rows):
+            f.write(f"{i},{rng.choice(WORDS)},{rng.random():.6f},{_paragraph(rng)[:60]}\n")
+
+
+def prepare_inputs(args, directory: str) -> list:
+    """生成（或从 --input-dir 读取）测试文件并上传到存储，返回任务数据"""
+    from app.services.storage import storage
+
+    if args.input_dir:
+        sources = sorted(
+            os.path.join(args.input_dir, name) for name in os.listdir(args.input_dir)
+            if os.path.isfile(os.path.join(args.input_dir, name))
+        )
+    else:
+        rng = random.Random(42)
+        sources = []
+        for i in range(4):
+            path = os.path.join(directory, f"sample-{i}.html")
+            _write_html(path, rng, args.html_sections)
+            sources.append(path)
+        path = os.path.join(directory, "sample.csv")
+        _write_csv(path, rng, args.csv_rows)
+        sources.append(path)
+
+    task_datas = []
+    for i in range(args.files):
+        source = sources[i % len(sources)]
+        filename = os.path.basename(source)
+        object_name = f"uploads/bench/{i}/{filename}"
+        storage.upload_file_from_path(object_name, source)
+        task_datas.append({
+            "original_object_name": object_name,
+            "original_filename": filename,
+            "file_size": os.path.getsize(source),
+            "file_extension": os.path.splitext(filename)[1].lower(),
+        })
+    return task_datas
+
+
+def _throttle_storage(latency: float, bandwidth: float):
+    """为存储请求注入延迟（每次请求）和传输时间（按字节数/带宽）"""
+    from app.services.storage import storage
+
+    def transfer(size: int = 0, requests: int = 1):
+        time.sleep(latency * requests + (size / bandwidth if bandwidth else 0))
+
+    iter_object = storage.iter_object
+    upload_file_from_path = storage.upload_file_from_path
+    upload_file_from_memory = storage.upload_file_from_memory
+    download_file_to_memory = storage.download_file_to_memory
+
+    def throttled_iter_object(object_name, *a, **k):
+        transfer()
+        for chunk in iter_object(object_name, *a, **k):
+            transfer(len(chunk), requests=0)
+            yield chunk
+
+    def throttled_upload_file_from_path(object_name, file_path, *a, **k):
+        transfer(os.path.getsize(file_path))
+        return upload_file_from_path(object_name, file_path, *a, **k)
+
+    def throttled_upload_file_from_memory(object_name, data, *a, **k):
+        transfer(len(data))
+        return upload_file_from_memory(object_name, data, *a, **k)
+
+    def throttled_download_file_to_memory(object_name, *a, **k):
+        data = download_file_to_memory(object_name, *a, **k)
+        transfer(len(data))
+        return data
+
+    storage.iter_object = throttled_iter_object
+    storage.upload_file_from_path = throttled_upload_file_from_path
+    storage.upload_file_from_memory = throttled_upload_file_from_memory
+    storage.download_file_to_memory = throttled_download_file_to_memory
+
+
+def _setup_tasks(latency: float, bandwidth: float, pipeline: bool):
+    """在当前进程中加载任务代码：不保存结果、不更新进度，阶段投递由基准测试接管"""
+    from loguru import logger
+    logger.remove()
+
+    from app.core.worker import celery_app
+    from app.tasks import markdown_tasks, pipeline_tasks
+
+    celery_app.conf.task_store_eager_result = False
+    celery_app.set_default()
+    for task in (markdown_tasks.convert_file_to_markdown, pipeline_tasks.convert_staged, pipeline_tasks.upload_staged):
+        task.update_state = lambda *a, **k: None
+    markdown_tasks.PIPELINE_ENABLED = pipeline
+    _throttle_storage(latency, bandwidth)
+    return markdown_tasks, pipeline_tasks
+
+
+def _init_worker(latency: float, bandwidth: float, pipeline: bool):
+    _, pipeline_tasks = _setup_tasks(latency, bandwidth, pipeline)
+
+    def capture(name, args, task_id, queue=None):
+        _handoff[task_id] = (name, args)
+
+    pipeline_tasks.submit_task = capture
+    # 预先加载转换器，避免首个任务的导入时间计入测试
+    from app.services.fast_converters import create_markitdown
+    create_markitdown()
+
+
+def _ready(_):
+    return os.getpid()
+
+
+def _run_monolithic(item):
+    index, task_data = item
+    from app.tasks.markdown_tasks import convert_file_to_markdown
+    result = convert_file_to_markdown.apply(args=[task_data], task_id=f"mono-{index}").result
+    return result["status"]
+
+
+def _run_convert(item):
+    """转换阶段（子进程）：返回耗时和投递给上传阶段的参数"""
+    task_id, args = item
+    from app.tasks.pipeline_tasks import convert_staged
+    started = time.perf_counter()
+    convert_staged.apply(args=args, task_id=task_id)
+    return time.perf_counter() - started, _handoff.pop(task_id, None)
+
+
+def _host_cpu() -> tuple:
+    """节点CPU时间（/proc/stat 汇总行）：(忙碌, 总计)，单位为时钟周期"""
+    with open("/proc/stat") as f:
+        values = [int(value) for value in f.readline().split()[1:]]
+    idle = values[3] + values[4]  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+
+def _utilization(before: tuple, after: tuple) -> float:
+    total = after[1] - before[1]
+    return (after[0] - before[0]) / total if total else 0.0
+
+
+def _start_pool(args, pipeline: bool):
+    pool = get_context("fork").Pool(
+        args.cpu_workers, initializer=_init_worker,
+        initargs=(args.latency_ms / 1000, args.bandwidth_mbps * 125000, pipeline),
+    )
+    pool.map(_ready, range(args.cpu_workers), chunksize=1)
+    return pool
+
+
+def run_monolithic(args, task_datas: list) -> dict:
+    pool = _start_pool(args, pipeline=False)
+    cpu_before, started = _host_cpu(), time.perf_counter()
+    statuses = list(pool.imap_unordered(_run_monolithic, enumerate(task_datas), chunksize=1))
+    elapsed = time.perf_counter() - started
+    cpu = _utilization(cpu_before, _host_cpu())
+    pool.close()
+    pool.join()
+    return {"elapsed": elapsed, "cpu": cpu, "statuses": statuses, "convert_busy": None}
+
+
+def run_pipeline(args, task_datas: list) -> dict:
+    # 先创建转换进程池，子进程不继承主进程中的替换
+    pool = _start_pool(args, pipeline=True)
+    io_pool = ThreadPoolExecutor(args.io_threads)
+    markdown_tasks, pipeline_tasks = _setup_tasks(args.latency_ms / 1000, args.bandwidth_mbps * 125000, True)
+    pipeline_tasks.pipeline_scratch.max_staged = len(task_datas) + 1  # 由下面的信号量限制
+    staged = threading.BoundedSemaphore(args.max_staged)
+    statuses, convert_seconds = [], []
+    done = threading.Event()
+
+    def finished(status: str):
+        statuses.append(status)
+        if len(statuses) == len(task_datas):
+            done.set()
+
+    def upload(task_id: str, stage_args: list):
+        finished(pipeline_tasks.upload_staged.apply(args=stage_args, task_id=task_id).result["status"])
+
+    def dispatch(name, stage_args, task_id, queue=None):
+        # 下载阶段投递转换阶段：交给转换进程池，完成后上传阶段交给I/O线程池
+        pool.apply_async(_run_convert, ((task_id, stage_args),), callback=lambda outcome: converted(task_id, outcome))
+
+    def converted(task_id: str, outcome):
+        seconds, handoff = outcome
+        staged.release()
+        convert_seconds.append(seconds)
+        if handoff is None:
+            finished("failed")
+        else:
+            io_pool.submit(upload, task_id, handoff[1])
+
+    pipeline_tasks.submit_task = dispatch
+
+    def fetch(index: int, task_data: dict):
+        result = markdown_tasks.convert_file_to_markdown.apply(args=[task_data], task_id=f"pipe-{index}")
+        if isinstance(result.result, dict):
+            # 下载失败，未进入转换阶段
+            staged.release()
+            finished(result.result["status"])
+
+    cpu_before, started = _host_cpu(), time.perf_counter()
+    for index, task_data in enumerate(task_datas):
+        # 等待转换名额后再下载（对应下载阶段的延后重新投递，不占用I/O线程）
+        staged.acquire()
+        io_pool.submit(fetch, index, task_data)
+    done.wait()
+    elapsed = time.perf_counter() - started
+    cpu = _utilization(cpu_before, _host_cpu())
+    io_pool.shutdown()
+    pool.close()
+    pool.join()
+    return {
+        "elapsed": elapsed,
+        "cpu": cpu,
+        "statuses": statuses,
+        "convert_busy": sum(convert_seconds) / (elapsed * args.cpu_workers),
+    }
+
+
+def report(name: str, stats: dict, files: int):
+    failed = sum(1 for status in stats["statuses"] if status != "completed")
+    busy = f"{stats['convert_busy'] * 100:5.1f}%" if stats["convert_busy"] is not None else "    -"
+    print(
+        f"{name:<11} {stats['elapsed']:8.2f}s {files / stats['elapsed']:10.2f} "
+        f"{stats['cpu'] * 100:8.1f}% {busy:>10} {failed:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流水线模式基准测试")
+    parser.add_argument("--files", type=int, default=24, help="任务数")
+    parser.add_argument("--input-dir", help="使用目录中的文件作为输入（循环使用），默认生成HTML和CSV")
+    parser.add_argument("--html-sections", type=int, default=150, help="生成的HTML文件的章节数")
+    parser.add_argument("--csv-rows", type=int, default=20000, help="生成的CSV文件的行数")
+    parser.add_argument("--latency-ms", type=float, default=100, help="每次存储请求的延迟")
+    parser.add_argument("--bandwidth-mbps", type=float, default=100, help="存储带宽（Mbit/s），0为不限")
+    parser.add_argument("--cpu-workers", type=int, default=os.cpu_count() or 1, help="转换进程数（prefork并发数）")
+    parser.add_argument("--io-threads", type=int, default=16, help="流水线模式的I/O线程数")
+    parser.add_argument("--max-staged", type=int, default=8, help="流水线模式本机等待转换的文件数上限")
+    parser.add_argument("--mode", choices=["both", "monolithic", "pipeline"], default="both")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-pipeline-")
+    os.environ.update({
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_ROOT": os.path.join(directory, "storage"),
+        "PIPELINE_SCRATCH_DIR": os.path.join(directory, "scratch"),
+        "TASK_RUNTIME": "local",
+        "LOCAL_RUNTIME_DB": os.path.join(directory, "tasks.db"),
+    })
+    for name in ("SANDBOX_ENABLED", "ORIGINAL_CACHE_ENABLED", "CHECKPOINT_ENABLED", "CONTENT_INDEX_ENABLED"):
+        os.environ.setdefault(name, "false")
+
+    try:
+        task_datas = prepare_inputs(args, directory)
+        print(
+            f"{args.files} 个任务, 转换进程 {args.cpu_workers}, I/O线程 {args.io_threads}, "
+            f"存储延迟 {args.latency_ms:.0f}ms, 带宽 {args.bandwidth_mbps:g}Mbit/s, CPU核数 {os.cpu_count()}"
+        )
+        print(f"{'mode':<11} {'elapsed':>9} {'files/s':>10} {'cpu util':>9} {'conv busy':>10} {'failed':>6}")
+        if args.mode in ("both", "monolithic"):
+            report("monolithic", run_monolithic(args, task_datas), args.files)
+        if args.mode in ("both", "pipeline"):
+            report("pipeline", run_pipeline(args, task_datas), args.files)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
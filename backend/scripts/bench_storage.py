@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+存储后端基准测试：LocalStorage vs MinioClient
+
+MinIO端使用 MINIO_ENDPOINT 指向的服务；加 --moto 参数时自动启动本地
+moto_server（pip install "moto[server]"）作为MinIO替身，无需真实集群。
+
+用法（在 backend 目录下）:
+    python scripts/bench_storage.py --moto --count 50 --size-kb 1024 --concurrency 8
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_moto() -> subprocess.Popen:
+    """启动moto_server作为本地MinIO替身，并设置MinIO环境变量"""
+    port = _free_port()
+    process = subprocess.Popen(
+        ["moto_server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    os.environ.update({
+        "MINIO_ENDPOINT": f"127.0.0.1:{port}",
+        "MINIO_ACCESS_KEY": "bench",
+        "MINIO_SECRET_KEY": "bench-secret",
+        "MINIO_SECURE": "false",
+        "MINIO_REGION": "us-east-1",
+    })
+    return process
+
+
+def _run(label: str, fn, items, concurrency: int, total_bytes: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fn, items))
+    elapsed = time.perf_counter() - started
+    return {
+        "op": label,
+        "seconds": elapsed,
+        "ops_s": len(items) / elapsed,
+        "mb_s": total_bytes / elapsed / 1024 / 1024,
+    }
+
+
+def bench(backend, name: str, count: int, size: int, concurrency: int) -> list:
+    payload = os.urandom(size)
+    names = [f"bench/{name}/{i}.bin" for i in range(count)]
+    total = count * size
+
+    def download(object_name):
+        content = backend.download_file_to_memory(object_name)
+        # 与转换器一致：完整读取一遍内容
+        return len(bytes(content))
+
+    results = [
+        _run("upload", lambda n: backend.upload_file_from_memory(n, payload), names, concurrency, total),
+        _run("download", download, names, concurrency, total),
+        _run("stat", backend.stat_object, names, concurrency, 0),
+        _run("presign", backend.generate_download_url, names, concurrency, 0),
+    ]
+    for object_name in names:
+        backend.delete_object(object_name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存储后端基准测试")
+    parser.add_argument("--count", type=int, default=50, help="对象数量")
+    parser.add_argument("--size-kb", type=int, default=1024, help="对象大小（KB）")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数")
+    parser.add_argument("--moto", action="store_true", help="启动moto_server作为MinIO替身")
+    args = parser.parse_args()
+
+    moto = _start_moto() if args.moto else None
+    root = tempfile.mkdtemp(prefix="bench-storage-")
+    try:
+        from loguru import logger
+        logger.remove()
+
+        from app.services.local_storage import LocalStorage
+        from app.services.minio_client import MinioClient
+
+        minio = MinioClient()
+        # 替身服务是全新的，绕过Redis中的存储桶检查缓存直接建桶
+        minio.ensure_bucket_exists()
+        backends = [("local", LocalStorage(root)), ("minio", minio)]
+        size = args.size_kb * 1024
+        print(f"objects={args.count} size={args.size_kb}KB concurrency={args.concurrency}")
+        print(f"{'backend':<8} {'op':<9} {'seconds':>9} {'ops/s':>10} {'MB/s':>10}")
+        for name, backend in backends:
+            for row in bench(backend, name, args.count, size, args.concurrency):
+                print(f"{name:<8} {row['op']:<9} {row['seconds']:>9.3f} {row['ops_s']:>10.1f} {row['mb_s']:>10.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        if moto is not None:
+            moto.terminate()
+            moto.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+流式转换器基准测试：流式转换器 vs MarkItDown
+
+为CSV/JSON/TXT生成指定大小的测试文件，每种格式每条路径在独立子进程中转换
+（峰值RSS互不影响），输出耗时、吞吐量、峰值RSS增量，以及两条路径的结果是否一致
+（JSON流式转换器输出带缩进的代码块，与MarkItDown原样输出不同，不比较）。
+
+用法（在 backend 目录下）:
+    python scripts/bench_streaming_converters.py --size-mb 200
+    python scripts/bench_streaming_converters.py --size-mb 50 --formats csv,txt
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FORMATS = ("csv", "json", "txt")
+WORDS = ["alpha", "beta", "gamma", "delta", "数据", "转换", "测试", "报表", "quoted, value", "pipe|cell"]
+
+
+def _write_csv(f, size: int, rng: random.Random):
+    f.write("id,name,amount,comment,created_at\n")
+    row = 0
+    while f.tell() < size:
+        row += 1
+        comment = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+        f.write(f'{row},user{row % 997},{rng.random() * 1000:.2f},"{comment}",2024-01-{row % 28 + 1:02d}\n')
+
+
+def _write_json(f, size: int, rng: random.Random):
+    f.write('{"records": [')
+    row = 0
+    while f.tell() < size:
+        if row:
+            f.write(",")
+        row += 1
+        record = {
+            "id": row,
+            "name": f"user{row % 997}",
+            "tags": [rng.choice(WORDS) for _ in range(rng.randint(0, 3))],
+            "score": round(rng.random(), 4),
+            "active": row % 3 == 0,
+            "extra": None,
+        }
+        f.write(json.dumps(record, ensure_ascii=False))
+    f.write("]}")
+
+
+def _write_txt(f, size: int, rng: random.Random):
+    while f.tell() < size:
+        f.write(" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))) + "\n")
+        if rng.random() < 0.05:
+            f.write("\n")
+
+
+def generate(directory: str, fmt: str, size: int) -> str:
+    path = os.path.join(directory, f"sample.{fmt}")
+    writer = {"csv": _write_csv, "json": _write_json, "txt": _write_txt}[fmt]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer(f, size, random.Random(42))
+    return path
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(engine: str, path: str, output: str):
+    """子进程：执行一次转换，结果写入output，在stdout输出统计JSON"""
+    from loguru import logger
+    logger.remove()
+
+    extension = os.path.splitext(path)[1]
+    if engine == "markitdown":
+        from markitdown import MarkItDown
+        converter = MarkItDown()
+    else:
+        from app.api.v1.md_conv.conv import MarkdownConverter
+        from app.services.streaming_converters import iter_file
+        converter = MarkdownConverter()
+    baseline = _max_rss_mb()
+
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        if engine == "markitdown":
+            text = converter.convert(path).text_content
+            f.write(text)
+            digest.update(text.encode("utf-8"))
+        else:
+            for block in converter.convert_stream(iter_file(path), extension):
+                f.write(block)
+                digest.update(block.encode("utf-8"))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "seconds": elapsed,
+        "rss_delta_mb": _max_rss_mb() - baseline,
+        "output_bytes": os.path.getsize(output),
+        "sha256": digest.hexdigest(),
+    }))
+
+
+def measure(engine: str, path: str, directory: str) -> dict:
+    output = os.path.join(directory, f"out-{engine}.md")
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", engine, path, output],
+        capture_output=True, text=True, check=True,
+    )
+    os.unlink(output)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式转换器基准测试")
+    parser.add_argument("--size-mb", type=int, default=100, help="每种格式测试文件大小（MB）")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="测试的格式，逗号分隔")
+    parser.add_argument("--case", nargs=3, metavar=("ENGINE", "INPUT", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(*args.case)
+        return
+
+    directory = tempfile.mkdtemp(prefix="bench-streaming-")
+    try:
+        size = args.size_mb * 1024 * 1024
+        print(f"size={args.size_mb}MB（RSS为转换期间峰值RSS相对导入完成后的增量）")
+        print(f"{'format':<7} {'engine':<11} {'seconds':>9} {'MB/s':>8} {'RSS MB':>9} {'out MB':>8} {'same':>5}")
+        for fmt in args.formats.split(","):
+            path = generate(directory, fmt.strip(), size)
+            input_mb = os.path.getsize(path) / 1024 / 1024
+            rows = {engine: measure(engine, path, directory) for engine in ("markitdown", "streaming")}
+            same = rows["markitdown"]["sha256"] == rows["streaming"]["sha256"]
+            for engine, row in rows.items():
+                print(
+                    f"{fmt:<7} {engine:<11} {row['seconds']:>9.2f} {input_mb / row['seconds']:>8.1f} "
+                    f"{row['rss_delta_mb']:>9.1f} {row['output_bytes'] / 1024 / 1024:>8.1f} "
+                    f"{'-' if fmt == 'json' else ('yes' if same else 'no'):>5}"
+                )
+            os.unlink(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+HTML快速引擎与MarkItDown输出核对及基准测试
+
+遍历语料目录中的 .html/.htm/.xhtml/.epub 文件，分别用MarkItDown内置转换器和快速转换器
+（FastHtmlConverter / ParallelEpubConverter）转换，两者输出经过MarkItDown相同的规范化后比较，
+报告完全一致的比例、平均相似度、总耗时与加速比，并列出差异最大的文件。
+
+用法（在 backend 目录下）:
+    python scripts/compare_html_engines.py /usr/share/doc --limit 500
+    python scripts/compare_html_engines.py ./corpus --show 5 --diff
+    # 用语料中的HTML拼装一本N章的EPUB，核对并行章节转换（EPUB_CHAPTER_WORKERS控制进程数）
+    EPUB_CHAPTER_WORKERS=4 python scripts/compare_html_engines.py ./corpus --build-epub 300
+"""
+import argparse
+import difflib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HTML_EXTENSIONS = ('.html', '.htm', '.xhtml')
+EPUB_EXTENSIONS = ('.epub',)
+
+
+def collect(directories, limit: int, seed: int) -> list:
+    files = []
+    for directory in directories:
+        for root, _, names in os.walk(directory):
+            files.extend(
+                os.path.join(root, name) for name in names
+                if name.lower().endswith(HTML_EXTENSIONS + EPUB_EXTENSIONS)
+            )
+    files.sort()
+    random.Random(seed).shuffle(files)
+    return files[:limit] if limit else files
+
+
+def build_epub(html_files: list, chapters: int, directory: str) -> str:
+    """把语料中的HTML文件打包成一本EPUB（每个文件一章）"""
+    path = os.path.join(directory, f"corpus-{chapters}.epub")
+    selected = html_files[:chapters]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        z.writestr('META-INF/container.xml', (
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>'
+        ))
+        manifest, spine = [], []
+        for index, source in enumerate(selected):
+            name = f"chapter{index:04d}.html"
+            with open(source, 'rb') as f:
+                z.writestr(f"OEBPS/{name}", f.read())
+            manifest.append(f'<item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="c{index}"/>')
+        z.writestr('OEBPS/content.opf', (
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Corpus</dc:title>'
+            '<dc:creator>compare_html_engines</dc:creator></metadata>'
+            f'<manifest>{"".join(manifest)}</manifest><spine>{"".join(spine)}</spine></package>'
+        ))
+    return path
+
+
+def similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a.splitlines(), b.splitlines(), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML快速引擎与MarkItDown输出核对")
+    parser.add_argument("corpus", nargs="+", help="语料目录")
+    parser.add_argument("--limit", type=int, default=0, help="最多核对的文件数（随机抽样，0为全部）")
+    parser.add_argument("--seed", type=int, default=1, help="抽样随机种子")
+    parser.add_argument("--show", type=int, default=10, help="列出差异最大的文件数")
+    parser.add_argument("--diff", action="store_true", help="同时输出差异内容")
+    parser.add_argument("--build-epub", type=int, default=0, metavar="CHAPTERS", help="用语料拼装一本指定章节数的EPUB一并核对")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+    from markitdown import StreamInfo
+    from markitdown.converters import EpubConverter, HtmlConverter
+    from app.core.config import EPUB_CHAPTER_WORKERS
+    from app.services.fast_converters import (
+        FastHtmlConverter,
+        ParallelEpubConverter,
+        close_chapter_pool,
+    )
+    from app.services.fast_html import FAST_HTML_AVAILABLE
+    from app.services.streaming_converters import normalize_markdown
+
+    if not FAST_HTML_AVAILABLE:
+        sys.exit("未安装lxml，快速引擎不可用")
+
+    engines = {
+        'html': (HtmlConverter(), FastHtmlConverter()),
+        'epub': (EpubConverter(), ParallelEpubConverter()),
+    }
+
+    def convert(converter, content: bytes, extension: str):
+        started = time.perf_counter()
+        markdown = converter.convert(io.BytesIO(content), StreamInfo(extension=extension)).markdown
+        return ''.join(normalize_markdown(iter([markdown]))), time.perf_counter() - started
+
+    directory = tempfile.mkdtemp(prefix="compare-html-")
+    try:
+        files = collect(args.corpus, args.limit, args.seed)
+        if args.build_epub:
+            html_files = [path for path in files if path.lower().endswith(HTML_EXTENSIONS)]
+            files.append(build_epub(html_files, args.build_epub, directory))
+
+        totals = {kind: {'files': 0, 'same': 0, 'similarity': 0.0, 'markitdown': 0.0, 'fast': 0.0} for kind in engines}
+        differences = []
+        for path in files:
+            extension = os.path.splitext(path)[1].lower()
+            kind = 'epub' if extension in EPUB_EXTENSIONS else 'html'
+            with open(path, 'rb') as f:
+                content = f.read()
+            reference, reference_seconds = convert(engines[kind][0], content, extension)
+            output, seconds = convert(engines[kind][1], content, extension)
+            score = similarity(reference, output)
+
+            total = totals[kind]
+            total['files'] += 1
+            total['same'] += reference == output
+            total['similarity'] += score
+            total['markitdown'] += reference_seconds
+            total['fast'] += seconds
+            if reference != output:
+                differences.append((score, path, reference, output))
+
+        print(f"EPUB章节进程数: {EPUB_CHAPTER_WORKERS}")
+        print(f"{'kind':<5} {'files':>6} {'same':>6} {'same%':>7} {'similar':>8} {'markitdown s':>13} {'fast s':>8} {'speedup':>8}")
+        for kind, total in totals.items():
+            if not total['files']:
+                continue
+            print(
+                f"{kind:<5} {total['files']:>6} {total['same']:>6} {total['same'] / total['files']:>7.1%} "
+                f"{total['similarity'] / total['files']:>8.4f} {total['markitdown']:>13.2f} {total['fast']:>8.2f} "
+                f"{total['markitdown'] / max(total['fast'], 1e-9):>7.1f}x"
+            )
+
+        differences.sort(key=lambda item: item[0])
+        for score, path, reference, output in differences[:args.show]:
+            print(f"\n{score:.4f}  {path}")
+            if args.diff:
+                diff = difflib.unified_diff(
+                    reference.splitlines(), output.splitlines(), "markitdown", "fast", n=1, lineterm="",
+                )
+                for line in list(diff)[:40]:
+                    print(f"    {line[:160]}")
+    finally:
+        close_chapter_pool()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
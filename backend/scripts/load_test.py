@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+异步API压测工具
+
+按配置的并发和请求配比驱动以下接口，请求按 generate_api_signature 签名：
+    upload   POST /async/upload-url（并将文件PUT到返回的预签名URL）
+    create   POST /async/create-task
+    status   GET  /async/task/{task_id}
+    download GET  /async/download/{task_id}
+
+输出每个接口的请求数、吞吐、p50/p95/p99延迟、4xx与错误率（5xx及连接异常）。
+
+--local 模式无需MinIO/Redis/独立worker：
+    - moto_server 作为MinIO替身（pip install "moto[server]"）
+    - 本机有 redis-server 时启动一个临时实例，否则在子进程中运行 fakeredis 的TCP服务（pip install "fakeredis[lua]"）
+    - API子进程中Celery使用 memory:// broker 与 cache+memory:// 结果后端，
+      由进程内线程池worker执行转换
+
+用法（在 backend 目录下）:
+    python scripts/load_test.py --local --concurrency 32 --duration 30
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 --secret $API_SECRET_KEY \\
+        --mix upload=1,create=1,status=6,download=2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+API_PREFIX = "/api/v1/async"
+DEFAULT_MIX = "upload=1,create=1,status=6,download=2"
+LOCAL_SECRET = "load-test-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"端口 {port} 未就绪")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """解析请求配比，例如 upload=1,create=1,status=6,download=2"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ("upload", "create", "status", "download"):
+            raise ValueError(f"未知的接口: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Stats:
+    """按接口汇总延迟和状态码"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.client_errors: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, elapsed: float, status: Optional[int]):
+        self.latencies[endpoint].append(elapsed)
+        if status is None or status >= 500:
+            self.errors[endpoint] += 1
+        elif status >= 400:
+            self.client_errors[endpoint] += 1
+
+    def report(self, duration: float) -> List[dict]:
+        rows = []
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            count = len(values)
+            rows.append({
+                "endpoint": endpoint,
+                "requests": count,
+                "rps": count / duration,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "4xx_rate": self.client_errors[endpoint] / count,
+                "error_rate": self.errors[endpoint] / count,
+            })
+        return rows
+
+
+class LoadGenerator:
+    """闭环压测：每个虚拟用户按配比循环发起请求"""
+
+    def __init__(self, base_url: str, secret: str, mix: Dict[str, float], file_size: int, put_files: bool):
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self.secret = secret
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.payload = (b"load test line\n" * (file_size // 15 + 1))[:file_size]
+        self.put_files = put_files
+        self.stats = Stats()
+        self.uploaded: List[str] = []
+        self.task_ids: List[str] = []
+        self.client = httpx.AsyncClient(
+            timeout=60,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+        )
+
+    async def _request(self, endpoint: str, method: str, path: str, payload: dict = None):
+        from app.core.auth import generate_api_signature
+
+        body = json.dumps(payload) if payload is not None else ""
+        signature, timestamp = generate_api_signature(method, API_PREFIX + path, body, self.secret)
+        headers = {"X-API-Signature": signature, "X-API-Timestamp": str(timestamp)}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+
+        started = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.request(
+                method, self.base_url + API_PREFIX + path, content=body.encode("utf-8"), headers=headers
+            )
+            status = response.status_code
+            return response
+        except Exception:
+            return None
+        finally:
+            self.stats.record(endpoint, time.perf_counter() - started, status)
+
+    async def upload(self):
+        filename = f"load-{random.getrandbits(32):08x}.txt"
+        response = await self._request("upload", "POST", "/upload-url", {
+            "filename": filename,
+            "content_type": "text/plain",
+        })
+        if response is None or response.status_code != 200:
+            return
+        result = response.json()
+        if self.put_files:
+            started = time.perf_counter()
+            status = None
+            try:
+                put = await self.client.put(
+                    result["upload_url"], content=self.payload, headers={"Content-Type": "text/plain"}
+                )
+                status = put.status_code
+            except Exception:
+                pass
+            finally:
+                self.stats.record("storage_put", time.perf_counter() - started, status)
+            if status != 200:
+                return
+        self.uploaded.append(result["object_name"])
+
+    async def create(self):
+        if not self.uploaded:
+            return await self.upload()
+        response = await self._request("create", "POST", "/create-task", {
+            "object_name": random.choice(self.uploaded),
+            "original_filename": "load-test.txt",
+            "extract_images": False,
+        })
+        if response is not None and response.status_code == 200:
+            self.task_ids.append(response.json()["task_id"])
+
+    async def status(self):
+        if not self.task_ids:
+            return await self.create()
+        await self._request("status", "GET", f"/task/{random.choice(self.task_ids)}")
+
+    async def download(self):
+        if not self.task_ids:
+            return await self.create()
+        # 任务未完成时返回404，计入4xx而非错误
+        await self._request("download", "GET", f"/download/{random.choice(self.task_ids)}")
+
+    async def _user(self, deadline: float, budget: list):
+        while time.perf_counter() < deadline:
+            if budget is not None:
+                if budget[0] <= 0:
+                    return
+                budget[0] -= 1
+            operation = random.choices(self.operations, self.weights)[0]
+            await getattr(self, operation)()
+
+    async def run(self, concurrency: int, duration: float, requests: Optional[int]) -> float:
+        budget = [requests] if requests else None
+        started = time.perf_counter()
+        deadline = started + duration
+        try:
+            await asyncio.gather(*(self._user(deadline, budget) for _ in range(concurrency)))
+        finally:
+            await self.client.aclose()
+        return time.perf_counter() - started
+
+
+def serve_local(port: int, workers: int):
+    """
+    API进程本地替身模式：Celery改用进程内broker与结果后端，并在线程中启动worker
+
+    环境变量（MinIO地址、密钥等）由父进程设置，必须在导入app前生效
+    """
+    import uvicorn
+    from celery.contrib.testing.worker import start_worker
+    from loguru import logger
+
+    # 逐请求的DEBUG日志会显著影响延迟测量
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    import main
+    from app.core.worker import celery_app
+
+    # 进程内worker需要预先导入任务模块
+    import app.tasks.markdown_tasks  # noqa: F401
+
+    with start_worker(
+        celery_app,
+        pool="threads",
+        concurrency=workers,
+        perform_ping_check=False,
+        loglevel="WARNING",
+    ):
+        uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def serve_fake_redis(port: int):
+    """Redis替身：fakeredis的TCP服务（支持Lua脚本需安装 lupa）"""
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.serve_forever()
+
+
+def start_redis() -> tuple:
+    """启动临时Redis，返回 (REDIS_URL, 子进程)"""
+    port = _free_port()
+    if shutil.which("redis-server"):
+        command = ["redis-server", "--port", str(port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no"]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), "--fake-redis", str(port)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_port(port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return f"redis://127.0.0.1:{port}/0", process
+
+
+def start_local_stack(workers: int) -> tuple:
+    """启动moto_server、Redis与本地API进程，返回 (base_url, 子进程列表)"""
+    redis_url, redis = start_redis()
+    moto_port = _free_port()
+    moto = subprocess.Popen(
+        ["moto_server", "-H", "127.0.0.1", "-p", str(moto_port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _wait_port(moto_port)
+
+    api_port = _free_port()
+    env = dict(
+        os.environ,
+        MINIO_ENDPOINT=f"127.0.0.1:{moto_port}",
+        MINIO_ACCESS_KEY="load-test",
+        MINIO_SECRET_KEY="load-test-secret",
+        MINIO_SECURE="false",
+        MINIO_REGION="us-east-1",
+        STORAGE_BACKEND="minio",
+        CELERY_BROKER_URL="memory://",
+        CELERY_RESULT_BACKEND="cache+memory://",
+        # 队列亲和依赖Redis broker，进程内broker下关闭
+        QUEUE_AFFINITY_ENABLED="false",
+        REDIS_URL=redis_url,
+        SANDBOX_ENABLED="false",
+        API_AUTH_ENABLED="true",
+        API_SECRET_KEY=LOCAL_SECRET,
+    )
+    api = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(api_port), "--workers", str(workers)],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    try:
+        _wait_port(api_port, timeout=60)
+    except RuntimeError:
+        for process in (api, moto, redis):
+            process.kill()
+        raise
+    return f"http://127.0.0.1:{api_port}", [api, moto, redis]
+
+
+def print_report(rows: List[dict], duration: float, concurrency: int):
+    print(f"\n时长 {duration:.1f}s  并发 {concurrency}")
+    print(f"{'endpoint':<12} {'requests':>9} {'rps':>8} {'p50ms':>8} {'p95ms':>8} "
+          f"{'p99ms':>8} {'maxms':>8} {'4xx%':>6} {'err%':>6}")
+    for row in rows:
+        print(f"{row['endpoint']:<12} {row['requests']:>9} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} "
+              f"{row['4xx_rate'] * 100:>6.1f} {row['error_rate'] * 100:>6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步API压测工具")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="API地址")
+    parser.add_argument("--secret", default=os.getenv("API_SECRET_KEY", ""), help="API签名密钥")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    parser.add_argument("--requests", type=int, default=None, help="总请求数上限（可选）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="请求配比")
+    parser.add_argument("--file-size", type=int, default=4096, help="上传文件大小（字节）")
+    parser.add_argument("--no-put", action="store_true", help="只请求上传URL，不实际上传文件")
+    parser.add_argument("--local", action="store_true", help="启动本地替身（moto + 进程内Celery）")
+    parser.add_argument("--workers", type=int, default=4, help="--local 模式下进程内worker线程数")
+    parser.add_argument("--json", dest="json_path", help="将结果写入JSON文件")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fake-redis", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_local(args.serve, args.workers)
+        return
+    if args.fake_redis:
+        serve_fake_redis(args.fake_redis)
+        return
+
+    processes = []
+    base_url, secret = args.base_url, args.secret
+    if args.local:
+        base_url, processes = start_local_stack(args.workers)
+        secret = LOCAL_SECRET
+
+    try:
+        generator = LoadGenerator(base_url, secret, parse_mix(args.mix), args.file_size, not args.no_put)
+        duration = asyncio.run(generator.run(args.concurrency, args.duration, args.requests))
+        rows = generator.stats.report(duration)
+        print_report(rows, duration, args.concurrency)
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump({"duration": duration, "concurrency": args.concurrency, "endpoints": rows}, f, indent=2)
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
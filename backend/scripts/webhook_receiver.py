@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+本地回调接收端：校验任务回调（callback_url）的签名并打印收到的事件
+
+签名密钥为回调专用的 WEBHOOK_SECRET（与投递进程使用同一配置）。使用HTTP/1.1 keep-alive，
+输出中的客户端端口不变即说明投递进程复用了连接；--fail N 让前N个请求返回503，用于观察退避重试。
+
+用法（在 backend 目录下）:
+    python scripts/webhook_receiver.py --port 9000 --fail 2
+    # API服务和投递进程设置 WEBHOOK_ALLOWED_HOSTS=127.0.0.1（默认拒绝回环地址），
+    # 创建任务时指定 "callback_url": "http://127.0.0.1:9000/hooks/any2md"
+"""
+import argparse
+import hmac
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_handler(fail: int):
+    from app.core.auth import APIAuthMiddleware
+    from app.core.config import WEBHOOK_SECRET
+
+    signer = APIAuthMiddleware(WEBHOOK_SECRET)
+
+    state = {"requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, message: str):
+            body = json.dumps({"detail": message}, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            state["requests"] += 1
+            client = f"{self.client_address[0]}:{self.client_address[1]}"
+
+            timestamp = self.headers.get(signer.timestamp_header, "0")
+            expected = signer.generate_signature("POST", self.path.split("?")[0], int(timestamp), body)
+            if not hmac.compare_digest(expected, self.headers.get(signer.auth_header, "")):
+                print(f"[{client}] 签名校验失败", flush=True)
+                return self._reply(401, "签名无效")
+            if abs(time.time() - int(timestamp)) > signer.request_timeout:
+                print(f"[{client}] 时间戳过期", flush=True)
+                return self._reply(401, "时间戳过期")
+
+            if state["requests"] <= fail:
+                print(f"[{client}] 第 {state['requests']} 个请求，模拟失败返回503", flush=True)
+                return self._reply(503, "模拟失败")
+
+            events = json.loads(body)["events"]
+            print(f"[{client}] 收到 {len(events)} 个事件", flush=True)
+            for event in events:
+                result = event.get("result", {})
+                print(f"  {event['event']} {event['task_id']} {result.get('filename')}", flush=True)
+            self._reply(200, "ok")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地任务回调接收端")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--fail", type=int, default=0, help="前N个请求返回503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.fail))
+    print(f"回调接收端: http://{args.host}:{args.port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
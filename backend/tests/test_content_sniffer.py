@@ -0,0 +1,46 @@
+"""
+文件内容识别测试：文本文件开头或前1KB中出现其他格式的弱特征时，不能推翻文本扩展名
+
+运行（在 backend 目录下）:
+    python -m pytest -q tests
+"""
+import struct
+
+from app.services.content_sniffer import resolve_extension
+
+CSV_CONTENT = b"BMI,age\n22.5,31\n24.1,45\n"
+
+
+def test_csv_starting_with_bm_stays_csv():
+    assert resolve_extension('.csv', CSV_CONTENT, len(CSV_CONTENT))[0] == '.csv'
+
+
+def test_txt_starting_with_id3_stays_txt():
+    content = b"ID3 tags are stored at the start of MP3 files.\n"
+    assert resolve_extension('.txt', content, len(content))[0] == '.txt'
+
+
+def test_txt_mentioning_pdf_header_stays_txt():
+    content = b"PDF files begin with a header line such as %PDF-1.7 followed by objects.\n"
+    assert resolve_extension('.txt', content, len(content))[0] == '.txt'
+
+
+def test_bmp_requires_matching_size_field():
+    header = b'BM' + struct.pack('<I', 70) + b'\x00' * 4 + struct.pack('<I', 54) + struct.pack('<I', 40)
+    head = header + b'\x00' * 52
+    assert resolve_extension('.bmp', head, 70)[0] == '.bmp'
+    assert resolve_extension('.bin', head, 70)[0] == '.bmp'
+    # 大小字段与对象大小不符：不是BMP（二进制内容无法识别）
+    assert resolve_extension('.bmp', head, 4096) == (None, None)
+
+
+def test_pdf_is_detected_despite_text_extension():
+    head = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj\n"
+    assert resolve_extension('.txt', head, 1024)[0] == '.pdf'
+    # 规范允许的前导垃圾字节：文件头为二进制时仍识别为PDF
+    assert resolve_extension('.pdf', b'\x00\x01junk%PDF-1.4\n', 1024)[0] == '.pdf'
+
+
+def test_binary_mp3_with_text_extension_is_rerouted():
+    head = b"ID3\x04\x00\x00\x00\x00\x00\x00" + b"\xff\xfb\x90\x00" * 8
+    assert resolve_extension('.txt', head, 4096)[0] == '.mp3'
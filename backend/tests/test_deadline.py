@@ -0,0 +1,58 @@
+"""
+转换时限测试：到期截断时CSV只在记录边界切分，不输出带引号多行字段的前半部分
+
+运行（在 backend 目录下）:
+    python -m pytest -q tests
+"""
+import csv
+import io
+import time
+
+from app.services.deadline import ConversionDeadline
+
+CSV_CONTENT = (
+    'id,note\n'
+    '1,"first line\nsecond line"\n'
+    '2,"say ""hi""\n, then leave"\n'
+    '3,plain\n'
+).encode('utf-8')
+
+
+def _rows(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+
+
+def _expired() -> ConversionDeadline:
+    # 已到期：只转换第一块
+    return ConversionDeadline(time.time() - 1)
+
+
+def test_expired_csv_stops_at_record_boundary():
+    deadline = _expired()
+    first = b'id,note\n1,"first line\nsec'
+    output = b''.join(deadline.limit_blocks([first, CSV_CONTENT[len(first):]], len(CSV_CONTENT), '.csv'))
+    assert output == b'id,note\n'
+    assert deadline.truncated and deadline.converted == len(output)
+
+
+def test_expired_csv_output_is_whole_records_at_any_split():
+    rows = _rows(CSV_CONTENT)
+    for offset in range(1, len(CSV_CONTENT)):
+        blocks = [CSV_CONTENT[:offset], CSV_CONTENT[offset:]]
+        deadline = _expired()
+        output = b''.join(deadline.limit_blocks(blocks, len(CSV_CONTENT), '.csv'))
+        assert rows[:len(_rows(output))] == _rows(output), offset
+        assert output.endswith(b'\n') or output == CSV_CONTENT, offset
+
+
+def test_csv_without_deadline_expiry_is_unchanged():
+    deadline = ConversionDeadline(time.time() + 60)
+    blocks = [CSV_CONTENT[i:i + 3] for i in range(0, len(CSV_CONTENT), 3)]
+    assert b''.join(deadline.limit_blocks(blocks, len(CSV_CONTENT), '.csv')) == CSV_CONTENT
+    assert not deadline.truncated
+
+
+def test_text_still_cuts_at_last_newline():
+    deadline = _expired()
+    output = b''.join(deadline.limit_blocks([b'one\ntw', b'o\nthree\n'], 15, '.txt'))
+    assert output == b'one\n'
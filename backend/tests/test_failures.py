@@ -0,0 +1,124 @@
+"""
+失败分类与毒文件隔离测试：按异常链的根因分类，沙箱失败按类型决定是否隔离，
+已隔离的内容在创建任务时直接返回422
+
+运行（在 backend 目录下）:
+    python -m pytest -q tests
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from fastapi import HTTPException
+
+from app.api.v1.md_conv import async_routes
+from app.schema.async_schemas import CreateTaskRequest
+from app.services.failures import PERMANENT, TRANSIENT, classify_failure
+from app.services.quarantine import PoisonQuarantine
+from app.services.sandbox import ConversionSandboxError
+
+
+def _chain(*exceptions: BaseException) -> BaseException:
+    """按从内到外的顺序以 raise ... from ... 串起异常，返回最外层"""
+    inner = None
+    for exc in exceptions:
+        try:
+            raise exc from inner
+        except BaseException as raised:
+            inner = raised
+    return inner
+
+
+def _classify(exc: BaseException):
+    failure = classify_failure(exc)
+    return failure.category, failure.error_type, failure.poison
+
+
+def test_wrapped_os_error_is_io_error():
+    exc = _chain(OSError(28, "No space left on device"), ValueError("转换失败"))
+    assert _classify(exc) == (TRANSIENT, 'io_error', False)
+
+
+def test_unknown_root_cause_is_transient_despite_value_error_wrapper():
+    exc = _chain(KeyError("page"), ValueError("转换失败"))
+    assert _classify(exc) == (TRANSIENT, 'unknown', False)
+
+
+def test_parse_error_root_cause_is_poison():
+    exc = _chain(UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte'), RuntimeError("转换失败"))
+    assert _classify(exc) == (PERMANENT, 'corrupt_file', True)
+
+
+def test_soft_time_limit_anywhere_in_chain_wins():
+    # 软超时后清理时抛出的解析异常
+    try:
+        try:
+            raise SoftTimeLimitExceeded()
+        except SoftTimeLimitExceeded:
+            raise ValueError("文件不完整")
+    except ValueError as e:
+        exc = e
+    assert _classify(exc) == (TRANSIENT, 'soft_time_limit', False)
+    # 软超时包装了更内层的异常
+    exc = _chain(ValueError("文件不完整"), SoftTimeLimitExceeded())
+    assert _classify(exc) == (TRANSIENT, 'soft_time_limit', False)
+
+
+@pytest.mark.parametrize("kind, cause, expected", [
+    ('memory_limit', None, (PERMANENT, 'memory_limit', True)),
+    ('cpu_limit', None, (PERMANENT, 'cpu_limit', True)),
+    ('timeout', None, (PERMANENT, 'timeout', True)),
+    ('crashed', None, (TRANSIENT, 'crashed', False)),
+    ('conversion_error', None, (PERMANENT, 'corrupt_file', True)),
+    ('conversion_error', 'unsupported_format', (PERMANENT, 'unsupported_format', True)),
+    ('conversion_error', 'missing_dependency', (PERMANENT, 'missing_dependency', False)),
+    ('conversion_error', 'io_error', (TRANSIENT, 'io_error', False)),
+    ('conversion_error', 'unknown', (TRANSIENT, 'unknown', False)),
+])
+def test_sandbox_kinds(kind, cause, expected):
+    exc = ConversionSandboxError(kind, "子进程失败", cause=cause)
+    assert _classify(exc) == expected
+    # 沙箱失败被外层包装时同样以其为准
+    assert _classify(_chain(exc, ValueError("转换失败"))) == expected
+
+
+def test_cyclic_chain_terminates():
+    first, second = ValueError("a"), KeyError("b")
+    first.__context__, second.__context__ = second, first
+    assert _classify(first) == (TRANSIENT, 'unknown', False)
+
+
+class _MemoryRedis:
+    """只实现隔离记录用到的命令"""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+
+def test_create_task_rejects_quarantined_content(monkeypatch):
+    quarantine = PoisonQuarantine(redis=_MemoryRedis(), enabled=True)
+    stat = SimpleNamespace(size=1024, etag='"0123abcd"')
+    monkeypatch.setattr(async_routes, "poison_quarantine", quarantine)
+    monkeypatch.setattr(async_routes, "_inspect_upload", lambda request: (stat, '.pdf'))
+
+    def submit_task(*args, **kwargs):
+        raise AssertionError("已隔离的内容不应投递给worker")
+
+    monkeypatch.setattr(async_routes, "submit_task", submit_task)
+    quarantine.add(quarantine.build_key(stat.etag, stat.size, '.pdf'), 'corrupt_file', "文件损坏", "broken.pdf")
+
+    request = CreateTaskRequest(object_name="uploads/broken.pdf", original_filename="broken.pdf")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(async_routes.create_conversion_task(request))
+    assert raised.value.status_code == 422
+    assert 'corrupt_file' in raised.value.detail
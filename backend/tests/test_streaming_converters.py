@@ -0,0 +1,123 @@
+"""
+流式转换器测试：字节块在任意位置切分（多字节字符、引号、转义符中间）时输出不变，
+CSV/TXT输出与MarkItDown一致，重新缩进的JSON解析后与原对象相同
+
+运行（在 backend 目录下）:
+    python -m pytest -q tests
+"""
+import io
+import json
+
+import pytest
+from markitdown import MarkItDown
+
+from app.services import streaming_converters
+from app.services.streaming_converters import (
+    CsvStreamingConverter,
+    JsonStreamingConverter,
+    TextStreamingConverter,
+    _JsonFormatter,
+    normalize_markdown,
+)
+
+DEFAULT_BLOCK_CHARS = streaming_converters.OUTPUT_BLOCK_CHARS
+
+CSV_CONTENT = (
+    '名称,说明,数量\r\n'
+    '苹果,"红色, 甜",3\r\n'
+    '"带""引号""的值","多行\r\n内容",4\r\n'
+    'a|b,"反斜杠\\|竖线",5\r\n'
+    '\r\n'
+    '短行\r\n'
+    'é,ü,6\r\n'
+    '\r\n'
+).encode('utf-8')
+
+TXT_CONTENT = (
+    '第一行  \n'
+    'second line\t\n'
+    '\n\n\n\n'
+    '混合 é ü 文字\r\n'
+    'last line without newline   '
+).encode('utf-8')
+
+JSON_OBJECT = {
+    "名称": "值 \"带引号\" 和 \\ 反斜杠",
+    "escaped": "line\nbreak\ttab é 中",
+    "numbers": [0, -1, 3.25, 1e10, 12345678901234567890],
+    "literals": [True, False, None],
+    "empty": {"list": [], "dict": {}},
+    "nested": [{"a": [{"b": "c"}]}, [], "x,y:z{}[]"],
+}
+JSON_CONTENT = json.dumps(JSON_OBJECT, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _splits(data: bytes):
+    """所有两段切分和逐字节切分"""
+    for offset in range(1, len(data)):
+        yield [data[:offset], data[offset:]]
+    yield [data[i:i + 1] for i in range(len(data))]
+
+
+def _convert(converter, chunks) -> str:
+    return "".join(normalize_markdown(converter.convert(chunks)))
+
+
+def _markitdown(data: bytes, extension: str) -> str:
+    return MarkItDown().convert_stream(io.BytesIO(data), file_extension=extension).text_content
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    """每次只读取很少的字符，使块边界落在token、字符串和转义符中间"""
+    monkeypatch.setattr(streaming_converters, "OUTPUT_BLOCK_CHARS", 7)
+
+
+def test_csv_matches_markitdown_at_any_split():
+    expected = _markitdown(CSV_CONTENT, '.csv')
+    converter = CsvStreamingConverter()
+    assert _convert(converter, [CSV_CONTENT]) == expected
+    for chunks in _splits(CSV_CONTENT):
+        assert _convert(converter, chunks) == expected
+
+
+def test_txt_matches_markitdown_at_any_split():
+    expected = _markitdown(TXT_CONTENT, '.txt')
+    converter = TextStreamingConverter()
+    assert _convert(converter, [TXT_CONTENT]) == expected
+    for chunks in _splits(TXT_CONTENT):
+        assert _convert(converter, chunks) == expected
+
+
+def _json_body(markdown: str) -> str:
+    assert markdown.startswith("```json\n") and markdown.endswith("\n```")
+    return markdown[len("```json\n"):-len("\n```")]
+
+
+def test_compact_json_reindents_to_same_object_at_any_split():
+    converter = JsonStreamingConverter()
+    expected = _convert(converter, [JSON_CONTENT])
+    body = _json_body(expected)
+    assert '\n  "名称": ' in body
+    assert json.loads(body) == JSON_OBJECT
+    for chunks in _splits(JSON_CONTENT):
+        assert _convert(converter, chunks) == expected
+
+
+def test_json_formatter_handles_text_splits_inside_tokens():
+    text = JSON_CONTENT.decode('utf-8')
+    whole = _JsonFormatter()
+    expected = whole.feed(text) + whole.close()
+    assert json.loads(expected) == JSON_OBJECT
+    for offset in range(1, len(text)):
+        formatter = _JsonFormatter()
+        output = formatter.feed(text[:offset]) + formatter.feed(text[offset:]) + formatter.close()
+        assert output == expected, offset
+
+
+def test_json_lines_are_kept_as_is(monkeypatch):
+    # 是否已有换行按第一个输出块判断，这里使用默认块大小
+    monkeypatch.setattr(streaming_converters, "OUTPUT_BLOCK_CHARS", DEFAULT_BLOCK_CHARS)
+    content = b'{"a":1}\n{"b":["\xe4\xb8\xad",2]}\n'
+    for chunks in _splits(content):
+        assert _convert(JsonStreamingConverter(), chunks) == "```json\n" + content.decode('utf-8') + "```"
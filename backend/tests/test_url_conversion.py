@@ -0,0 +1,51 @@
+"""
+URL转换测试：通过 AsyncHTTPFetcher 的 transport 参数使用本地处理函数，不访问网络
+
+运行（在 backend 目录下）:
+    python -m pytest -q tests
+"""
+import asyncio
+
+import httpx
+
+from app.api.v1.md_conv import conv
+from app.services.http_client import AsyncHTTPFetcher, URLCache
+
+CSV_CONTENT = b"name,size\nalpha,1\nbeta,2\n"
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/files/report.csv":
+        return httpx.Response(200, content=CSV_CONTENT, headers={"Content-Type": "application/octet-stream"})
+    if request.url.path == "/export":
+        return httpx.Response(200, content=CSV_CONTENT, headers={"Content-Type": "text/csv; charset=utf-8"})
+    return httpx.Response(404)
+
+
+def _convert_url(monkeypatch, url: str):
+    """返回转换结果和传给MarkItDown的扩展名"""
+    monkeypatch.setattr(conv, "http_fetcher", AsyncHTTPFetcher(transport=httpx.MockTransport(_handler)))
+    monkeypatch.setattr(conv, "url_cache", URLCache())
+    converter = conv.MarkdownConverter()
+    extensions = []
+    convert_stream = converter.markitdown.convert_stream
+
+    def spy(stream, file_extension=None, **kwargs):
+        extensions.append(file_extension)
+        return convert_stream(stream, file_extension=file_extension, **kwargs)
+
+    monkeypatch.setattr(converter.markitdown, "convert_stream", spy)
+    markdown = asyncio.run(converter.convert_url_to_markdown(url))
+    return markdown, extensions
+
+
+def test_generic_content_type_uses_url_extension(monkeypatch):
+    markdown, extensions = _convert_url(monkeypatch, "http://files.local/files/report.csv")
+    assert extensions == [".csv"]
+    assert "| beta | 2 |" in markdown
+
+
+def test_specific_content_type_wins_over_url(monkeypatch):
+    markdown, extensions = _convert_url(monkeypatch, "http://files.local/export")
+    assert extensions == [".csv"]
+    assert "| alpha | 1 |" in markdown
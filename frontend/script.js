@@ -22,6 +22,21 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- API Configuration ---
     const API_BASE_URL = 'http://127.0.0.1:8000/api/v1/async'; // 根据实际后端地址调整
     const API_SECRET_KEY = 'your-secret-key-change-this-in-production'; // 应与后端配置的密钥一致
+    const MULTIPART_THRESHOLD = 16 * 1024 * 1024; // 超过该大小使用分片上传，应与后端配置一致
+    const MULTIPART_CONCURRENCY = 4; // 并发上传的分片数
+    const MULTIPART_PART_RETRIES = 3; // 单个分片失败重试次数
+    const HASH_PRECHECK_ENABLED = true; // 上传前计算SHA-256预检，已有相同文件/结果时跳过上传/转换
+
+    // 本浏览器的用户ID：预检只命中以同一ID创建的任务登记的上传和结果。
+    // 服务端不认证该值，使用随机UUID使他人无法猜到并查询本浏览器的预检结果
+    const USER_ID = (() => {
+        let id = localStorage.getItem('any2md-user-id');
+        if (!id) {
+            id = crypto.randomUUID();
+            localStorage.setItem('any2md-user-id', id);
+        }
+        return id;
+    })();
 
     // --- Translations ---
     const translations = {
@@ -43,6 +58,7 @@ document.addEventListener('DOMContentLoaded', () => {
             processingFile: "Processing",
             uploadLink: "click to select",
             uploadingFile: "Uploading",
+            hashingFile: "Checking",
             waitingForProcessing: "Waiting for processing",
             processing: "Processing",
             processingProgress: "Processing progress",
@@ -92,6 +108,7 @@ document.addEventListener('DOMContentLoaded', () => {
             processingFile: "正在处理",
             uploadLink: "点击选择",
             uploadingFile: "正在上传",
+            hashingFile: "正在校验",
             waitingForProcessing: "等待处理",
             processing: "处理中",
             processingProgress: "处理进度",
@@ -201,11 +218,159 @@ document.addEventListener('DOMContentLoaded', () => {
         return response;
     };
 
+    const postJson = async (endpoint, payload, errorMessage) => {
+        const response = await makeAuthenticatedRequest(`${API_BASE_URL}${endpoint}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(payload)
+        });
+        if (!response.ok) throw new Error(errorMessage);
+        return response.json();
+    };
+
+    // 分片上传会话保存在localStorage中，页面刷新或网络中断后可以继续上传缺失分片
+    const multipartSessionKey = (file) => `multipart:${file.name}:${file.size}:${file.lastModified}`;
+
+    const uploadPart = async (uploadUrl, blob) => {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const response = await fetch(uploadUrl, { method: 'PUT', body: blob });
+                if (!response.ok) throw new Error(`Part upload failed: ${response.status}`);
+                return;
+            } catch (error) {
+                if (attempt >= MULTIPART_PART_RETRIES) throw error;
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+        }
+    };
+
+    const uploadMultipart = async (file, onProgress) => {
+        const sessionKey = multipartSessionKey(file);
+        let session = JSON.parse(localStorage.getItem(sessionKey) || 'null');
+        let pendingParts = null;
+        let uploadedBytes = 0;
+
+        // 尝试恢复之前的上传
+        if (session) {
+            try {
+                const progress = await postJson('/multipart/parts', {
+                    object_name: session.object_name,
+                    upload_id: session.upload_id,
+                    part_count: session.part_count
+                }, 'Failed to resume multipart upload');
+                pendingParts = progress.parts;
+                uploadedBytes = progress.uploaded_parts.reduce((total, partNumber) =>
+                    total + Math.min(session.part_size, file.size - (partNumber - 1) * session.part_size), 0);
+            } catch (error) {
+                console.warn('Multipart session expired, restarting upload:', error);
+                localStorage.removeItem(sessionKey);
+                session = null;
+            }
+        }
+
+        if (!session) {
+            const init = await postJson('/multipart/init', {
+                filename: file.name,
+                file_size: file.size,
+                content_type: file.type
+            }, 'Failed to initialize multipart upload');
+            session = {
+                upload_id: init.upload_id,
+                object_name: init.object_name,
+                part_size: init.part_size,
+                part_count: init.part_count
+            };
+            localStorage.setItem(sessionKey, JSON.stringify(session));
+            pendingParts = init.parts;
+        }
+
+        onProgress(Math.round(uploadedBytes / file.size * 100));
+
+        // 固定数量的并发上传协程依次领取分片
+        const queue = [...pendingParts];
+        const worker = async () => {
+            while (queue.length) {
+                const { part_number, upload_url } = queue.shift();
+                const start = (part_number - 1) * session.part_size;
+                const blob = file.slice(start, Math.min(start + session.part_size, file.size));
+                await uploadPart(upload_url, blob);
+                uploadedBytes += blob.size;
+                onProgress(Math.round(uploadedBytes / file.size * 100));
+            }
+        };
+        await Promise.all(Array.from({ length: Math.min(MULTIPART_CONCURRENCY, queue.length) }, worker));
+
+        await postJson('/multipart/complete', {
+            object_name: session.object_name,
+            upload_id: session.upload_id,
+            part_count: session.part_count
+        }, 'Failed to complete multipart upload');
+        localStorage.removeItem(sessionKey);
+        return session.object_name;
+    };
+
+    // 在Web Worker中增量计算文件SHA-256；不支持Worker或计算失败时返回null（按正常流程上传）
+    const hashFile = (file, onProgress) => new Promise((resolve) => {
+        if (!window.Worker) {
+            resolve(null);
+            return;
+        }
+        let worker;
+        try {
+            worker = new Worker('hash-worker.js');
+        } catch (error) {
+            console.warn('Hash worker unavailable:', error);
+            resolve(null);
+            return;
+        }
+        const finish = (sha256) => {
+            worker.terminate();
+            resolve(sha256);
+        };
+        worker.onmessage = ({ data }) => {
+            if (data.type === 'progress') {
+                onProgress(data.progress);
+            } else if (data.type === 'done') {
+                finish(data.sha256);
+            } else {
+                console.warn('Hashing failed:', data.message);
+                finish(null);
+            }
+        };
+        worker.onerror = (error) => {
+            console.warn('Hash worker error:', error);
+            finish(null);
+        };
+        worker.postMessage({ file });
+    });
+
+    // 按内容哈希预检：返回 { upload_exists, object_name, task_id }，预检不可用时返回null
+    const precheckFile = async (file, extractImages, onProgress) => {
+        if (!HASH_PRECHECK_ENABLED) return null;
+        const sha256 = await hashFile(file, onProgress);
+        if (!sha256) return null;
+        try {
+            return await postJson('/precheck', {
+                sha256,
+                size: file.size,
+                filename: file.name,
+                extract_images: extractImages,
+                user_id: USER_ID
+            }, 'Failed to precheck upload');
+        } catch (error) {
+            console.warn('Precheck failed, uploading:', error);
+            return null;
+        }
+    };
+
     const createConversionTask = async (objectName, originalFilename, extractImages = false) => {
         const body = JSON.stringify({
             object_name: objectName,
             original_filename: originalFilename,
-            extract_images: extractImages
+            extract_images: extractImages,
+            user_id: USER_ID
         });
         const response = await makeAuthenticatedRequest(`${API_BASE_URL}/create-task`, {
             method: 'POST',
@@ -261,6 +426,15 @@ document.addEventListener('DOMContentLoaded', () => {
                 <p class="drop-zone-hint" data-lang-key="maxFileSize">${translations[currentLang].maxFileSize}</p>
                 
             `,
+            hashing: () => `
+                <div class="upload-icon-container">
+                    <i class="fas fa-spinner fa-spin"></i>
+                </div>
+                <p class="drop-zone-text">${translations[currentLang].hashingFile}: ${fileName}</p>
+                <div class="progress-bar">
+                    <div class="progress-fill" style="width: ${progress}%"></div>
+                </div>
+            `,
             uploading: () => `
                 <div class="upload-icon-container">
                     <i class="fas fa-spinner fa-spin"></i>
@@ -314,17 +488,44 @@ document.addEventListener('DOMContentLoaded', () => {
         const extractImages = extractImagesCheckbox ? extractImagesCheckbox.checked : false;
         
         try {
-            // Step 1: Get upload URL
-            updateDropZoneState('uploading', file.name, 0);
-            const { upload_url, object_name, file_id } = await getUploadUrl(file.name, file.type);
+            // Step 0: 计算内容哈希并预检
+            updateDropZoneState('hashing', file.name, 0);
+            const precheck = await precheckFile(file, extractImages, (progress) => {
+                updateDropZoneState('hashing', file.name, progress);
+            });
             
-            // Step 2: Upload to MinIO
-            await uploadToMinIO(upload_url, file);
-            updateDropZoneState('processing', file.name, 0);
+            // 相同文件、相同参数的转换结果已存在：跳过上传和转换
+            if (precheck && precheck.task_id) {
+                console.log('✅ 已有相同文件的转换结果，跳过上传');
+                currentTaskId = precheck.task_id;
+                updateDropZoneState('processing', file.name, 100);
+                startPolling(currentTaskId);
+                return;
+            }
             
-            // 等待1秒确保MinIO处理完成
-            console.log('⏳ 等待MinIO处理文件...');
-            await new Promise(resolve => setTimeout(resolve, 1000));
+            let object_name = precheck && precheck.upload_exists ? precheck.object_name : null;
+            if (object_name) {
+                // 相同文件已上传：跳过上传
+                console.log('✅ 已有相同文件，跳过上传');
+                updateDropZoneState('processing', file.name, 0);
+            } else {
+                // Step 1 & 2: Upload to MinIO (大文件使用并发分片上传)
+                updateDropZoneState('uploading', file.name, 0);
+                if (file.size > MULTIPART_THRESHOLD) {
+                    object_name = await uploadMultipart(file, (progress) => {
+                        updateDropZoneState('uploading', file.name, progress);
+                    });
+                } else {
+                    const uploadInfo = await getUploadUrl(file.name, file.type);
+                    await uploadToMinIO(uploadInfo.upload_url, file);
+                    object_name = uploadInfo.object_name;
+                }
+                updateDropZoneState('processing', file.name, 0);
+                
+                // 等待1秒确保MinIO处理完成
+                console.log('⏳ 等待MinIO处理文件...');
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
             
             // Step 3: Create conversion task
             const taskResponse = await createConversionTask(object_name, file.name, extractImages);
@@ -354,6 +555,25 @@ document.addEventListener('DOMContentLoaded', () => {
                     placeholderContent.classList.add('hidden');
                     outputContent.classList.remove('hidden');
                     
+                    // 小结果随任务状态内联返回，无需再请求下载链接
+                    if (typeof status.result?.markdown === 'string') {
+                        const markdownContent = status.result.markdown;
+                        markdownOutput.value = markdownContent;
+                        if (downloadBtn.dataset.downloadUrl?.startsWith('blob:')) {
+                            URL.revokeObjectURL(downloadBtn.dataset.downloadUrl);
+                        }
+                        downloadBtn.dataset.downloadUrl = URL.createObjectURL(
+                            new Blob([markdownContent], { type: 'text/markdown' })
+                        );
+                        downloadBtn.dataset.filename = status.result.filename || `converted-${Date.now()}.md`;
+                        
+                        const fileSizeElement = document.getElementById('file-size');
+                        if (fileSizeElement) {
+                            fileSizeElement.textContent = `${markdownContent.length} characters`;
+                        }
+                        return;
+                    }
+                    
                     // Try to get download URL and content
                     try {
                         const downloadResponse = await getDownloadUrl(taskId);
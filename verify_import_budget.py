@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+API进程启动预算检查
+
+在独立子进程中导入 backend/main.py，检查：
+1. 导入耗时不超过预算
+2. 导入后的RSS不超过预算
+3. 未加载任何只在worker中使用的转换器模块
+
+用法: python verify_import_budget.py [耗时预算秒] [内存预算MB]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+# API进程不应加载的模块（文档解析库和worker任务代码）
+FORBIDDEN_MODULES = [
+    "markitdown",
+    "app.api.v1.md_conv.conv",
+    "app.tasks.markdown_tasks",
+    "app.services.sandbox",
+    "app.services.image_extractor",
+]
+
+PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+rss = int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+print(json.dumps({
+    "elapsed": elapsed,
+    "rss_mb": rss / 1024 / 1024,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (FORBIDDEN_MODULES,)
+
+
+def measure() -> dict:
+    """在干净的子进程中测量导入开销"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_budget(time_budget: float = 2.0, memory_budget_mb: float = 100.0) -> bool:
+    """测试API进程导入预算"""
+    print("🔍 检查API进程启动预算...")
+    # 取多次测量的最小值，排除磁盘缓存等干扰
+    samples = [measure() for _ in range(3)]
+    elapsed = min(s["elapsed"] for s in samples)
+    rss_mb = min(s["rss_mb"] for s in samples)
+    loaded = samples[0]["loaded"]
+
+    ok = True
+    print(f"   导入耗时: {elapsed:.3f}s (预算 {time_budget}s)")
+    if elapsed > time_budget:
+        print("   ❌ 导入耗时超出预算")
+        ok = False
+
+    print(f"   RSS: {rss_mb:.1f}MB (预算 {memory_budget_mb}MB)")
+    if rss_mb > memory_budget_mb:
+        print("   ❌ 内存占用超出预算")
+        ok = False
+
+    if loaded:
+        print(f"   ❌ API进程加载了worker专用模块: {', '.join(loaded)}")
+        ok = False
+    else:
+        print("   ✅ 未加载转换器模块")
+
+    print("✅ 启动预算检查通过" if ok else "❌ 启动预算检查失败")
+    return ok
+
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:3]]
+    sys.exit(0 if test_import_budget(*args) else 1)